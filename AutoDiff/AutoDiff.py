@@ -1,6 +1,436 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-import copy
+import scipy.sparse
+import scipy.special
+import bisect
+import builtins
+from collections.abc import Mapping
+from contextlib import contextmanager
+import functools
+import time
+from AutoDiff.Reverse import Node, _tapes, _stack
+from AutoDiff.Taylor import Taylor, _expansions, _variable
+
+class VariableIndex:
+    """A shared registry that gives every named independent variable a fixed position, so that
+    Variables created on it keep their derivatives as NumPy arrays instead of dictionaries.
+
+    Parameters
+    ==========
+    names    : (optional) iterable of str
+               names of the independent variables to register up front, in order
+    sparse   : (optional) bool
+               if True, Hessians are kept as SparseHessian (one triangle, without structural zeros) while
+               their fill ratio is at most density, and switch to dense arrays above it (default False)
+    density  : (optional) float
+               fill ratio above which a sparse Hessian is stored as a dense array (default 0.25)
+
+    Output
+    ==========
+    VariableIndex : object
+               the registry. Contains VariableIndex.names, the list of registered names in
+               position order, and VariableIndex.positions, the dict of name to position.
+               VariableIndex.hessian_names and VariableIndex.hpositions do the same for the names
+               registered with Hessian entries, and VariableIndex.hessian_columns holds their positions.
+               Variables created with index=VariableIndex store Variable.grad, an array of shape
+               (len(val), n) holding the gradient, and Variable.hess, an array of shape
+               (len(val), k, k) holding the Hessian, where n is the number of registered names and k
+               the number of them with Hessian entries.
+               Variable.der and Variable.der2 are read-only views over those arrays.
+
+    Examples
+    ==========
+    >>> idx = VariableIndex()
+    >>> x1 = Variable(3, name='x1', index=idx)
+    >>> x2 = Variable(2, name='x2', index=idx)
+    >>> f = x1 * x2
+    >>> print(f.val, f.grad, f.der['x1'])
+    6.0 [[2. 3.]] [2.]
+    >>> f.hessian(['x1', 'x2'])
+    array([[0., 1.],
+           [1., 0.]])
+    """
+
+    def __init__(self, names=(), sparse=False, density=0.25):
+        self.sparse = sparse
+        self.density = density
+        self.names = []
+        self.positions = {}
+        self.hessian_names = []
+        self.hpositions = {}
+        self.hessian_columns = []
+        for name in names:
+            self.register(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def register(self, name, hessian=True):
+        """Returns the position of name, appending it to the index if it is not registered yet.
+        Whether a name has Hessian entries is fixed when it is first registered."""
+        try:
+            return self.positions[name]
+        except KeyError:
+            self.positions[name] = len(self.names)
+            self.names.append(name)
+            if hessian:
+                self.hpositions[name] = len(self.hessian_names)
+                self.hessian_names.append(name)
+                self.hessian_columns.append(self.positions[name])
+            return self.positions[name]
+
+    def split(self, key):
+        """Returns the Hessian positions of the two names concatenated in a der2 key such as 'x1x2'."""
+        for (name, i) in self.hpositions.items():
+            if key.startswith(name) and key[len(name):] in self.hpositions:
+                return i, self.hpositions[key[len(name):]]
+        raise KeyError(key)
+
+    def hessian_part(self, grad):
+        """Returns the columns of a gradient array that belong to names with Hessian entries."""
+        k = bisect.bisect_left(self.hessian_columns, grad.shape[1])
+        if k == grad.shape[1]:
+            return grad
+        return grad[:, self.hessian_columns[:k]]
+
+
+class _GradView(Mapping):
+    """Read-only der dictionary of an indexed Variable; values are views into its grad array."""
+
+    def __init__(self, arr, index):
+        self._arr = arr
+        self._index = index
+
+    def __getitem__(self, name):
+        i = self._index.positions[name]
+        if i >= self._arr.shape[1]:
+            raise KeyError(name)
+        return self._arr[:, i]
+
+    def __iter__(self):
+        return iter(self._index.names[:self._arr.shape[1]])
+
+    def __len__(self):
+        return self._arr.shape[1]
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _HessView(_GradView):
+    """Read-only der2 dictionary of an indexed Variable; values are views into its hess array."""
+
+    def __getitem__(self, key):
+        i, j = self._index.split(key)
+        if max(i, j) >= self._arr.shape[1]:
+            raise KeyError(key)
+        return self._arr[:, i, j]
+
+    def __iter__(self):
+        names = self._index.hessian_names[:self._arr.shape[1]]
+        return (x+y for x in names for y in names)
+
+    def __len__(self):
+        return self._arr.shape[1]**2
+
+
+class _SparseHessView(_GradView):
+    """Read-only der2 dictionary of an indexed Variable with a SparseHessian; structural zeros are left out."""
+
+    def __getitem__(self, key):
+        i, j = self._index.split(key)
+        return self._arr.get(i, j)
+
+    def __iter__(self):
+        names = self._index.hessian_names
+        for (i, j) in zip(self._arr.rows, self._arr.cols):
+            yield names[i]+names[j]
+            if i != j:
+                yield names[j]+names[i]
+
+    def __len__(self):
+        return 2*len(self._arr.rows) - np.count_nonzero(self._arr.rows == self._arr.cols)
+
+
+class SparseHessian:
+    """The upper triangle of a symmetric Hessian in coordinate form, without structural zeros.
+
+    Parameters
+    ==========
+    rows     : np.array of int
+               Hessian positions of the first variable of each stored entry
+    cols     : np.array of int
+               Hessian positions of the second variable of each stored entry, with rows <= cols
+    data     : np.array of shape (len(val), number of entries)
+               values of the stored entries
+    k        : int
+               number of variables spanned by the Hessian
+    """
+
+    def __init__(self, rows, cols, data, k):
+        self.rows = rows
+        self.cols = cols
+        self.data = data
+        self.k = k
+        self.shape = (data.shape[0], k, k)
+
+    @classmethod
+    def empty(cls, lenn, k):
+        """Returns the zero Hessian of lenn values over k variables."""
+        return cls(np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros((lenn, 0)), k)
+
+    @classmethod
+    def combine(cls, scaled, outers):
+        """Returns sum(c*H for (c, H) in scaled) + sum(c*(p q' + q p') for (c, p, q) in outers) for
+        SparseHessians H and Hessian parts of gradients p and q, summing entries at the same position."""
+        rows, cols, data = [], [], []
+        k = 0
+        for (c, H) in scaled:
+            rows.append(H.rows)
+            cols.append(H.cols)
+            data.append(_col(c) * H.data)
+            k = max(k, H.k)
+        for (c, p, q) in outers:
+            i = np.flatnonzero(np.any(p != 0, axis=0))
+            j = np.flatnonzero(np.any(q != 0, axis=0))
+            i, j = np.repeat(i, len(j)), np.tile(j, len(i))
+            # the entries (i, j) and (j, i) of p q' + q p' both fall on the same entry of the triangle
+            rows.append(np.minimum(i, j))
+            cols.append(np.maximum(i, j))
+            data.append(_col(c) * p[:, i] * q[:, j] * np.where(i == j, 2, 1))
+            k = max(k, p.shape[1])
+        lenn = max(d.shape[0] for d in data)
+        data = np.concatenate([np.broadcast_to(d, (lenn, d.shape[1])) for d in data], axis=1)
+        key, inverse = np.unique(np.concatenate(rows)*k + np.concatenate(cols), return_inverse=True)
+        summed = np.zeros((lenn, len(key)))
+        for r in range(lenn):
+            summed[r] = np.bincount(inverse.ravel(), weights=data[r], minlength=len(key))
+        return cls(key // k, key % k, summed, k)
+
+    def fill(self, k=None):
+        """Returns the number of stored entries over the number of entries in the triangle of a Hessian
+        over k variables (default self.k)."""
+        k = max(self.k, k or 0)
+        return len(self.rows) / max(k*(k+1)/2, 1)
+
+    def resize(self, k):
+        """Returns the same Hessian over k >= self.k variables."""
+        if k == self.k:
+            return self
+        return SparseHessian(self.rows, self.cols, self.data, k)
+
+    def get(self, i, j):
+        """Returns the stored entry at positions i and j; raises KeyError for a structural zero."""
+        found = np.flatnonzero((self.rows == min(i, j)) & (self.cols == max(i, j)))
+        if len(found) == 0:
+            raise KeyError((i, j))
+        return self.data[:, found[0]]
+
+    def toarray(self):
+        """Returns the Hessian as an np.array of shape (len(val), k, k)."""
+        output = np.zeros(self.shape)
+        output[:, self.rows, self.cols] = self.data
+        output[:, self.cols, self.rows] = self.data
+        return output
+
+    def select(self, ids):
+        """Returns the Hessian with respect to the variables at positions ids as a list of
+        scipy.sparse.csr_matrix, one per value."""
+        where = np.full(self.k, -1)
+        where[ids] = np.arange(len(ids))
+        keep = (where[self.rows] >= 0) & (where[self.cols] >= 0)
+        rows, cols = where[self.rows[keep]], where[self.cols[keep]]
+        off = rows != cols
+        rows, cols = np.concatenate([rows, cols[off]]), np.concatenate([cols, rows[off]])
+        return [scipy.sparse.csr_matrix((np.concatenate([d[keep], d[keep][off]]), (rows, cols)),
+                                        shape=(len(ids), len(ids))) for d in self.data]
+
+
+def _col(x):
+    """Reshapes a value so that it broadcasts against a gradient array row by row."""
+    return np.reshape(x, (-1, 1))
+
+def _col2(x):
+    """Reshapes a value so that it broadcasts against a Hessian array row by row."""
+    return np.reshape(x, (-1, 1, 1))
+
+def _dense(H):
+    """Returns a Hessian as an np.array."""
+    return H.toarray() if isinstance(H, SparseHessian) else H
+
+def _outer(g, h):
+    """Returns the row-wise outer products of two gradient arrays."""
+    return g[:, :, None] * h[:, None, :]
+
+# missing second derivatives read as an explicit zero; shared, so it must never be modified
+_ZERO = np.array([0.0])
+
+# derivative order of named Variables created without an explicit order, see derivative_order, and the
+# direction that named Variables are seeded with instead of their own derivative, see jvp
+_defaults = {'order': 2, 'hessian': None, 'seed': None, 'direction': None, 'direction_index': None}
+
+# der key of the directional derivative of Variables created inside jvp
+_DIRECTION = '_v'
+
+
+def _default_order(name):
+    """Returns the order of derivatives taken with respect to a new named variable."""
+    if _defaults['seed'] is not None and name not in _defaults['seed']:
+        return 0
+    if _defaults['hessian'] is not None and name not in _defaults['hessian']:
+        return min(_defaults['order'], 1)
+    return _defaults['order']
+
+@contextmanager
+def derivative_order(order=2, hessian=None, seed=None):
+    """Sets the order of derivatives taken with respect to the named Variables created inside the block.
+
+    Parameters
+    ==========
+    order    : 0, 1 or 2
+               2 computes der and der2, 1 computes only der, so that no second-order work is done,
+               and 0 computes only values
+    hessian  : (optional) iterable of str
+               if supplied, only the named Variables in it get der2 entries
+    seed     : (optional) iterable of str
+               if supplied, only the named Variables in it get derivatives; the others are constants,
+               so that only the derivative columns of these variables are propagated
+
+    Examples
+    ==========
+    >>> with derivative_order(1):
+    ...     x1 = Variable(3, name='x1')
+    >>> f = x1**2
+    >>> print(f.der, f.der2)
+    {'x1': array([6.])} {}
+    """
+    previous = dict(_defaults)
+    _defaults['order'] = order
+    _defaults['hessian'] = None if hessian is None else frozenset(hessian)
+    _defaults['seed'] = None if seed is None else frozenset(seed)
+    try:
+        yield
+    finally:
+        _defaults.update(previous)
+
+def batch(f, points, names, order=2):
+    """Evaluates f and its derivatives at every row of a matrix of points in one vectorized pass, by
+    giving each named Variable the column of its values; every row gets its own gradient row and
+    Hessian slice, as the values of a Variable do not interact.
+
+    Parameters
+    ==========
+    f        : function
+               objective function with one argument, a dict of variable name to value, that returns a
+               Variable
+    points   : np.array of shape (B, n)
+               one point per row, with one column per variable in names
+    names    : iterable of str
+               variables of f, in the order of the columns of points
+    order    : 0, 1 or 2
+               order of the derivatives returned, as in derivative_order (default 2)
+
+    Output
+    ==========
+    val      : np.array of shape (B,)
+    grad     : np.array of shape (B, n), or None if order is 0
+    hess     : np.array of shape (B, n, n), or None if order is below 2
+
+    Examples
+    ==========
+    >>> def f(values):
+    ...     x1 = Variable(values['x1'], name='x1')
+    ...     x2 = Variable(values['x2'], name='x2')
+    ...     return x1**2 * x2
+    >>> val, grad, hess = batch(f, [[1, 2], [3, 4]], ['x1', 'x2'])
+    >>> grad
+    array([[ 4.,  1.],
+           [24.,  9.]])
+    """
+    names = list(names)
+    points = np.asarray(points, dtype=float)
+    lenn, n = points.shape
+    with derivative_order(order):
+        output = f({name: points[:, j] for (j, name) in enumerate(names)})
+    val = np.broadcast_to(output.val, (lenn,)).copy()
+    if order == 0:
+        return val, None, None
+    grad = np.zeros((lenn, n))
+    for (j, s) in enumerate(names):
+        if s in output.der:
+            grad[:, j] = output.der[s]
+    if order == 1:
+        return val, grad, None
+    hess = np.zeros((lenn, n, n))
+    for (i, s1) in enumerate(names):
+        for (j, s2) in enumerate(names):
+            if s1+s2 in output.der2:
+                hess[:, i, j] = output.der2[s1+s2]
+    return val, grad, hess
+
+def jvp(f, point, v):
+    """Evaluates f at point together with its directional derivative along v, the Jacobian-vector
+    product, with one forward pass that carries a single derivative instead of one per variable.
+
+    Parameters
+    ==========
+    f        : function
+               function with one argument, a dict of variable name to value, that returns a Variable,
+               a list of Variables or a VectorVariable
+    point    : dict of str keys and int/float values
+               point at which f is evaluated
+    v        : dict of str keys and int/float values
+               direction; variables that are not in v have a zero component
+
+    Output
+    ==========
+    val      : np.array
+               values of the outputs of f, flattened
+    dval     : np.array
+               directional derivatives of the outputs of f along v, flattened
+
+    Examples
+    ==========
+    >>> def F(values):
+    ...     x1 = Variable(values['x1'], name='x1')
+    ...     x2 = Variable(values['x2'], name='x2')
+    ...     return [x1 * x2, x1 + 3*x2]
+    >>> jvp(F, {'x1': 2, 'x2': 5}, {'x1': 1, 'x2': -1})
+    (array([10., 17.]), array([ 3., -2.]))
+    """
+    previous = dict(_defaults)
+    _defaults['direction'] = v
+    _defaults['direction_index'] = VariableIndex([_DIRECTION])
+    try:
+        output = f(point)
+    finally:
+        _defaults.update(previous)
+    outputs = output if isinstance(output, (list, tuple)) else [output]
+    val = []
+    dval = []
+    for y in outputs:
+        if isinstance(y, VectorVariable):
+            val.append(y.val)
+            dval.append(y.jacobian(sparse=False)[:, 0] if len(y.index) else np.zeros(len(y.val)))
+            continue
+        # outputs that are not Variables are constants
+        y_val = np.atleast_1d(np.array(getattr(y, 'val', y), dtype=float))
+        val.append(y_val)
+        dval.append(np.broadcast_to(y.der.get(_DIRECTION, 0.0) if isinstance(y, Variable) else 0.0, y_val.shape))
+    return np.hstack(val), np.hstack(dval)
+
+def _pad(arr, n):
+    """Pads a gradient or Hessian array with zeros up to n variables."""
+    if isinstance(arr, SparseHessian):
+        return arr.resize(n)
+    m = arr.shape[1]
+    if m == n:
+        return arr
+    return np.pad(arr, [(0, 0)] + [(0, n-m)]*(arr.ndim-1), mode='constant')
+
 
 class Variable:
     """A Variable class which contains the variable's value and derivatives and has
@@ -20,6 +450,20 @@ class Variable:
     der2     : (optional) dict of str keys and np.array of float/int values
                str keys correspond to variable names, and values are floats/ints corresponding to the partial 
                second derivative with respect to the name key
+    index    : (optional) VariableIndex
+               registry of independent variables; if supplied, the derivatives are kept in the arrays
+               grad and hess over the positions of the index rather than in dictionaries
+    grad     : (optional) np.array of shape (len(val), n)
+               gradient of a Variable created on index, one column per registered variable
+    hess     : (optional) np.array of shape (len(val), n, n) or SparseHessian
+               Hessian of a Variable created on index, over the registered variables that have Hessian entries
+    order    : (optional) 0, 1 or 2
+               highest order of derivatives taken with respect to a named variable: 2 gives it der and der2
+               entries, 1 only der entries, and 0 treats it as a constant. Defaults to the order set by
+               derivative_order, which is 2 unless changed
+    hnames   : (optional) frozenset of str
+               names of the variables that have entries in der2; defaults to all the keys of der if der2 is
+               not empty, and to none otherwise
     Output
     ==========
     Variable : object
@@ -27,6 +471,18 @@ class Variable:
                Variable.val, which is the variable's current value; Variable.der, which is the variable's
                current dictionary of partial derivatives; Variable.der2, which is the variable's
                current dictionary of partial second derivatives;
+               operators never modify val, der or der2 in place, so a result may share its value and
+               these dictionaries with its operands and they should be treated as read-only.
+               Variable uses __slots__, so no other attribute can be set on it
+
+    The in-place operators +=, -= and *= update the Variable on their left, unless it is an independent
+    (named) variable: += and -= only touch the derivatives of the right operand, so that accumulating a sum
+    of terms in a loop takes linear time, and they leave out of der2 the zero entries between names that
+    hessian reads as zero. Storage that may be shared with other Variables is copied before it is changed,
+    and arrays are then updated in their own buffers.
+
+    While a Reverse.Tape is open, a named Variable created without an index is recorded on the tape and
+    returned as a Reverse.Node instead; inside Taylor.taylor it is returned as a Taylor.Taylor polynomial.
 
     Methods
     ==========
@@ -44,21 +500,68 @@ class Variable:
     14.0 {'x1': array([7.]), 'x3': array([2.])} {'x1x1': array([0.]), 'x1x3': array([1.]), 'x3x1': array([1.]), 'x3x3': array([0.])}
     """
 
-    def __init__(self, val, name=None , der=None, der2=None):
+    __slots__ = ('name', 'val', 'index', 'der', 'der2', 'hnames', 'grad', 'hess', '_owned')
+
+    def __new__(cls, val=None, name=None, der=None, der2=None, index=None, grad=None, hess=None,
+                order=None, hnames=None):
+        # val has a default so that copy and pickle can make an empty Variable before restoring its slots
+        if _tapes and name is not None and index is None:
+            return _tapes[-1].variable(val, name if order != 0 else None)
+        if _expansions and name is not None and index is None:
+            return _variable(val, name if order != 0 else None)
+        return super().__new__(cls)
+
+    def __init__(self, val, name=None , der=None, der2=None, index=None, grad=None, hess=None,
+                 order=None, hnames=None):
         """Initializes Variable with a value and a derivative."""
         self.name=name
-        self.val = np.array(val).astype(float)
-        try:
-            lenn=len(self.val)
-        except:
-            lenn=1
+        self.val = np.array(val, dtype=float)
+        self._owned = None
+        self.index = index
+        lenn = self.val.shape[0] if self.val.ndim else 1
+        if name is not None and order is None:
+            order = _default_order(name)
+        if index is not None:
+            if grad is None:
+                # a registered variable has a unit gradient and a zero Hessian; otherwise it is a constant
+                if name is not None and order > 0:
+                    index.register(name, hessian=order > 1)
+                n = len(index)
+                grad = np.zeros((lenn, n))
+                if name is not None and order > 0:
+                    grad[:, index.positions[name]] = 1
+                k = len(index.hessian_columns)
+                if index.sparse:
+                    hess = SparseHessian.empty(lenn, k)
+                else:
+                    hess = np.broadcast_to(0.0, (lenn, k, k))
+            self._set_arrays(grad, hess)
         # if a name is supplied, then create a new variable with its own derivative
-        if name!= None:
-            self.der = {name: np.ones(lenn)} # the first derivative of a variable is 1
-            self.der2 = {name+name: np.zeros(lenn)} # the second derivative of a variable is 0
+        elif name!= None and _defaults['direction'] is not None and order > 0:
+            # inside jvp, the only derivative is the one along the direction
+            self.der = {_DIRECTION: np.ones(lenn) * _defaults['direction'].get(name, 0.0)}
+            self.der2 = {}
+            self.hnames = frozenset()
+        elif name!= None:
+            self.der = {name: np.ones(lenn)} if order > 0 else {} # the first derivative of a variable is 1
+            self.der2 = {name+name: np.zeros(lenn)} if order > 1 else {} # the second derivative of a variable is 0
+            self.hnames = frozenset([name]) if order > 1 else frozenset()
         else:
             self.der = der
             self.der2 = der2
+            if hnames is None:
+                hnames = frozenset(der) if der2 else frozenset()
+            self.hnames = hnames
+
+    def __copy__(self):
+        """Returns a Variable that shares the values and derivative dictionaries of self, which neither of
+        them owns any more, so that their in-place operators copy them before a change."""
+        v = object.__new__(type(self))
+        for slot in self.__slots__:
+            if hasattr(self, slot):
+                setattr(v, slot, getattr(self, slot))
+        self._owned = v._owned = None
+        return v
 
     def __str__(self):
         if self.name==None:
@@ -68,342 +571,1221 @@ class Variable:
 
     def __pos__(self):
         """Returns the Variable itself. Does nothing to value or derivative."""
-        return Variable(self.val, der=self.der, der2=self.der2)
+        if self.index is not None:
+            return self._indexed(self.val, self.grad, self.hess)
+        return self._shared(self.val)
 
     def __neg__(self):
         """Returns a Variable with negated value and derivative."""
+        if self.index is not None:
+            return self._indexed(-self.val, -self.grad, self._hessian([(-1, self.hess)]))
         # first order
-        a=copy.deepcopy(self.der)
-        a2=copy.deepcopy(self.der2)
+        a=self.der
+        a2=self.der2
         der={x: -a.get(x, 0) for x in set(a)}
         # second order
         der2={x: -a2.get(x, 0) for x in set(a2)}
-        return Variable(-self.val, der=der, der2 = der2)
+        return _new(-self.val, der, der2, self.hnames)
 
     def __add__(self, other):
         """Returns a Variable that adds a Variable with another Variable, or with a constant."""
+        if self.index is not None:
+            if isinstance(other, Variable):
+                ga, Ha, gb, Hb = self._operands(other)
+                return self._indexed(self.val+other.val, ga+gb, self._hessian([(1, Ha), (1, Hb)]))
+            return self._indexed(self.val+other, self.grad, self.hess)
         try:
-            a=copy.deepcopy(self.der)
-            a2=copy.deepcopy(self.der2)
-            b=copy.deepcopy(other.der)
-            b2=copy.deepcopy(other.der2)
+            a=self.der
+            a2=self.der2
+            b=other.der
+            b2=other.der2
             # combine derivative dictionaries by adding them
-            der={x: a.get(x, 0) + b.get(x, 0) for x in set(a).union(b)}
-            a2,b2 = self._expand(a,b,a2,b2)
-            der2={x: a2.get(x, 0) + b2.get(x, 0) for x in set(a2).union(b2)}
-            return Variable(self.val+other.val, der=der, der2 = der2)
+            names=set(a).union(b)
+            hn=self.hnames | other.hnames
+            der={x: a.get(x, 0) + b.get(x, 0) for x in names}
+            der2={x+y: a2.get(x+y, _ZERO) + b2.get(x+y, _ZERO) for x in hn for y in hn}
+            return _new(self.val+other.val, der, der2, hn)
         # other is not a Variable
         except AttributeError:
-            return Variable(self.val+other, der=self.der, der2 = self.der2)
+            return self._shared(self.val+other)
 
     def __radd__(self, other):
         """Returns a Variable that adds a constant with a Variable."""
         # other is an constant otherwise other.__add__ is implemented
-        return Variable(self.val+other, der=self.der, der2 = self.der2)
+        if self.index is not None:
+            return self._indexed(self.val+other, self.grad, self.hess)
+        return self._shared(self.val+other)
    
     def __sub__(self, other):
         """Returns a Variable that subtracts a Variable from another Variable, or with a constant."""
+        if self.index is not None:
+            if isinstance(other, Variable):
+                ga, Ha, gb, Hb = self._operands(other)
+                return self._indexed(self.val-other.val, ga-gb, self._hessian([(1, Ha), (-1, Hb)]))
+            return self._indexed(self.val-other, self.grad, self.hess)
         try:
-            a=copy.deepcopy(self.der)
-            a2=copy.deepcopy(self.der2)
-            b=copy.deepcopy(other.der)
-            b2=copy.deepcopy(other.der2)
+            a=self.der
+            a2=self.der2
+            b=other.der
+            b2=other.der2
             # combine derivative dictionaries by subtracting corresponding values
-            der={x: a.get(x, 0) - b.get(x, 0) for x in set(a).union(b)}
-            a2,b2 = self._expand(a,b,a2,b2)
-            der2={x: a2.get(x, 0) - b2.get(x, 0) for x in set(a2).union(b2)}
-            return Variable(self.val-other.val, der=der, der2 = der2)
+            names=set(a).union(b)
+            hn=self.hnames | other.hnames
+            der={x: a.get(x, 0) - b.get(x, 0) for x in names}
+            der2={x+y: a2.get(x+y, _ZERO) - b2.get(x+y, _ZERO) for x in hn for y in hn}
+            return _new(self.val-other.val, der, der2, hn)
         # other is not a Variable
         except AttributeError:
-            return Variable(self.val-other, der=self.der, der2=self.der2)
+            return self._shared(self.val-other)
 
     def __rsub__(self, other):
         """Returns a Variable that subtracts a constant from a Variable."""
         # other is an constant otherwise other.__sub__ is implemented
-        a=copy.deepcopy(self.der)
-        a2=copy.deepcopy(self.der2)
+        if self.index is not None:
+            return self._indexed(other-self.val, -self.grad, self._hessian([(-1, self.hess)]))
+        a=self.der
+        a2=self.der2
         der={x: -a.get(x, 0) for x in set(a)}
         der2={x: -a2.get(x, 0) for x in set(a2)}
-        return Variable(other-self.val, der=der, der2 = der2)
+        return _new(other-self.val, der, der2, self.hnames)
 
     def __mul__(self, other):
         """Returns a Variable that mulitplies a Variable with another Variable, or with a constant."""
-        a=copy.deepcopy(self.der)
-        a2=copy.deepcopy(self.der2)
+        if self.index is not None:
+            if isinstance(other, Variable):
+                ga, Ha, gb, Hb = self._operands(other)
+                pa, pb = self.index.hessian_part(ga), self.index.hessian_part(gb)
+                u, w = self.val, other.val
+                return self._indexed(u*w, _col(w)*ga + _col(u)*gb,
+                                     self._hessian([(w, Ha), (u, Hb)], [(1, pa, pb)]))
+            return self._indexed(self.val*other, _col(other)*self.grad, self._hessian([(other, self.hess)]))
+        a=self.der
+        a2=self.der2
         try:
-            b=copy.deepcopy(other.der)
-            b2=copy.deepcopy(other.der2)
+            b=other.der
+            b2=other.der2
             # combine derivative dictionaries by multiplying one variable's value with the other's derivatives
-            der={x: other.val * a.get(x, 0) + self.val * b.get(x, 0) for x in set(a).union(b)} 
-            a2, b2 = self._expand(a, b, a2, b2)
+            names=set(a).union(b)
+            hn=self.hnames | other.hnames
+            der={x: other.val * a.get(x, 0) + self.val * b.get(x, 0) for x in names} 
             der2 = {}
-            for x in set(a).union(b):
-                for y in set(a).union(b):
-                    der2[x+y] = (other.val * a2.get(x+y,0) + self.val * b2.get(x+y,0) 
+            for x in hn:
+                for y in hn:
+                    der2[x+y] = (other.val * a2.get(x+y,_ZERO) + self.val * b2.get(x+y,_ZERO) 
                             + a.get(x,0)*b.get(y,0) + a.get(y,0)*b.get(x,0))
-            return Variable(self.val * other.val, der=der, der2 = der2)
+            return _new(self.val * other.val, der, der2, hn)
         # other is not a Variable
         except AttributeError:
             der={x: other * a.get(x, 0) for x in set(a)}
             der2={x: other * a2.get(x, 0) for x in set(a2)}
-            return Variable(self.val * other, der=der, der2 = der2)
+            return _new(self.val * other, der, der2, self.hnames)
 
     def __rmul__(self, other):
         """Returns a Variable that mulitplies a constant with a Variable."""
         # other is an constant otherwise other.__mul__ is implemented
+        if self.index is not None:
+            return self._indexed(self.val*other, _col(other)*self.grad, self._hessian([(other, self.hess)]))
         a=self.der
         a2 = self.der2
         der={x: other * a.get(x, 0) for x in set(a)}
         der2={x: other * a2.get(x, 0) for x in set(a2)}
-        return Variable(self.val * other, der=der, der2 = der2)
+        return _new(self.val * other, der, der2, self.hnames)
 
     def __truediv__(self, other):
         """Returns a Variable that divides a Variable from another Variable, or with a constant."""
-        a=copy.deepcopy(self.der)
-        a2=copy.deepcopy(self.der2)
+        if self.index is not None:
+            if isinstance(other, Variable):
+                ga, Ha, gb, Hb = self._operands(other)
+                pa, pb = self.index.hessian_part(ga), self.index.hessian_part(gb)
+                u, w = self.val, other.val
+                return self._indexed(u/w, ga/_col(w) - _col(u/w**2)*gb,
+                                     self._hessian([(1/w, Ha), (-u/w**2, Hb)], [(u/w**3, pb, pb), (-1/w**2, pa, pb)]))
+            return self._indexed(self.val/other, self.grad/_col(other), self._hessian([(1/other, self.hess)]))
+        a=self.der
+        a2=self.der2
         try:
-            b=copy.deepcopy(other.der)
-            b2=copy.deepcopy(other.der2)
-            der={x: 1/other.val * a.get(x, 0) - self.val/other.val**2 * b.get(x, 0) for x in set(a).union(b)} #combine dictionaries and do arithmatics
-            a2,b2 = self._expand(a,b,a2,b2)
+            b=other.der
+            b2=other.der2
+            names=set(a).union(b)
+            hn=self.hnames | other.hnames
+            der={x: 1/other.val * a.get(x, 0) - self.val/other.val**2 * b.get(x, 0) for x in names} #combine dictionaries and do arithmatics
             der2 = {}
-            for x in set(a).union(b):
-                for y in set(a).union(b):
-                    der2[x+y] = (1/other.val*a2.get(x+y,0) - self.val/other.val**2*b2.get(x+y,0) 
+            for x in hn:
+                for y in hn:
+                    der2[x+y] = (1/other.val*a2.get(x+y,_ZERO) - self.val/other.val**2*b2.get(x+y,_ZERO) 
                             +2*self.val/other.val**3*b.get(x,0)*b.get(y,0)
                             -1/other.val**2*a.get(x,0)*b.get(y,0)
                             -1/other.val**2*a.get(y,0)*b.get(x,0))
-            return Variable(self.val / other.val, der=der, der2 = der2)
+            return _new(self.val / other.val, der, der2, hn)
         except AttributeError:
             der={x: a.get(x, 0) / other for x in set(a)} 
             der2={x: a2.get(x, 0) / other for x in set(a2)} 
-            return Variable(self.val / other, der=der, der2 = der2)
+            return _new(self.val / other, der, der2, self.hnames)
 
     def __rtruediv__(self, other):
         """Returns a Variable that divides a constant from a Variable."""
         # other is an constant otherwise other.__itruediv__ is implemented
-        a=copy.deepcopy(self.der)
-        a2=copy.deepcopy(self.der2)
+        if self.index is not None:
+            return self._chain(other/self.val, -other/self.val**2, 2*other/self.val**3)
+        a=self.der
+        a2=self.der2
         der={x: -other/self.val**2 * a.get(x, 0) for x in set(a)} 
         der2 = {}
-        for x in set(a):
-            for y in set(a):
+        for x in self.hnames:
+            for y in self.hnames:
                 der2[x+y] = -other/self.val**2 * a2.get(x+y,0) + 2*other/self.val**3*a.get(x,0)*a.get(y,0)
-        return Variable(other/self.val, der= der, der2 = der2)
+        return _new(other/self.val, der, der2, self.hnames)
 
     def __pow__(self, other):
         """Returns a Variable that raises a Variable to another Variable, or with a constant."""
-        a=copy.deepcopy(self.der)
-        a2=copy.deepcopy(self.der2)
+        if self.index is not None:
+            if isinstance(other, Variable):
+                ga, Ha, gb, Hb = self._operands(other)
+                pa, pb = self.index.hessian_part(ga), self.index.hessian_part(gb)
+                u, w = self.val, other.val
+                cross = u**(w-1) + np.log(u)*u**(w-1)*w
+                return self._indexed(u**w, _col(w*u**(w-1))*ga + _col(np.log(u)*u**w)*gb,
+                                     self._hessian([(w*u**(w-1), Ha), (np.log(u)*u**w, Hb)],
+                                                   [(u**(w-2)*(w**2-w)/2, pa, pa), (cross, pa, pb),
+                                                    (np.log(u)**2*u**w/2, pb, pb)]))
+            u = self.val
+            return self._chain(u**other, other*u**(other-1), other*(other-1)*u**(other-2))
+        a=self.der
+        a2=self.der2
         try:
-            b=copy.deepcopy(other.der)
-            b2=copy.deepcopy(other.der2)
+            b=other.der
+            b2=other.der2
+            names=set(a).union(b)
+            hn=self.hnames | other.hnames
             der={x: other.val * self.val ** (other.val-1) * a.get(x, 0) 
-                + np.log(self.val) * self.val ** other.val * b.get(x, 0) for x in set(a).union(b)} #combine dictionaries and do arithmatics
-            a2,b2 = self._expand(a,b,a2,b2)
+                + np.log(self.val) * self.val ** other.val * b.get(x, 0) for x in names} #combine dictionaries and do arithmatics
             der2 = {}
-            for x in set(a).union(b):
-                for y in set(a).union(b):
-                    der2[x+y] = (other.val * self.val ** (other.val-1) * a2.get(x+y, 0) 
-                        + np.log(self.val) * self.val ** other.val * b2.get(x+y, 0)
+            for x in hn:
+                for y in hn:
+                    der2[x+y] = (other.val * self.val ** (other.val-1) * a2.get(x+y, _ZERO) 
+                        + np.log(self.val) * self.val ** other.val * b2.get(x+y, _ZERO)
                         + a.get(x,0)*a.get(y,0)*(self.val**(other.val-2)*(other.val**2-other.val))
                         + a.get(x,0)*b.get(y,0)*(self.val**(other.val-1)+np.log(self.val)*self.val**(other.val-1)*other.val)
                         + a.get(y,0)*b.get(x,0)*(self.val**(other.val-1)+np.log(self.val)*self.val**(other.val-1)*other.val)
                         + (np.log(self.val))**2*self.val**other.val*b.get(x,0)*b.get(y,0))
-            return Variable(self.val ** other.val, der=der, der2 = der2)
+            return _new(self.val ** other.val, der, der2, hn)
         except AttributeError:
             der={x: other*self.val**(other-1) * a.get(x, 0) for x in set(a)} 
             der2 = {}
-            for x in set(a):
-                for y in set(a):
+            for x in self.hnames:
+                for y in self.hnames:
                     der2[x+y] = other*self.val**(other-2)*((other-1)*a.get(x, 0)*a.get(y,0) + self.val*a2.get(x+y, 0))
-            return Variable(self.val ** other, der= der, der2 = der2)
+            return _new(self.val ** other, der, der2, self.hnames)
 
     def __rpow__(self,other):
         """Returns a Variable that raises a constant to a Variable."""
         # other is an constant otherwise other.__pow__ is implemented
-        a=copy.deepcopy(self.der)
-        a2=copy.deepcopy(self.der2)
+        if self.index is not None:
+            return self._chain(other**self.val, np.log(other)*other**self.val, np.log(other)**2*other**self.val)
+        a=self.der
+        a2=self.der2
         der={x: np.log(other) * other ** self.val * a.get(x, 0) for x in set(a)} 
         der2 = {}
-        for x in set(a):
-            for y in set(a):
+        for x in self.hnames:
+            for y in self.hnames:
                 der2[x+y] = other**self.val*np.log(other)*(np.log(other)*a.get(x, 0)*a.get(y,0)+a2.get(x+y, 0))
-        return Variable(other**self.val, der= der, der2 = der2)
+        return _new(other**self.val, der, der2, self.hnames)
 #y ** x and pow( y,x ) call x .__rpow__( y ), when y doesn’t have __pow__. There is no three-argument form in this case.
 
-    def _expand(self,a,b,a2,b2):
-        for x in set(a).union(b):
-            for y in set(a).union(b):
-                try:
-                    temp = a2[x+y]
-                except KeyError:
-                    a2[x+y] = np.array([0.0])
-                try:
-                    temp = b2[x+y]
-                except KeyError:
-                    b2[x+y] = np.array([0.0])
-        return a2, b2
-    
-    def hessian(self,lis):
-        n=len(lis)
-        output=np.ndarray((n,n))
-        for (i,s1) in enumerate(lis):
-            for (j,s2) in enumerate(lis):
-                output[i,j]=self.der2[s1+s2]
-        return(output)
+    def __iadd__(self, other):
+        """Adds a Variable or a constant to self in place, updating only the derivatives that other has."""
+        return self._accumulate(other, np.add)
+
+    def __isub__(self, other):
+        """Subtracts a Variable or a constant from self in place, updating only the derivatives that other has."""
+        return self._accumulate(other, np.subtract)
+
+    def __imul__(self, other):
+        """Multiplies self by a Variable or a constant in place; a constant scales the owned arrays in place."""
+        if not self._mutable(other):
+            return NotImplemented
+        if isinstance(other, Variable):
+            # every derivative changes, so self takes over the new arrays of the product
+            product = self * other
+            self.val, self.der, self.der2, self.hnames = product.val, product.der, product.der2, product.hnames
+            self._owned = [True, set(self.der), set(self.der2)]
+            return self
+        owned = self._own()
+        self.val = _apply(np.multiply, self.val, other, owned[0])
+        owned[0] = True
+        for (store, keys) in ((self.der, owned[1]), (self.der2, owned[2])):
+            for (x, d) in store.items():
+                store[x] = _apply(np.multiply, d, other, x in keys)
+                keys.add(x)
+        return self
+
+    def _accumulate(self, other, op):
+        """Applies op, np.add or np.subtract, to self and other in place. The second derivatives between the
+        names of self and the new names of other are zero and are left out of der2."""
+        if not self._mutable(other):
+            return NotImplemented
+        owned = self._own()
+        if not isinstance(other, Variable):
+            self.val = _apply(op, self.val, other, owned[0])
+            owned[0] = True
+            return self
+        self.val = _apply(op, self.val, other.val, owned[0])
+        owned[0] = True
+        # other gives up the arrays that self shares, so that its own in-place operators copy them first
+        shared = other._owned[1:] if other._owned is not None else (set(), set())
+        for (store, keys, terms, given) in ((self.der, owned[1], other.der, shared[0]),
+                                            (self.der2, owned[2], other.der2, shared[1])):
+            for (x, d) in terms.items():
+                current = store.get(x)
+                if current is None:
+                    # shared with other until it is updated
+                    store[x] = d if op is np.add else -d
+                    given.discard(x)
+                else:
+                    store[x] = _apply(op, current, d, x in keys)
+                    keys.add(x)
+        if not other.hnames <= self.hnames:
+            self.hnames = self.hnames | other.hnames
+        return self
+
+    def _mutable(self, other):
+        """Returns whether self can be updated in place with other: self is the result of an operation in
+        dictionary mode, never an independent variable, and other is a constant or such a Variable."""
+        if self.name is not None or self.index is not None or isinstance(other, (Node, VectorVariable)):
+            return False
+        return not isinstance(other, Variable) or other.index is None
+
+    def _own(self):
+        """Returns the record of the storage that self owns, [val owned, owned der keys, owned der2 keys],
+        first copying der and der2 if they may be shared with other Variables. Arrays that are not owned
+        are replaced rather than written to."""
+        if self._owned is None:
+            self.der = dict(self.der)
+            self.der2 = dict(self.der2)
+            self._owned = [False, set(), set()]
+        return self._owned
+
+    def _shared(self, val):
+        """Returns a Variable with the value val that shares the derivative dictionaries of self, which self
+        then no longer owns, so that its in-place operators copy them before a change."""
+        self._owned = None
+        return _new(val, self.der, self.der2, self.hnames)
+
+    def _indexed(self, val, grad, hess):
+        """Returns a new Variable on the same index as self."""
+        v = object.__new__(Variable)
+        v.name = None
+        v.val = _floats(val)
+        v.index = self.index
+        v._owned = None
+        v._set_arrays(grad, hess)
+        return v
+
+    def _set_arrays(self, grad, hess):
+        """Sets the gradient and Hessian arrays of an indexed Variable and their der and der2 views."""
+        self.hnames = None
+        self.grad = grad
+        self.hess = hess
+        self.der = _GradView(grad, self.index)
+        if isinstance(hess, SparseHessian):
+            self.der2 = _SparseHessView(hess, self.index)
+        else:
+            self.der2 = _HessView(hess, self.index)
+
+    def _operands(self, other):
+        """Returns the gradients and Hessians of self and other padded to a common number of variables."""
+        if other.index is not self.index:
+            raise ValueError('cannot combine Variables that are not registered in the same VariableIndex')
+        n = max(self.grad.shape[1], other.grad.shape[1])
+        k = max(self.hess.shape[1], other.hess.shape[1])
+        return _pad(self.grad, n), _pad(self.hess, k), _pad(other.grad, n), _pad(other.hess, k)
+
+    def _chain(self, val, d1, d2, op=None):
+        """Returns the Variable f(self) of an indexed Variable given f, f' and f'' evaluated at self.val;
+        op is the elementary function f, which only Reverse.Node records."""
+        p = self.index.hessian_part(self.grad)
+        return self._indexed(val, _col(d1)*self.grad, self._hessian([(d1, self.hess)], [(d2/2, p, p)]))
+
+    def _hessian(self, scaled, outers=()):
+        """Returns the Hessian sum(c*H for (c, H) in scaled) + sum(c*(p q' + q p') for (c, p, q) in outers),
+        where p and q are the Hessian parts of gradients. It is kept as a SparseHessian while the index is
+        sparse and the fill ratio over all its Hessian variables stays at most index.density, and as an
+        np.array otherwise."""
+        if self.index.sparse and all(isinstance(H, SparseHessian) for (c, H) in scaled):
+            output = SparseHessian.combine(scaled, outers)
+            if output.fill(len(self.index.hessian_names)) <= self.index.density:
+                return output
+            return output.toarray()
+        output = 0
+        for (c, H) in scaled:
+            output = output + _col2(c) * _dense(H)
+        for (c, p, q) in outers:
+            pq = _outer(p, q)
+            output = output + _col2(c) * (pq + pq.transpose(0, 2, 1))
+        return output
+
+    def hessian(self,lis,sparse=None):
+        """Returns the Hessian with respect to the variables named in lis, as an np.array or, if sparse
+        is True, as a scipy.sparse.csr_matrix; by default a sparse matrix is returned for a Variable whose
+        Hessian is stored as a SparseHessian. For array values there is one matrix per value."""
+        if self.index is not None:
+            ids = [self.index.hpositions[s] for s in lis]
+            if isinstance(self.hess, SparseHessian):
+                if sparse is None or sparse:
+                    output = self.hess.resize(max(ids + [self.hess.k-1]) + 1).select(ids)
+                    return output[0] if len(output) == 1 else output
+                H = self.hess.toarray()
+            else:
+                H = self.hess
+            output = _pad(H, max(ids + [H.shape[1]-1]) + 1)[:, ids][:, :, ids]
+        else:
+            n=len(lis)
+            lenn=max([np.size(self._second(s1, s2)) for s1 in lis for s2 in lis] + [1])
+            output=np.ndarray((lenn,n,n))
+            for (i,s1) in enumerate(lis):
+                for (j,s2) in enumerate(lis):
+                    output[:,i,j]=self._second(s1, s2)
+        if sparse:
+            output = [scipy.sparse.csr_matrix(H) for H in output]
+        return output[0] if len(output) == 1 else output
+
+    def _second(self, s1, s2):
+        """Returns the der2 entry of s1 and s2; in-place operators leave out the zero entries between names
+        that both have second derivatives."""
+        try:
+            return self.der2[s1+s2]
+        except KeyError:
+            if s1 in self.hnames and s2 in self.hnames:
+                return _ZERO
+            raise
+
+
+def _floats(val):
+    """Returns val as an np.array of floats, without a copy if it already is one."""
+    if type(val) is np.ndarray and val.dtype == np.float64:
+        return val
+    return np.asarray(val, dtype=float)
+
+def _apply(op, a, b, owned):
+    """Returns op(a, b), written into a if a is owned and has the shape of the result."""
+    if owned and type(a) is np.ndarray and np.shape(b) in ((), a.shape):
+        return op(a, b, out=a)
+    return op(a, b)
+
+def _new(val, der, der2, hnames):
+    """Returns the dictionary-mode Variable of an internal operation, without the checks and the copy of
+    Variable.__init__; the values and derivatives computed by the operations are never modified in place, so
+    they may be shared between Variables."""
+    v = object.__new__(Variable)
+    v.name = None
+    v.val = _floats(val)
+    v.index = None
+    v.der = der
+    v.der2 = der2
+    v.hnames = hnames
+    v._owned = None
+    return v
+
+def _columns(J, n):
+    """Pads a Jacobian with zero columns up to n variables."""
+    if J.shape[1] == n:
+        return J
+    if scipy.sparse.issparse(J):
+        J = J.tocsr(copy=True)
+        J.resize((J.shape[0], n))
+        return J
+    return _pad(J, n)
+
+def _scale(d, J, m):
+    """Returns the Jacobian J with its rows, broadcast to m, multiplied by d."""
+    d = np.broadcast_to(d, (m,))
+    if scipy.sparse.issparse(J):
+        if J.shape[0] != m:
+            J = scipy.sparse.vstack([J] * m)
+        return scipy.sparse.csr_matrix(scipy.sparse.diags(d) @ J)
+    return d[:, None] * J
+
+
+class VectorVariable:
+    """A vector-valued function of named variables, with its value as one array of shape (m,) and its
+    derivatives as one Jacobian array of shape (m, n), whose columns are the names of a VariableIndex.
+    The overloaded operators and the elementary functions act on all components together; only first
+    derivatives are propagated.
+
+    Parameters
+    ==========
+    val      : list or np.array
+               values of the components
+    names    : (optional) list of str
+               one name per component, registering the components as independent variables, whose
+               Jacobian is the identity; without names and jac the VectorVariable is a constant
+    index    : (optional) VariableIndex
+               registry of the columns of the Jacobian; VectorVariables combined together must share it.
+               A new one is made if not supplied
+    jac      : (optional) np.array or scipy.sparse matrix of shape (m, n)
+               Jacobian of the components
+    sparse   : (optional) bool
+               if True, the Jacobian of named components is stored as a scipy.sparse.csr_matrix, and so
+               are the Jacobians computed from it (default False)
+
+    Output
+    ==========
+    VectorVariable : object
+               Contains VectorVariable.val, VectorVariable.jac and VectorVariable.index
+
+    Examples
+    ==========
+    >>> x = VectorVariable([1., 2., 3.], names=['x1', 'x2', 'x3'])
+    >>> f = x[1:] * x[:-1] - exp(x[:1])
+    >>> f.jacobian()
+    array([[-0.71828183,  1.        ,  0.        ],
+           [-2.71828183,  3.        ,  2.        ]])
+    """
+
+    # make NumPy defer to the reflected operators below
+    __array_ufunc__ = None
+
+    def __init__(self, val, names=None, index=None, jac=None, sparse=False):
+        self.val = np.atleast_1d(np.array(val, dtype=float))
+        m = len(self.val)
+        if names is not None and len(names) != m:
+            raise ValueError('names must have one name per component')
+        if jac is None:
+            rows, cols, data = [], [], []
+            if _defaults['direction'] is not None:
+                # inside jvp, the only column is the one of the direction, which is kept dense
+                index = _defaults['direction_index']
+                sparse = False
+                if names is not None:
+                    rows, cols = range(m), [0]*m
+                    data = [_defaults['direction'].get(name, 0.0) for name in names]
+            else:
+                if index is None:
+                    index = VariableIndex()
+                if names is not None:
+                    # inside derivative_order(seed=...), the other components are constants
+                    seed = _defaults['seed']
+                    rows = [i for (i, name) in enumerate(names) if seed is None or name in seed]
+                    data = [1.0]*len(rows)
+                    cols = [index.register(names[i], hessian=False) for i in rows]
+            jac = scipy.sparse.csr_matrix((data, (rows, cols)), shape=(m, len(index)))
+            if not sparse:
+                jac = jac.toarray()
+        self.index = index
+        self.jac = jac
+
+    def __str__(self):
+        return 'ad.VectorVariable(val={},\n jac={})'.format(self.val, self.jacobian())
+
+    def __len__(self):
+        return len(self.val)
+
+    def jacobian(self, names=None, sparse=None):
+        """Returns the Jacobian with one column per name in names, by default all the names of the index in
+        registration order, as an np.array or, if sparse is True, as a scipy.sparse.csr_matrix; by default
+        in the storage of VectorVariable.jac."""
+        J = _columns(self.jac, len(self.index))
+        if names is not None:
+            J = J[:, [self.index.positions[name] for name in names]]
+        if sparse is None:
+            sparse = scipy.sparse.issparse(J)
+        if sparse:
+            return scipy.sparse.csr_matrix(J)
+        return J.toarray() if scipy.sparse.issparse(J) else np.asarray(J)
+
+    def _vector(self, val, jac):
+        """Returns a VectorVariable on the same index."""
+        return VectorVariable(val, index=self.index, jac=jac)
+
+    def _operand(self, other):
+        """Returns the value and the Jacobian of other padded to the columns of self, or None for a constant."""
+        if isinstance(other, VectorVariable):
+            if other.index is not self.index:
+                raise ValueError('cannot combine VectorVariables that are not registered in the same VariableIndex')
+            return other.val, _columns(other.jac, len(self.index))
+        if isinstance(other, (Variable, Node)):
+            raise TypeError('cannot combine a VectorVariable with a Variable')
+        return np.asarray(other, dtype=float), None
+
+    def _binary(self, val, du, other_jac, dw):
+        """Returns the VectorVariable val whose Jacobian is du*self.jac + dw*other_jac, row by row."""
+        m = len(np.atleast_1d(val))
+        jac = _scale(du, _columns(self.jac, len(self.index)), m)
+        if other_jac is not None:
+            jac = jac + _scale(dw, other_jac, m)
+        return self._vector(val, jac)
+
+    def _chain(self, val, d1, d2=None, op=None):
+        """Returns the VectorVariable f(self) given f and f' evaluated at self.val."""
+        return self._binary(val, d1, None, None)
+
+    def __getitem__(self, key):
+        rows = np.atleast_1d(np.arange(len(self.val))[key])
+        return self._vector(self.val[rows], self.jac[rows])
+
+    def __pos__(self):
+        return self._vector(self.val, self.jac)
+
+    def __neg__(self):
+        return self._vector(-self.val, -self.jac)
+
+    def __add__(self, other):
+        w, Jw = self._operand(other)
+        return self._binary(self.val + w, 1.0, Jw, 1.0)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        w, Jw = self._operand(other)
+        return self._binary(self.val - w, 1.0, Jw, -1.0)
+
+    def __rsub__(self, other):
+        return (-self).__add__(other)
+
+    def __mul__(self, other):
+        w, Jw = self._operand(other)
+        return self._binary(self.val * w, w, Jw, self.val)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        w, Jw = self._operand(other)
+        return self._binary(self.val / w, 1/w, Jw, -self.val/w**2)
+
+    def __rtruediv__(self, other):
+        w = np.asarray(other, dtype=float)
+        return self._chain(w / self.val, -w/self.val**2)
+
+    def __pow__(self, other):
+        w, Jw = self._operand(other)
+        u = self.val
+        if Jw is None:
+            return self._chain(u**w, w*u**(w-1))
+        return self._binary(u**w, w*u**(w-1), Jw, np.log(u)*u**w)
+
+    def __rpow__(self, other):
+        w = np.asarray(other, dtype=float)
+        return self._chain(w**self.val, np.log(w)*w**self.val)
+
+    def __rmatmul__(self, other):
+        """Returns the VectorVariable A @ self for a constant matrix A, dense or scipy.sparse."""
+        if scipy.sparse.issparse(self.jac):
+            return self._vector(other @ self.val, scipy.sparse.csr_matrix(other) @ self.jac)
+        return self._vector(other @ self.val, other @ self.jac)
+
+    def sum(self):
+        """Returns the sum of the components as a VectorVariable with one component."""
+        return self._vector(np.sum(self.val), np.asarray(self.jac.sum(axis=0)).reshape(1, -1))
+
+
+def concatenate(vectors):
+    """Returns the VectorVariable whose components are those of vectors, in order; the Jacobian is sparse
+    if any of the Jacobians is.
+
+    Parameters
+    ==========
+    vectors  : list of VectorVariable
+               sharing the same VariableIndex
+    """
+    index = vectors[0].index
+    if any(v.index is not index for v in vectors):
+        raise ValueError('cannot combine VectorVariables that are not registered in the same VariableIndex')
+    jacs = [_columns(v.jac, len(index)) for v in vectors]
+    if any(scipy.sparse.issparse(J) for J in jacs):
+        jac = scipy.sparse.csr_matrix(scipy.sparse.vstack(jacs))
+    else:
+        jac = np.vstack(jacs)
+    return VectorVariable(np.hstack([v.val for v in vectors]), index=index, jac=jac)
+
+
+# REDUCTIONS AND PRODUCTS
+
+def sum(obj):
+    """Returns the sum of the values of an array-valued Variable as a Variable with one value. Each
+    derivative array is summed in one product over all the names, so that a loss over a large array costs a
+    few array operations instead of one operator call per value.
+
+    Parameters
+    ==========
+    obj      : Variable, VectorVariable, Reverse.Node, Taylor.Taylor or constant np.array
+               a list of Variables, Nodes or Taylor polynomials with one value each is summed as one array-valued operand
+
+    Examples
+    ==========
+    >>> w = Variable(2, name='w')
+    >>> X = np.array([1., 2., 3.])
+    >>> loss = sum((w*X - X)**2)
+    >>> loss.val, loss.der['w'], loss.der2['ww']
+    (array(14.), array([28.]), array([28.]))
+    """
+    obj = _operand(obj)
+    if isinstance(obj, (Node, VectorVariable, Taylor)):
+        return obj.sum()
+    if isinstance(obj, Variable):
+        return _contract(np.ones(np.size(obj.val)), obj)
+    return np.sum(obj)
+
+def mean(obj):
+    """Returns the mean of the values of an array-valued Variable as a Variable with one value; see sum."""
+    obj = _operand(obj)
+    if isinstance(obj, Taylor):
+        return obj.sum() / obj.size()
+    if isinstance(obj, (Node, VectorVariable)):
+        return obj.sum() / np.size(obj.val)
+    if isinstance(obj, Variable):
+        n = np.size(obj.val)
+        return _contract(np.full(n, 1/n), obj)
+    return np.mean(obj)
+
+def dot(a, b):
+    """Returns the inner product of two one-dimensional operands as a Variable with one value. The first
+    derivatives, and the second derivatives of every pair of names, of the product of two Variables each
+    take one matrix product, and so do those of a Variable and a constant array.
+
+    Parameters
+    ==========
+    a, b     : Variable, VectorVariable, Reverse.Node, Taylor.Taylor or constant np.array
+               a list of Variables, Nodes or Taylor polynomials with one value each is taken as one array-valued operand
+
+    Examples
+    ==========
+    >>> w = [Variable(1, name='w1'), Variable(2, name='w2')]
+    >>> x = np.array([3., 4.])
+    >>> f = dot(w, x) * dot(w, w)
+    >>> f.val, f.der['w1'], f.der2['w1w2']
+    (array(55.), array([37.]), array([20.]))
+    """
+    a, b = _operand(a), _operand(b)
+    if isinstance(a, Variable) and isinstance(b, Variable) and a.index is None and b.index is None:
+        return _inner(a, b)
+    if _differentiable(a) and _differentiable(b):
+        return sum(a * b)
+    if _differentiable(b):
+        return _linear(_constant(a, (1,)), b)
+    if _differentiable(a):
+        return _linear(_constant(b, (1,)), a)
+    return np.dot(a, b)
+
+def matmul(a, b):
+    """Returns the matrix product of a constant matrix, dense or scipy.sparse, and an array-valued operand,
+    in either order, with all the derivative arrays of a Variable multiplied by the matrix in one product.
+    The product of two differentiable operands is their inner product, see dot.
+
+    Parameters
+    ==========
+    a, b     : Variable, VectorVariable, Reverse.Node, Taylor.Taylor or constant np.array or scipy.sparse matrix
+               a list of Variables, Nodes or Taylor polynomials with one value each is taken as one array-valued operand
+
+    Examples
+    ==========
+    >>> w = [Variable(1, name='w1'), Variable(2, name='w2')]
+    >>> X = np.array([[1., 0.], [1., 1.], [1., 2.]])
+    >>> y = matmul(X, w)
+    >>> y.val, y.der['w2']
+    (array([1., 3., 5.]), array([0., 1., 2.]))
+    """
+    a, b = _operand(a), _operand(b)
+    if _differentiable(a) and _differentiable(b):
+        return dot(a, b)
+    if _differentiable(b):
+        return _linear(_constant(a, (1, 2)), b)
+    if _differentiable(a):
+        return _linear(_constant(b, (1, 2)).T, a)
+    return a @ b
+
+def _differentiable(x):
+    """Returns whether x carries derivatives, rather than being a constant."""
+    return isinstance(x, (Variable, VectorVariable, Node, Taylor))
+
+def _constant(c, ndims):
+    """Returns a constant operand as an np.array of floats, or as a scipy.sparse matrix, with ndims dimensions."""
+    if not scipy.sparse.issparse(c):
+        c = np.asarray(c, dtype=float)
+    if c.ndim not in ndims:
+        raise ValueError('expected a constant with {} dimensions, not {}'.format(' or '.join(map(str, ndims)), c.ndim))
+    return c
+
+def _operand(obj):
+    """Returns a list or tuple of Variables, Nodes or Taylor polynomials with one value each as one operand
+    holding their values, a list of numbers as an np.array, and any other operand unchanged."""
+    if not isinstance(obj, (list, tuple)):
+        return obj
+    if any(isinstance(x, Node) for x in obj):
+        return _stack(obj)
+    if any(isinstance(x, Taylor) for x in obj):
+        return Taylor.stack(obj)
+    if any(isinstance(x, Variable) for x in obj):
+        return _gather(obj)
+    return np.asarray(obj, dtype=float)
+
+def _gather(items):
+    """Returns the Variable whose values are those of a list of Variables and constants with one value each."""
+    variables = [x for x in items if isinstance(x, Variable)]
+    if any(np.size(x.val) != 1 for x in variables):
+        raise ValueError('the Variables of a list operand must have one value each')
+    val = np.array([np.sum(getattr(x, 'val', x)) for x in items], dtype=float)
+    first = variables[0]
+    if first.index is not None:
+        if any(x.index is not first.index for x in variables):
+            raise ValueError('cannot combine Variables that are not registered in the same VariableIndex')
+        n = max(x.grad.shape[1] for x in variables)
+        k = max(x.hess.shape[1] for x in variables)
+        grad = np.zeros((len(items), n))
+        hess = np.zeros((len(items), k, k))
+        for (i, x) in enumerate(items):
+            if isinstance(x, Variable):
+                H = _dense(x.hess)
+                grad[i, :x.grad.shape[1]] = x.grad[0]
+                hess[i, :H.shape[1], :H.shape[1]] = H[0]
+        return first._indexed(val, grad, hess)
+    der, der2 = {}, {}
+    for (i, x) in enumerate(items):
+        if isinstance(x, Variable):
+            for (store, terms) in ((der, x.der), (der2, x.der2)):
+                for (key, d) in terms.items():
+                    if key not in store:
+                        store[key] = np.zeros(len(items))
+                    store[key][i:i+1] = d
+    return _new(val, der, der2, frozenset().union(*(x.hnames for x in variables)))
+
+def _linear(A, x):
+    """Returns A @ x for a constant A of shape (L,) or (m, L) and a differentiable operand x with L values."""
+    if isinstance(x, Variable):
+        return _contract(A, x)
+    if isinstance(x, VectorVariable):
+        return x.__rmatmul__(A.reshape(1, -1) if A.ndim == 1 else A)
+    if isinstance(x, Taylor):
+        if scipy.sparse.issparse(A):
+            A = A.toarray()
+        return Taylor(A @ x.coeffs)
+    # a Node only records elementwise operations, so every row of A takes one product and one sum
+    if scipy.sparse.issparse(A):
+        A = A.toarray()
+    if A.ndim == 1:
+        return (A * x).sum()
+    return _stack([(row * x).sum() for row in A])
+
+def _contract(A, obj):
+    """Returns the Variable A @ obj for a constant A of shape (L,) or (m, L) and a Variable obj with L values,
+    multiplying the derivative arrays of all the names by A in one product."""
+    L = A.shape[-1]
+    m = A.shape[0] if A.ndim == 2 else 1
+    u = np.broadcast_to(np.reshape(obj.val, -1), (L,))
+    val = A @ u
+    if obj.index is not None:
+        n = obj.grad.shape[1]
+        grad = (A @ np.broadcast_to(obj.grad, (L, n))).reshape(m, n)
+        H = obj.hess
+        if isinstance(H, SparseHessian):
+            data = (A @ np.broadcast_to(H.data, (L, H.data.shape[1]))).reshape(m, -1)
+            return obj._indexed(val, grad, SparseHessian(H.rows, H.cols, data, H.k))
+        k = H.shape[1]
+        hess = (A @ np.broadcast_to(H, (L, k, k)).reshape(L, k*k)).reshape(m, k, k)
+        return obj._indexed(val, grad, hess)
+    return _new(val, _rows(A, obj.der, L, m), _rows(A, obj.der2, L, m), obj.hnames)
+
+def _rows(A, store, L, m):
+    """Returns the dictionary of the products of A with the derivative arrays of store."""
+    keys = list(store)
+    product = (A @ _matrix(store, keys, L)).reshape(m, len(keys))
+    return dict(zip(keys, np.ascontiguousarray(product.T)))
+
+def _matrix(store, keys, L):
+    """Returns the derivative arrays of store for keys, broadcast to L values, as the columns of an array of
+    shape (L, len(keys)), with zero columns for the missing keys."""
+    D = np.zeros((L, len(keys)))
+    for (j, key) in enumerate(keys):
+        d = store.get(key)
+        if d is not None:
+            D[:, j] = d
+    return D
+
+def _inner(a, b):
+    """Returns the dictionary-mode Variable a . b. The first derivatives are the products of the values of
+    each operand with the derivative columns of the other, and the second derivatives between two names add
+    the cross terms da/dx . db/dy + da/dy . db/dx, all of which are products of whole matrices."""
+    u, w = np.reshape(a.val, -1), np.reshape(b.val, -1)
+    L = max(u.size, w.size)
+    u, w = np.broadcast_to(u, (L,)), np.broadcast_to(w, (L,))
+    hn = a.hnames | b.hnames
+    names = list(dict.fromkeys([*a.der, *b.der, *hn]))
+    Da, Db = _matrix(a.der, names, L), _matrix(b.der, names, L)
+    grad = w @ Da + u @ Db
+    der = {x: grad[j:j+1] for (j, x) in enumerate(names) if x in a.der or x in b.der}
+    der2 = {}
+    if hn:
+        h = [x for x in names if x in hn]
+        pairs = [x+y for x in h for y in h]
+        columns = [names.index(x) for x in h]
+        cross = Da[:, columns].T @ Db[:, columns]
+        second = (w @ _matrix(a.der2, pairs, L) + u @ _matrix(b.der2, pairs, L)).reshape(len(h), len(h))
+        second += cross + cross.T
+        der2 = {x+y: second[i, j:j+1] for (i, x) in enumerate(h) for (j, y) in enumerate(h)}
+    return _new(u @ w, der, der2, hn)
 
 
 # ELEMENTARY FUNCTIONS
 
+def _unary(obj, val, d1, d2, op=None):
+    """Returns the Variable f(obj) of an elementwise function given f, f' and f'' evaluated once at obj.val.
+    In dictionary mode the first derivatives are d1 times those of obj, and the second derivatives of all
+    the pairs of names are d1 times those of obj plus d2 times the outer product of its first derivatives,
+    computed together for the upper triangle of pairs, whose arrays are shared with the symmetric pairs.
+    Indexed Variables, VectorVariables, Reverse.Nodes and Taylor polynomials apply their own chain rule; op is
+    f, which a Node records to replay it and a Taylor polynomial looks up its recurrence by."""
+    if not isinstance(obj, Variable) or obj.index is not None:
+        return obj._chain(val, d1, d2, op)
+    a, a2 = obj.der, obj.der2
+    der = {x: d1 * d for (x, d) in a.items()}
+    h = list(obj.hnames)
+    if len(h) < 2:
+        der2 = {x+x: d1 * a2.get(x+x, _ZERO) + d2 * a.get(x, _ZERO)**2 for x in h}
+        return _new(val, der, der2, obj.hnames)
+    rows, cols = np.triu_indices(len(h))
+    L = max([np.size(val)] + [np.size(a[x]) for x in h if x in a])
+    D = _matrix(a, h, L).T
+    second = (d2 * D)[rows] * D[cols]
+    S = np.zeros(second.shape)
+    for (p, (i, j)) in enumerate(zip(rows, cols)):
+        s = a2.get(h[i]+h[j])
+        if s is not None:
+            S[p] = s
+    second += np.multiply(S, d1, out=S)
+    der2 = {}
+    for (p, (i, j)) in enumerate(zip(rows, cols)):
+        der2[h[i]+h[j]] = der2[h[j]+h[i]] = second[p]
+    return _new(val, der, der2, obj.hnames)
+
+# user-defined and built-in elementwise functions, by name, see primitive
+primitives = {}
+
+def primitive(name, derivatives):
+    """Registers an elementwise function with analytic derivatives as a primitive, so that it is
+    differentiated as one operation, with f, f' and f'' computed together, instead of being decomposed into
+    the operators and elementary functions that compute it.
+
+    Parameters
+    ==========
+    name        : str
+                  name of the function in AutoDiff.AutoDiff.primitives; registering a name again replaces it
+    derivatives : function
+                  takes the values as an np.array and returns f, f' and f'' at those values, so that they can
+                  share their intermediate results
+
+    Output
+    ==========
+    function    : function
+                  applies the primitive to a Variable, a VectorVariable or a Reverse.Node. It is named name,
+                  so that, assigned to that name at the top level of the module of derivatives, it can be
+                  pickled, for instance to be sent to MultiStart or Partition worker processes
+
+    Examples
+    ==========
+    >>> def _cube(u):
+    ...     return u**3, 3*u**2, 6*u
+    >>> cube = primitive('cube', _cube)
+    >>> x = Variable(2, name='x')
+    >>> f = cube(x)
+    >>> f.val, f.der['x'], f.der2['xx']
+    (array(8.), array([12.]), array([12.]))
+    """
+    def function(obj):
+        return _unary(obj, *derivatives(obj.val), function)
+    function.__name__ = function.__qualname__ = name
+    function.__module__ = derivatives.__module__
+    function.__doc__ = 'Returns the primitive {} of the Variable.'.format(name)
+    primitives[name] = function
+    return function
+
 def exp(obj):
     """Returns a Variable that is e raised to that Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: np.exp(obj.val) * a.get(x, 0) for x in set(a)}
-    der2 = {x: np.exp(obj.val) * (a.get(x, 0)**2+a2.get(x,0)) for x in set(a2)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = np.exp(obj.val)*(a.get(x, 0)*a.get(y, 0)+a2.get(x+y,0))
     val = np.exp(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    return _unary(obj, val, val, val, exp)
 
 def log(obj):
     """Returns the log (base e) of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: 1/obj.val * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = (-a.get(x, 0)*a.get(y, 0)+obj.val*a2.get(x, 0))/obj.val**2
-    val = np.log(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    return _unary(obj, np.log(obj.val), 1/obj.val, -1/obj.val**2, log)
 
 # TRIGONOMETRIC FUNCTIONS
 def sin(obj):
     """Returns the sine of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: np.cos(obj.val) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = np.cos(obj.val)*a2.get(x+y, 0)-np.sin(obj.val)*a.get(x,0)*a.get(y,0)
-    val = np.sin(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    s, c = np.sin(obj.val), np.cos(obj.val)
+    return _unary(obj, s, c, -s, sin)
 
 def cos(obj):
     """Returns the cosine of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: -np.sin(obj.val) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = -np.sin(obj.val)*a2.get(x, 0) - np.cos(obj.val)*a.get(x,0)*a.get(y,0)
-    val = np.cos(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    s, c = np.sin(obj.val), np.cos(obj.val)
+    return _unary(obj, c, -s, -c, cos)
 
 def tan(obj):
     """Returns the tangent of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: (1+np.tan(obj.val)**2) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = (1+np.tan(obj.val)**2)*(a2.get(x, 0)+2*np.tan(obj.val)*a.get(x,0)*a.get(y,0))
     val = np.tan(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    d1 = 1 + val**2
+    return _unary(obj, val, d1, 2*val*d1, tan)
 
 # HYPERBOLIC FUNCTIONS
 def sinh(obj):
     """Returns the hyperbolic sine of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: np.cosh(obj.val) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = np.cosh(obj.val)*a2.get(x, 0) + np.sinh(obj.val)*a.get(x, 0)*a.get(y,0)
-    val = np.sinh(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    s, c = np.sinh(obj.val), np.cosh(obj.val)
+    return _unary(obj, s, c, s, sinh)
 
 def cosh(obj):
     """Returns the hyperbolic cosine of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: np.sinh(obj.val) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = np.sinh(obj.val)*a2.get(x, 0) + np.cosh(obj.val)*a.get(x, 0)*a.get(y,0)
-    val = np.cosh(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    s, c = np.sinh(obj.val), np.cosh(obj.val)
+    return _unary(obj, c, s, c, cosh)
 
 def tanh(obj):
     """Returns the hyperbolic tangent of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: (1-np.tanh(obj.val)**2) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = (1-np.tanh(obj.val)**2)*(a2.get(x, 0)-2*np.tanh(obj.val)*a.get(x, 0)*a.get(y,0))
     val = np.tanh(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    d1 = 1 - val**2
+    return _unary(obj, val, d1, -2*val*d1, tanh)
 
 # Inverse trigonometric functions
 def arcsin(obj):
     """Returns the inverse sine of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: (1-(obj.val)**2)**(-0.5) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = (1-(obj.val)**2)**(-1.5)*(obj.val*a.get(x, 0)*a.get(y,0)-(obj.val**2-1)*a2.get(x, 0))
-    val = np.arcsin(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    u = obj.val
+    return _unary(obj, np.arcsin(u), (1-u**2)**(-0.5), u*(1-u**2)**(-1.5), arcsin)
 
 def arccos(obj):
     """Returns the inverse cosine of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: -(1-(obj.val)**2)**(-0.5) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = -(1-(obj.val)**2)**(-1.5)*(obj.val*a.get(x, 0)*a.get(y,0)+a2.get(x, 0)-obj.val**2*a2.get(x, 0))
-    val = np.arccos(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    u = obj.val
+    return _unary(obj, np.arccos(u), -(1-u**2)**(-0.5), -u*(1-u**2)**(-1.5), arccos)
 
 def arctan(obj):
     """Returns the inverse tangent of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: 1/(1+(obj.val)**2) * a.get(x, 0) for x in set(a)}
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = (1+(obj.val)**2)**(-2)*(-2*obj.val*a.get(x, 0)*a.get(y,0)+(obj.val**2+1)*a2.get(x, 0))
-    val = np.arctan(obj.val)
-    return Variable(val, der = der, der2 = der2)
+    u = obj.val
+    return _unary(obj, np.arctan(u), 1/(1+u**2), (1+u**2)**(-2)*(-2*u), arctan)
 
 def sqrt(obj):
     """Returns the square root of the Variable."""
-    a = obj.der
-    a2 = obj.der2
-    der = {x: 0.5*obj.val**(0.5-1) * a.get(x, 0) for x in set(a)} 
-    der2 = {}
-    for x in set(a):
-        for y in set(a):
-            der2[x+y] = 0.5*obj.val**(0.5-2)*((0.5-1)*a.get(x, 0)*a.get(y,0) + obj.val*a2.get(x+y, 0))
-    return Variable(obj.val ** 0.5, der= der, der2 = der2)
+    u = obj.val
+    return _unary(obj, u**0.5, 0.5*u**(-0.5), -0.25*u**(-1.5), sqrt)
 
 def sigmoid(obj):
     """Returns the logistic function value, 1st der and 2nd der of the Variable."""
-    x = 1/(1+exp(-1*obj))
-    return x
+    s = scipy.special.expit(obj.val)
+    d1 = s*(1 - s)
+    return _unary(obj, s, d1, d1*(1 - 2*s), sigmoid)
+
+primitives.update({f.__name__: f for f in (exp, log, sin, cos, tan, sinh, cosh, tanh, arcsin, arccos, arctan,
+                                           sqrt, sigmoid)})
+
+def _erf(u):
+    d1 = 2/np.sqrt(np.pi) * np.exp(-u**2)
+    return scipy.special.erf(u), d1, -2*u*d1
+
+def _softplus(u):
+    s = scipy.special.expit(u)
+    return np.logaddexp(0, u), s, s*(1 - s)
+
+erf = primitive('erf', _erf)
+softplus = primitive('softplus', _softplus)
+
+def logsumexp(obj):
+    """Returns log(sum(exp(obj))) over the values of an array-valued Variable as a Variable with one value,
+    shifted by the largest value so that it does not overflow. It is one operation: its gradient is the
+    softmax p of the values and its Hessian diag(p) - p p', applied to the stacked derivative columns of obj;
+    a VectorVariable, a Reverse.Node or a Taylor polynomial is reduced with exp, sum and log, and a Node records
+    its shift on the tape, so that a Trace replay shifts by the largest value at its own point. See sum for the
+    operands."""
+    obj = _operand(obj)
+    if not _differentiable(obj):
+        return scipy.special.logsumexp(obj)
+    if isinstance(obj, Node):
+        # the shift is recorded, so that a replay of the tape shifts by the largest value at its own point
+        top = obj.shift()
+        return log(sum(exp(obj - top))) + top
+    u = np.reshape(obj.val, -1)
+    top = np.max(u)
+    if isinstance(obj, (VectorVariable, Taylor)):
+        return log(sum(exp(obj - top))) + top
+    p = np.exp(u - top)
+    total = np.sum(p)
+    p = p / total
+    val = np.log(total) + top
+    L = u.size
+    if obj.index is not None:
+        G = np.broadcast_to(obj.grad, (L, obj.grad.shape[1]))
+        g = p @ G
+        P = obj.index.hessian_part(G)
+        k = max(obj.hess.shape[1], P.shape[1])
+        H, P = _dense(_pad(obj.hess, k)), _pad(P, k)
+        Pp = p @ P
+        hess = ((p @ np.broadcast_to(H, (L, k, k)).reshape(L, k*k)).reshape(k, k)
+                + P.T @ (p[:, None] * P) - np.outer(Pp, Pp))
+        return obj._indexed(val, g.reshape(1, -1), hess.reshape(1, k, k))
+    a = obj.der
+    der = _rows(p, a, L, 1)
+    h = list(obj.hnames)
+    if not h:
+        return _new(val, der, {}, obj.hnames)
+    pairs = [x+y for x in h for y in h]
+    D = _matrix(a, h, L)
+    Dp = p @ D
+    second = p @ _matrix(obj.der2, pairs, L) + (D.T @ (p[:, None] * D) - np.outer(Dp, Dp)).reshape(-1)
+    return _new(val, der, {xy: second[j:j+1] for (j, xy) in enumerate(pairs)}, obj.hnames)
+
+
+# operators and elementary functions timed by profile; they are only wrapped while a profile is open
+_PROFILED_METHODS = ('__pos__', '__neg__', '__add__', '__radd__', '__sub__', '__rsub__', '__mul__', '__rmul__',
+                     '__truediv__', '__rtruediv__', '__pow__', '__rpow__', '__iadd__', '__isub__', '__imul__',
+                     'hessian')
+_PROFILED_FUNCTIONS = ('exp', 'log', 'sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh', 'arcsin', 'arccos', 'arctan',
+                       'sqrt', 'sigmoid', 'erf', 'softplus', 'logsumexp', 'sum', 'mean', 'dot', 'matmul')
+_profiles = []
+_originals = {}
+# True while a profiled call runs, so that the operations it does itself are not recorded again
+_profiling = [False]
+
+
+class Profile:
+    """Statistics of the operators and elementary functions called inside a profile block.
+
+    Output
+    ==========
+    Profile  : object
+               Contains Profile.stats, the dict of operation name ('__mul__', 'exp', 'hessian', ...) to a
+               dict with its number of 'calls', its cumulative 'time' in seconds, the total 'bytes' held by
+               the values and derivatives of its results, and the largest number of entries of the der
+               ('max_der') and der2 ('max_der2') of its results; and Profile.hooks, the functions called
+               after every operation as hook(name, args, result, seconds)
+    """
+
+    def __init__(self, hooks=()):
+        self.stats = {}
+        self.hooks = list(hooks)
+
+    def add_hook(self, hook):
+        """Calls hook(name, args, result, seconds) after every profiled operation."""
+        self.hooks.append(hook)
+
+    def _record(self, name, args, result, seconds):
+        nder, nder2, nbytes = _footprint(result)
+        try:
+            stat = self.stats[name]
+        except KeyError:
+            stat = self.stats[name] = {'calls': 0, 'time': 0.0, 'bytes': 0, 'max_der': 0, 'max_der2': 0}
+        stat['calls'] += 1
+        stat['time'] += seconds
+        stat['bytes'] += nbytes
+        stat['max_der'] = max(stat['max_der'], nder)
+        stat['max_der2'] = max(stat['max_der2'], nder2)
+        for hook in self.hooks:
+            hook(name, args, result, seconds)
+
+    def report(self, sort='time'):
+        """Returns a table of the statistics, one operation per line, sorted by the decreasing value of sort."""
+        lines = ['{:12s} {:>8s} {:>10s} {:>10s} {:>8s} {:>9s} {:>12s}'.format(
+            'op', 'calls', 'time (s)', 'per call', 'max der', 'max der2', 'bytes')]
+        for (name, stat) in sorted(self.stats.items(), key=lambda item: -item[1][sort]):
+            lines.append('{:12s} {:8d} {:10.4f} {:10.2e} {:8d} {:9d} {:12d}'.format(
+                name, stat['calls'], stat['time'], stat['time'] / stat['calls'], stat['max_der'],
+                stat['max_der2'], stat['bytes']))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.report()
+
+
+@contextmanager
+def profile(hooks=()):
+    """Records the calls of the overloaded operators of Variable, of Variable.hessian, of the elementary
+    functions and of the reductions made inside the block, with their cumulative time and the size of their
+    results.
+
+    The operations are only wrapped while a profile is open, so profiling costs nothing when it is off. An
+    operation done inside another one, such as the exp inside sigmoid, is not recorded separately. The
+    elementary functions and reductions are wrapped by replacing them in this module, so only the calls that
+    look them up in the module while the block runs are recorded, such as ad.exp(x) after
+    import AutoDiff.AutoDiff as ad; a name bound before the block, such as exp after
+    from AutoDiff.AutoDiff import exp, keeps the unwrapped function and its calls are missed.
+
+    Parameters
+    ==========
+    hooks    : (optional) iterable of functions
+               called after every operation as hook(name, args, result, seconds)
+
+    Output
+    ==========
+    Profile  : object
+               the statistics, filled in while the block runs
+
+    Examples
+    ==========
+    >>> import AutoDiff.AutoDiff as ad
+    >>> with ad.profile() as prof:
+    ...     x1 = ad.Variable(1, name='x1')
+    ...     f = ad.exp(x1 * x1) + x1
+    >>> prof.stats['__mul__']['calls'], prof.stats['exp']['max_der2']
+    (1, 1)
+    """
+    prof = Profile(hooks)
+    if not _profiles:
+        _install_profiling()
+    _profiles.append(prof)
+    try:
+        yield prof
+    finally:
+        _profiles.remove(prof)
+        if not _profiles:
+            _uninstall_profiling()
+
+def _install_profiling():
+    """Replaces the profiled operations by wrappers that time them."""
+    for name in _PROFILED_METHODS:
+        _originals[name] = Variable.__dict__[name]
+        setattr(Variable, name, _profiled(name, _originals[name]))
+    for name in _PROFILED_FUNCTIONS:
+        _originals[name] = globals()[name]
+        globals()[name] = _profiled(name, _originals[name])
+
+def _uninstall_profiling():
+    """Restores the profiled operations."""
+    for name in _PROFILED_METHODS:
+        setattr(Variable, name, _originals[name])
+    for name in _PROFILED_FUNCTIONS:
+        globals()[name] = _originals[name]
+
+def _profiled(name, original):
+    """Returns original wrapped to be recorded by the open profiles. Tapes may keep the wrapper of an
+    elementary function after the profile is closed, so it then only calls original."""
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        if not _profiles or _profiling[0]:
+            return original(*args, **kwargs)
+        _profiling[0] = True
+        start = time.perf_counter()
+        try:
+            result = original(*args, **kwargs)
+        finally:
+            _profiling[0] = False
+        seconds = time.perf_counter() - start
+        for prof in _profiles:
+            prof._record(name, args, result, seconds)
+        return result
+    return wrapper
+
+def _footprint(result):
+    """Returns the number of der and der2 entries of a result and the bytes held by its value and derivatives."""
+    if isinstance(result, Variable):
+        if result.index is not None:
+            return (result.grad.shape[1], len(result.index.hessian_columns)**2,
+                    result.val.nbytes + result.grad.nbytes + _nbytes(result.hess))
+        nbytes = result.val.nbytes + builtins.sum(_nbytes(d) for d in result.der.values())
+        nbytes += builtins.sum(_nbytes(d) for d in result.der2.values())
+        return len(result.der), len(result.der2), nbytes
+    if isinstance(result, VectorVariable):
+        return result.jac.shape[1], 0, result.val.nbytes + _nbytes(result.jac)
+    if isinstance(result, Node):
+        return 0, 0, _nbytes(result.val)
+    return 0, 0, _nbytes(result)
+
+def _nbytes(a):
+    """Returns the bytes held by an np.array, a scipy.sparse matrix, a SparseHessian or a number."""
+    if isinstance(a, SparseHessian):
+        return a.data.nbytes + a.rows.nbytes + a.cols.nbytes
+    if scipy.sparse.issparse(a):
+        return a.data.nbytes + a.indices.nbytes + a.indptr.nbytes
+    return getattr(a, 'nbytes', 8)
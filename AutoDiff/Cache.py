@@ -0,0 +1,183 @@
+from collections import OrderedDict, namedtuple
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Reverse import Tape
+from AutoDiff.Trace import Compiled
+from AutoDiff.Objective import total
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'nbytes'])
+
+def cache(f, names=None, tol=0., maxsize=128, max_bytes=None, mode='forward'):
+    """Wraps an objective function in a Cached function that remembers its value, gradient and Hessian at
+    the points it was evaluated at, so that the optimizers never evaluate it twice at the same point.
+
+    Parameters
+    ==========
+    f         : function
+                objective function with one argument, a dict of variable name to value, that returns a
+                scalar AutoDiff.Variable, or a Trace.Compiled function
+    names     : (optional) list of str
+                variables of the function, in the order of the flat gradient and Hessian; required
+                unless f is a Compiled function, whose names are the default
+    tol       : (optional) float
+                points whose coordinates round to the same multiples of tol share their entry; 0 only
+                matches identical points (default 0)
+    maxsize   : (optional) int
+                largest number of points kept; the least recently used point is evicted first, and
+                None keeps every point (default 128)
+    max_bytes : (optional) int
+                largest memory taken by the cached arrays, in bytes, enforced by evicting the least
+                recently used points (default None, no limit)
+    mode      : (optional) str
+                'forward' to evaluate f with AutoDiff.Variable, or 'reverse' to record it on a
+                Reverse.Tape; ignored if f is a Compiled function (default 'forward')
+
+    Output
+    ==========
+    Cached : object
+
+    Examples
+    ==========
+    >>> def f(values):
+    ...     x1 = ad.Variable(values['x1'], name='x1')
+    ...     x2 = ad.Variable(values['x2'], name='x2')
+    ...     return x1**2 * x2
+    >>> cf = cache(f, ['x1', 'x2'])
+    >>> cf.gradient({'x1': 1., 'x2': 3.})
+    array([6., 1.])
+    >>> float(cf.value({'x1': 1., 'x2': 3.}))
+    3.0
+    >>> cf.info()
+    CacheInfo(hits=1, misses=1, maxsize=128, currsize=1, nbytes=40)
+    """
+    return Cached(f, names, tol, maxsize, max_bytes, mode)
+
+
+class Cached(Compiled):
+    """An objective function whose evaluations are kept in a least recently used cache, keyed on the
+    point. It has the interface of Trace.Compiled, so grad_desc, NewtonOpt, BFGS, LBFGS, their line
+    searches and multi_start accept it in place of f.
+
+    Every point keeps the value, the gradient and the Hessian found there separately: a value is
+    returned from an entry that only has the value, while a gradient or a Hessian requested at a point
+    that has none evaluates f again at the higher order, which also gives all the lower ones, and fills
+    the entry. A batch of points, given as an np.array of shape (B, n), is looked up one point at a time.
+
+    Parameters
+    ==========
+    f         : function or Trace.Compiled
+    names     : list of str
+    tol       : float
+    maxsize   : int or None
+    max_bytes : int or None
+    mode      : str
+                see cache
+    """
+
+    def __init__(self, f, names=None, tol=0., maxsize=128, max_bytes=None, mode='forward'):
+        if mode not in ('forward', 'reverse'):
+            raise ValueError("mode must be 'forward' or 'reverse'")
+        if names is None:
+            if not isinstance(f, Compiled):
+                raise ValueError('names are required unless f is a Compiled function')
+            names = f.names
+        self.function = f
+        self.names = list(names)
+        self.tol = tol
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def info(self):
+        """Returns the number of hits and misses, the largest and current number of points kept and
+        the memory taken by the cached arrays."""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries), self.nbytes)
+
+    def clear(self):
+        """Removes every point and resets the statistics."""
+        self._entries.clear()
+        self.hits = self.misses = self.nbytes = 0
+
+    def hessian_vector(self, point, v):
+        """Returns the gradient of the function at point and the product of its Hessian with the direction
+        v, from the Hessian of the cache, which is formed once per point so that the products of later
+        conjugate gradient iterations at the same point are hits."""
+        value, grad, hess = self.evaluate(point, 2)
+        return grad, hess.dot(np.asarray(v, dtype=float))
+
+    def _key(self, x):
+        """Returns the key of the flat point x: its bytes, after rounding to multiples of tol."""
+        if self.tol > 0:
+            x = np.round(x / self.tol)
+        # adding 0. turns -0. into 0.
+        return (x + 0.).tobytes()
+
+    def evaluate(self, point, order=2):
+        """Returns the value, the gradient and the Hessian of the function at point, from the cache if
+        the point was evaluated before with derivatives up to order; the derivatives above order are
+        None. The arrays returned are shared with the cache and read-only."""
+        x = self._point(point)
+        if x.ndim == 2:
+            rows = [self.evaluate(row, order) for row in x]
+            return tuple(None if parts[0] is None else np.stack(parts) for parts in zip(*rows))
+        key = self._key(x)
+        entry = self._entries.get(key)
+        if entry is not None and entry[order] is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0], entry[1] if order > 0 else None, entry[2] if order > 1 else None
+        self.misses += 1
+        if entry is not None:
+            self._remove(key)
+        entry = list(self._compute(x, order)) + [None] * (2 - order)
+        for a in entry:
+            if a is not None:
+                a.setflags(write=False)
+        self._entries[key] = entry
+        self.nbytes += len(key) + sum(a.nbytes for a in entry if a is not None)
+        self._evict()
+        return tuple(entry)
+
+    def _compute(self, x, order):
+        """Returns the value of f at the flat point x and its derivatives up to order."""
+        if isinstance(self.function, Compiled):
+            output = self.function.evaluate(x, order)[:order + 1]
+            return tuple(np.array(a, dtype=float) for a in output)
+        point = dict(zip(self.names, x))
+        if order == 0:
+            with ad.derivative_order(0):
+                return (np.array(total(self.function(point).val)),)
+        if self.mode == 'reverse':
+            with Tape() as tape:
+                fx = self.function(point)
+            der = tape.gradient(fx, self.names)
+            hess = tape.hessian(fx, self.names) if order == 2 else None
+        else:
+            with ad.derivative_order(order, hessian=self.names):
+                fx = self.function(point)
+            der = fx.der
+            hess = fx.hessian(self.names) if order == 2 else None
+        grad = np.array([total(der[var]) if var in der else 0. for var in self.names])
+        value = np.array(total(fx.val))
+        if hess is None:
+            return value, grad
+        return value, grad, np.array(hess, dtype=float)
+
+    def _remove(self, key):
+        """Removes the entry of key and its memory."""
+        entry = self._entries.pop(key)
+        self.nbytes -= len(key) + sum(a.nbytes for a in entry if a is not None)
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits in maxsize and max_bytes; the
+        most recent entry is always kept."""
+        while len(self._entries) > 1 and ((self.maxsize is not None and len(self._entries) > self.maxsize)
+                                          or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            self._remove(next(iter(self._entries)))
@@ -1,45 +1,117 @@
 import AutoDiff.AutoDiff as ad
 import numpy as np
+import scipy.sparse
 from scipy.sparse.linalg import gmres, LinearOperator
 
-def autograd(F):
+def jacobian(F, names=None, sparse=None):
+    """Assembles the Jacobian of a vector of Variables once, with one row per Variable
+
+    Parameters
+    ==========
+    F:      list or AutoDiff.VectorVariable
+            user-defined vector of vector functions
+    names:  list, optional
+            variables of the columns, in order; defaults to the sorted names of all the
+            derivatives of a list, and to the registration order of the index of a VectorVariable
+    sparse: bool, optional
+            if True, returns a scipy.sparse.csr_matrix that only stores the nonzero derivatives;
+            by default only the Jacobian of a VectorVariable stored as sparse is returned sparse
+
+    Returns
+    =======
+    np.array or scipy.sparse.csr_matrix
+    Jacobian of F
+    """
+    if isinstance(F, ad.VectorVariable):
+        return F.jacobian(names, sparse)
+    if names is None:
+        names = sorted(set().union(*(f.der for f in F)))
+    columns = {name: j for (j, name) in enumerate(names)}
+    rows, cols, data = [], [], []
+    for (i, f) in enumerate(F):
+        for (name, d) in f.der.items():
+            if name in columns:
+                rows.append(i)
+                cols.append(columns[name])
+                data.append(d[0])
+    shape = (len(F), len(names))
+    if sparse:
+        J = scipy.sparse.csr_matrix((data, (rows, cols)), shape=shape)
+        J.eliminate_zeros()
+        return J
+    J = np.zeros(shape)
+    J[rows, cols] = data
+    return J
+
+def autograd(F, names=None, sparse=None):
     """Calculates derivatives of Ax where A is a matrix using forward mode automatic differentiation
 
     Parameters
     ==========
-    F:  list
-        user-defined vector of vector functions
-    p:  np.array
-        the vector p in Jp matrix-vector product where J is the Jacobian
+    F:      list or AutoDiff.VectorVariable
+            user-defined vector of vector functions
+    names:  list, optional
+            variables of the columns of the Jacobian, in order; see jacobian
+    sparse: bool, optional
+            if True, the Jacobian is stored as a scipy.sparse.csr_matrix; see jacobian
+
+    Returns
+    =======
+    function
+    function to get matrix-vector product, with the Jacobian assembled once
+    """
+    J = jacobian(F, names, sparse)
+    def grad(p):
+        return J.dot(p)
+    return grad
+
+def matrix_free(F, point):
+    """Calculates Jacobian-vector products of a vector function without forming the Jacobian,
+    seeding forward mode automatic differentiation with the vector
+
+    Parameters
+    ==========
+    F:      function
+            function with one argument, a dict of variable name to value, that returns a list of Variables
+            or a VectorVariable
+    point:  dict
+            point at which the Jacobian is taken; its keys, in order, are the variables of the columns
 
     Returns
     =======
     function
-    function to get matrix-vector product
+    function to get matrix-vector product, with one evaluation of F per product
     """
+    names = list(point)
     def grad(p):
-        dim = len(F)
-        J = np.zeros((dim, dim))
-        for i in range(dim):
-            J[i] = [v[0] for k, v in sorted(F[i].der.items())]
-        return np.dot(J, p)
+        return ad.jvp(F, point, dict(zip(names, p)))[1]
     return grad
 
-def gmres_autodiff(F, b):
+def gmres_autodiff(F, b, point=None, sparse=None, names=None):
     """Solves Ax=b using GMRes with automatic differentiation
-    
+
     Parameters
     ==========
-    F:     list
-           vector of vector functions
-    b:     list
-           RHS of Ax=b
-         
+    F:      list, AutoDiff.VectorVariable, function or matrix
+            vector of vector functions, whose Jacobian is assembled once; or a function with one
+            argument, a dict of variable name to value, that returns the vector of vector functions,
+            whose Jacobian is applied matrix-free with one forward evaluation per GMRes iteration;
+            or an assembled Jacobian, as an np.array or a scipy.sparse matrix such as the one
+            returned by Sparsity.SparseJacobian
+    b:      list
+            RHS of Ax=b
+    point:  dict, optional
+            point at which a function F is evaluated; required if F is a function
+    sparse: bool, optional
+            if True, the assembled Jacobian is stored as a scipy.sparse.csr_matrix; see jacobian
+    names:  list, optional
+            variables of the columns of the assembled Jacobian, in order; see jacobian
+
     Returns
     =======
     x:     np.array (1d)
            solution to Ax=b
-    
+
     Examples
     ========
     >>> b = [2, 3, 1]
@@ -55,7 +127,13 @@ def gmres_autodiff(F, b):
     array([ 1., -1.,  1.])
     """
     dim = np.array(b).shape[0]
-    grad = autograd(F)
-    action = LinearOperator((dim, dim), matvec=grad)
+    if callable(F):
+        if point is None:
+            raise ValueError('point is required when F is a function')
+        action = LinearOperator((dim, len(point)), matvec=matrix_free(F, point))
+    elif isinstance(F, np.ndarray) or scipy.sparse.issparse(F):
+        action = F
+    else:
+        action = jacobian(F, names, sparse)
     x, exitcode = gmres(action, b, atol='legacy')
     return x
@@ -1,7 +1,10 @@
-import AutoDiff as ad
+from AutoDiff.Objective import value_and_gradient, start, flatten, split
 import numpy as np
 
-def grad_desc(f, init, gamma, precision = 0.00001, max_iters = 10000, message=True):
+_METHODS = ('gd', 'momentum', 'nesterov', 'rmsprop', 'adam')
+
+def grad_desc(f, init, gamma, precision = 0.00001, max_iters = 10000, message=True, mode='forward',
+			  method='gd', beta=0.9, beta2=0.999, eps=1e-8):
 	'''Performs the gradient descent on a function or vector function of scalars.
 
 	INPUT
@@ -9,11 +12,15 @@ def grad_desc(f, init, gamma, precision = 0.00001, max_iters = 10000, message=Tr
 	f         : function
 	            the objective function that returns AutmoDiff.Variable class;
 	            has 1 argument -- a list of numbers that correspond to values at which
-	            variable are evaluated
+	            variable are evaluated; or a Trace.Compiled function returned by Trace.trace,
+	            which is replayed instead of evaluated and ignores mode, or a Cache.Cached
+	            function returned by Cache.cache, which is not evaluated again at a point it
+	            has already been evaluated at
 	init      : dictionary
 			    variable string key:int/float value pair that represents the variables
 			    at which they are evaluated.
 			    assumes length matches the number of unique variables in f
+			    an np.array value is optimized entry by entry, and returned in its shape
 	gamma     : int or float
 	            step-size/learning rate
 	precision : int or float
@@ -24,6 +31,21 @@ def grad_desc(f, init, gamma, precision = 0.00001, max_iters = 10000, message=Tr
 	message   : Boolean
 	            Prints summary of number of iterations and the point at which there is local
 	            optimum (default True)
+	mode      : string
+	            'forward' to propagate derivatives with AutoDiff.Variable, or 'reverse' to record
+	            f on a Reverse.Tape and get the gradient with one backward sweep (default 'forward')
+	method    : string
+	            update rule: 'gd' for a fixed step along the gradient, 'momentum' for the heavy ball
+	            method, 'nesterov' for Nesterov's accelerated gradient, 'rmsprop' or 'adam'
+	            (default 'gd')
+	beta      : float
+	            decay of the velocity of 'momentum' and 'nesterov', and of the first moment of
+	            'adam' (default 0.9)
+	beta2     : float
+	            decay of the second moment of the gradient of 'rmsprop' and 'adam' (default 0.999)
+	eps       : float
+	            added to the root of the second moment of 'rmsprop' and 'adam' to avoid dividing
+	            by zero (default 1e-8)
 
 	OUTPUT
 	=========
@@ -31,6 +53,19 @@ def grad_desc(f, init, gamma, precision = 0.00001, max_iters = 10000, message=Tr
 	           two keys: 'point', whose value is the local optimum, and 'iters', whose value
 	           is the number of iterations of the gradient descent.
 
+	NOTES
+	=========
+	In forward mode f is evaluated with ad.derivative_order(1), so only first derivatives
+	are propagated. The point is mapped to a flat np.array once, in the order of init, and the
+	updates and the optimizer state work on that array; only f sees a dictionary.
+
+	With method 'momentum' the velocity v = beta * v + gradient replaces the gradient in the
+	step; 'nesterov' takes the gradient at the point the velocity is heading to,
+	x - gamma * beta * v. 'rmsprop' divides each coordinate of the step by the root of a moving
+	average of its squared gradients, and 'adam' also replaces the gradient by its moving
+	average, both corrected for their zero initialisation. The descent stops when a step is
+	shorter than precision.
+
 	WARNINGS
 	=========
 	Will raise a RuntimeWarning if gamma (step-size) too large and causes overflow.
@@ -46,7 +81,7 @@ def grad_desc(f, init, gamma, precision = 0.00001, max_iters = 10000, message=Tr
 	>>> x = {'x1':5}
 	>>> a = gd.grad_desc(f, x, gamma = 0.01, message = False)
 	>>> print(a['point'], a['iters'])
-	{'x1': array([8.71346691e-05])} 104 # really near 0
+	{'x1': 8.713466905073072e-05} 104 # really near 0
 	>>> def g(values):
 	...     x1 = ad.Variable(values['x1'], name='x1')
 	...     x2 = ad.Variable(values['x2'], name='x2')
@@ -55,40 +90,229 @@ def grad_desc(f, init, gamma, precision = 0.00001, max_iters = 10000, message=Tr
     >>> xm = {'x1':0.001, 'x2':-0.1}
     >>> b = gd.grad_desc(g, xm, gamma = 0.01, message = False)
     >>> print(b['point'], b['iters'])
-    {'x1': array([6.48892289e-05]), 'x2': array([-8.59504456e-05])} 67
+    {'x1': 6.488922894863469e-05, 'x2': -8.595044557171427e-05} 67
 	'''
 
-	iters = 0
+	_check_method(method)
+
+	# map the point to a flat array once; the loop only works on arrays
+	names, shapes, x, fx, g = start(f, init, mode)
 
-	curr_point = init.copy()
+	# optimizer state: first and second moment of the gradient
+	v = np.zeros_like(x)
+	s = np.zeros_like(x)
+
+	iters = 0
 
 	prev_diff = float('inf')
 
 	while prev_diff > precision and iters < max_iters:
 
-		# makes a copy of the current point as previous point
-		prev_point = curr_point.copy()
-
-		# find the partial derivatives evaluated at current point
-		der_vals = f(prev_point).der
+		# the gradient at the starting point was already found by start
+		if iters > 0:
+			lookahead = x - (gamma * beta) * v if method == 'nesterov' else x
+			g = value_and_gradient(f, names, lookahead, mode, shapes)[1]
 
-		# initializing list of differences between new point and old point
-		diffs = []
+		step, v, s = _update(method, g, v, s, iters, gamma, beta, beta2, eps)
 
-		# update each coordinate and append difference
-		for var in der_vals:
-			curr_point[var] = curr_point[var] - (gamma * der_vals[var])
-			diffs.append(curr_point[var] - prev_point[var])
+		x_next = x - step
 
-		# finding the magnitude of the vectorized difference
-		prev_diff = np.linalg.norm(np.array(diffs))
+		# finding the magnitude of the difference between new point and old point
+		prev_diff = np.linalg.norm(x_next - x)
+		x = x_next
 
 		iters += 1
 
+	return _result(names, shapes, x, iters, message)
+
+def sgd(loss, init, data, gamma, batch_size = 32, epochs = 1, shuffle = True, seed = None, message=True,
+		mode='forward', method='gd', beta=0.9, beta2=0.999, eps=1e-8):
+	'''Performs mini-batch stochastic gradient descent on a loss over a dataset, taking one step on the
+	gradient of the loss of every batch.
+
+	INPUT
+	=========
+	loss       : function
+	             the loss of one batch, that returns AutoDiff.Variable class; has 2 arguments -- a
+	             dictionary of the values at which the variables are evaluated, and a batch of the
+	             data. If the loss has several values, for instance one per row of the batch, the
+	             gradient of their sum is used, so the loss is usually divided by the batch size
+	init       : dictionary
+	             variable string key:int/float value pair of the starting point
+	             an np.array value is optimized entry by entry, as in grad_desc
+	data       : np.array, np.memmap, tuple, iterable or function
+	             the dataset: an array whose rows are the samples, or a tuple of arrays with the same
+	             number of rows, such as (inputs, targets), in which case every batch is a tuple;
+	             or an iterable of chunks of rows, each an array or a tuple of arrays, such as a
+	             generator reading a file; or a function without arguments that returns such an
+	             iterable, called once per epoch
+	gamma      : int or float
+	             step-size/learning rate
+	batch_size : int
+	             number of rows of every batch; the last batch of an epoch may be smaller (default 32)
+	epochs     : int
+	             number of passes over the data (default 1)
+	shuffle    : Boolean
+	             visits the rows of an array in a new random order every epoch, and the rows of every
+	             chunk of an iterable in a random order (default True)
+	seed       : int
+	             seed of the shuffling (default None)
+	message    : Boolean
+	             Prints summary of number of iterations and the final point (default True)
+	mode       : string
+	             'forward' or 'reverse', as in grad_desc (default 'forward')
+	method     : string
+	             update rule, as in grad_desc (default 'gd')
+	beta, beta2, eps : float
+	             parameters of the update rule, as in grad_desc
+
+	OUTPUT
+	=========
+	point    : dictionary
+	           two keys: 'point', whose value is the final point, and 'iters', whose value is the
+	           number of steps taken.
+
+	NOTES
+	=========
+	Only one batch is in memory at a time: rows of an array or np.memmap are read batch by batch,
+	and chunks of an iterable are cut into batches as they arrive, so memory is bounded by the
+	batch and chunk sizes rather than the dataset size. An iterable that is not a function can
+	only be read once, so it only allows one epoch.
+
+	EXAMPLES
+	=========
+	>>> X = np.linspace(0, 1, 1000)
+	>>> y = 2 * X + 1
+	>>> def loss(values, batch):
+	...     w = ad.Variable(values['w'], name='w')
+	...     b = ad.Variable(values['b'], name='b')
+	...     inputs, targets = batch
+	...     return (w * inputs + b - targets)**2 / len(targets)
+	>>> a = gd.sgd(loss, {'w': 0, 'b': 0}, (X, y), gamma = 0.1, batch_size = 10, epochs = 20,
+	...            seed = 0, message = False)
+	>>> print({var: round(a['point'][var], 6) for var in a['point']}, a['iters'])
+	{'w': 2.0, 'b': 1.0} 2000
+	'''
+
+	_check_method(method)
+	if mode not in ('forward', 'reverse'):
+		raise ValueError("mode must be 'forward' or 'reverse'")
+	if epochs > 1 and not callable(data) and iter(data) is data:
+		raise ValueError('an iterator can only be read once; pass a function that returns one to run several epochs')
+
+	names, shapes, x = flatten(init)
+
+	# optimizer state: first and second moment of the gradient
+	v = np.zeros_like(x)
+	s = np.zeros_like(x)
+
+	rng = np.random.RandomState(seed)
+
+	iters = 0
+
+	for epoch in range(epochs):
+		for batch in batches(data, batch_size, shuffle, rng):
+			lookahead = x - (gamma * beta) * v if method == 'nesterov' else x
+			g = value_and_gradient(lambda point: loss(point, batch), names, lookahead, mode, shapes)[1]
+			step, v, s = _update(method, g, v, s, iters, gamma, beta, beta2, eps)
+			x = x - step
+			iters += 1
+
+	return _result(names, shapes, x, iters, message)
+
+def batches(data, batch_size, shuffle = True, rng = None):
+	'''Yields the batches of one pass over a dataset.
+
+	INPUT
+	=========
+	data       : np.array, np.memmap, tuple, iterable or function
+	             the dataset, as in sgd
+	batch_size : int
+	             number of rows of every batch; the last batch may be smaller
+	shuffle    : Boolean
+	             visits the rows of an array in a random order, and the rows of every chunk of an
+	             iterable in a random order (default True)
+	rng        : np.random.RandomState
+	             generator of the shuffling, or any object with a permutation method such as a
+	             np.random.Generator (default a new unseeded one)
+
+	OUTPUT
+	=========
+	batch    : np.array, or tuple of np.array if the rows of data are given as a tuple
+
+	EXAMPLES
+	=========
+	>>> [b.tolist() for b in gd.batches(np.arange(5), 2, shuffle = False)]
+	[[0, 1], [2, 3], [4]]
+	'''
+	if rng is None:
+		rng = np.random.RandomState()
+	if callable(data):
+		data = data()
+
+	if isinstance(data, (np.ndarray, tuple)):
+		parts = data if isinstance(data, tuple) else (data,)
+		n = len(parts[0])
+		order = rng.permutation(n) if shuffle else None
+		for start in range(0, n, batch_size):
+			if shuffle:
+				# sorted, so that the rows of a np.memmap are read in file order
+				rows = np.sort(order[start:start + batch_size])
+			else:
+				rows = slice(start, start + batch_size)
+			yield _unpack(tuple(np.asarray(p[rows]) for p in parts), data)
+		return
+
+	# a stream of chunks, cut into batches as they arrive
+	pending = None
+	for chunk in data:
+		parts = tuple(np.asarray(p) for p in (chunk if isinstance(chunk, tuple) else (chunk,)))
+		if shuffle:
+			rows = rng.permutation(len(parts[0]))
+			parts = tuple(p[rows] for p in parts)
+		if pending is not None:
+			parts = tuple(np.concatenate(pair) for pair in zip(pending, parts))
+		start = 0
+		while len(parts[0]) - start >= batch_size:
+			yield _unpack(tuple(p[start:start + batch_size] for p in parts), chunk)
+			start += batch_size
+		pending = tuple(p[start:] for p in parts)
+	if pending is not None and len(pending[0]):
+		yield _unpack(pending, chunk)
+
+def _unpack(batch, source):
+	'''Returns the tuple of arrays batch as a tuple if source is one, and as its only array otherwise.'''
+	return batch if isinstance(source, tuple) else batch[0]
+
+def _check_method(method):
+	'''Raises a ValueError if method is not an update rule of grad_desc.'''
+	if method not in _METHODS:
+		raise ValueError('method must be one of {}'.format(', '.join(_METHODS)))
+
+def _update(method, g, v, s, t, gamma, beta, beta2, eps):
+	'''Returns the step of the update rule method at iteration t for the gradient g, and the new
+	first and second moments v and s.'''
+	if method == 'gd':
+		return gamma * g, v, s
+	if method in ('momentum', 'nesterov'):
+		v = beta * v + g
+		return gamma * v, v, s
+	s = beta2 * s + (1 - beta2) * g * g
+	# correct the bias of the moments towards their zero initialisation
+	s_hat = s / (1 - beta2**(t + 1))
+	if method == 'rmsprop':
+		return gamma * g / (np.sqrt(s_hat) + eps), v, s
+	v = beta * v + (1 - beta) * g
+	v_hat = v / (1 - beta**(t + 1))
+	return gamma * v_hat / (np.sqrt(s_hat) + eps), v, s
+
+def _result(names, shapes, x, iters, message):
+	'''Returns the result dictionary of a descent, with the value of every variable in the shape of its
+	starting value; see Objective.split.'''
+	curr_point = split(names, shapes, x)
+
 	if message:
 		print('Number of iterations: {}'.format(iters))
 		print('The local minimum occurs at {}'.format(curr_point))
 
 	return {'point':curr_point, 'iters':iters}
-	
-
@@ -0,0 +1,140 @@
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Trace import Compiled
+from AutoDiff.Objective import total, flatten
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+
+def multi_start(optimizer, f, inits, workers = None, tol = 1e-4, message=True, **options):
+	'''Runs an optimizer from many starting points across a pool of worker processes, and gathers
+	the local optima it finds.
+
+	INPUT
+	=========
+	optimizer : function
+	            the optimizer run from every start, such as GradDesc.grad_desc, NewtonOpt.NewtonOpt,
+	            QuasiNewton.BFGS or QuasiNewton.LBFGS; called as
+	            optimizer(f, init, message=False, **options)
+	f         : function
+	            the objective function that returns AutoDiff.Variable class, or a
+	            Trace.Compiled function; it is sent to the worker processes, so it must be
+	            defined at the top level of a module
+	inits     : list of dictionaries
+	            the starting points, each a variable string key:int/float value pair, for instance
+	            from random_starts
+	workers   : int
+	            number of worker processes; 1 runs every start in this process, without a pool
+	            (default the number of CPUs)
+	tol       : float
+	            distance below which two optima are counted as the same (default 1e-4)
+	message   : Boolean
+	            Prints the number of starts, of distinct optima and the best one (default True)
+	options   : keyword arguments passed to the optimizer, such as gamma for grad_desc
+
+	OUTPUT
+	=========
+	result   : dictionary
+	           three keys: 'best', the optimum with the lowest value, 'optima', the distinct
+	           optima sorted by value, each a dictionary with the keys 'point', 'value' and
+	           'count', the number of starts that reached it, and 'results', the results of the
+	           optimizer for every start, in the order of inits, each with its 'value' added.
+
+	NOTES
+	=========
+	The starts are split into a few chunks per worker, so that a worker runs several starts
+	for every time the objective and the optimizer are sent to it. Starts that end at a value
+	that is not finite, for instance after diverging, are kept in 'results' but are not optima.
+	Every other end point is an optimum, including those of starts that stopped at max_iters.
+
+	EXAMPLES
+	=========
+	>>> import AutoDiff.AutoDiff as ad
+	>>> from AutoDiff.NewtonOpt import NewtonOpt
+	>>> def f(values):
+	...     x = ad.Variable(values['x'], name='x')
+	...     return (x**2 - 1)**2 + 0.1 * x
+	>>> a = multi_start(NewtonOpt, f, [{'x': -2.}, {'x': -0.5}, {'x': 2.}], message=False)
+	>>> [(round(o['point']['x'], 4), o['count']) for o in a['optima']]
+	[(-1.0123, 1), (0.9873, 2)]
+	'''
+
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	tasks = [(optimizer, f, dict(init), options) for init in inits]
+	if workers == 1:
+		results = [_run(task) for task in tasks]
+	else:
+		chunksize = max(1, len(tasks) // (4 * workers))
+		with ProcessPoolExecutor(max_workers=workers) as executor:
+			results = list(executor.map(_run, tasks, chunksize=chunksize))
+
+	optima = _cluster(results, tol)
+
+	if message:
+		print('Number of starts: {}'.format(len(results)))
+		print('Number of distinct optima: {}'.format(len(optima)))
+		if optima:
+			print('The best local minimum occurs at {}'.format(optima[0]['point']))
+
+	return {'best': optima[0] if optima else None, 'optima': optima, 'results': results}
+
+def random_starts(bounds, n, seed = None):
+	'''Returns n starting points drawn uniformly inside a box.
+
+	INPUT
+	=========
+	bounds : dictionary
+	         variable string key:(low, high) pair of the range of every variable
+	n      : int
+	         number of starting points
+	seed   : int
+	         seed of the draws (default None)
+
+	OUTPUT
+	=========
+	inits  : list of dictionaries
+	         the starting points, with float values
+
+	EXAMPLES
+	=========
+	>>> random_starts({'x': (-2, 2), 'y': (0, 1)}, 2, seed = 0)
+	[{'x': 0.195..., 'y': 0.715...}, {'x': 0.411..., 'y': 0.544...}]
+	'''
+	rng = np.random.RandomState(seed)
+	names = list(bounds.keys())
+	low = np.array([bounds[var][0] for var in names], dtype=float)
+	high = np.array([bounds[var][1] for var in names], dtype=float)
+	draws = rng.uniform(low, high, size=(n, len(names)))
+	return [dict(zip(names, row.tolist())) for row in draws]
+
+def _run(task):
+	'''Runs the optimizer of a task and adds the value of the objective at its result.'''
+	optimizer, f, init, options = task
+	result = optimizer(f, init, message=False, **options)
+	result['value'] = _value(f, result['point'])
+	return result
+
+def _value(f, point):
+	'''Returns the value of the objective f at point as a float, without derivatives.'''
+	if isinstance(f, Compiled):
+		return total(f.value(point))
+	with ad.derivative_order(0):
+		return total(f(point).val)
+
+def _cluster(results, tol):
+	'''Returns the distinct optima of results, merging the points closer than tol, sorted by value.'''
+	optima = []
+	locations = []
+	for result in sorted(results, key=lambda r: r['value'] if np.isfinite(r['value']) else np.inf):
+		if not np.isfinite(result['value']):
+			continue
+		x = flatten(result['point'])[2]
+		for (optimum, location) in zip(optima, locations):
+			if np.linalg.norm(x - location) < tol:
+				optimum['count'] += 1
+				break
+		else:
+			optima.append({'point': result['point'], 'value': result['value'], 'count': 1})
+			locations.append(x)
+	return optima
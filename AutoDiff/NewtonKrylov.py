@@ -0,0 +1,100 @@
+import inspect
+import AutoDiff.AutoDiff as ad
+import numpy as np
+from scipy.sparse.linalg import gmres, LinearOperator
+from AutoDiff.GMRes import matrix_free
+
+# SciPy 1.12 renamed the relative tolerance of gmres from tol to rtol, and later removed tol
+_RTOL = 'rtol' if 'rtol' in inspect.signature(gmres).parameters else 'tol'
+
+def newton_krylov(F, init, tol=1e-8, max_iters=50, restart=20, krylov_iters=None, eta_max=0.9,
+                  gamma=0.9, message=True):
+    """Solves the nonlinear system F(x)=0 with the Jacobian-free Newton-Krylov method: every Newton step
+    J s = -F(x) is solved inexactly with GMRes, whose Jacobian-vector products are forward mode
+    directional derivatives, so the Jacobian is never formed or factorised
+
+    The tolerance of each GMRes solve is the Eisenstat-Walker forcing term
+    eta_k = gamma * (|F(x_k)| / |F(x_k-1)|)**2, safeguarded and capped at eta_max, so that the linear
+    solves are loose far from the root and tighten as Newton converges, keeping its fast local
+    convergence. Each step is shortened by backtracking until the residual norm decreases.
+
+    Parameters
+    ==========
+    F:            function
+                  function with one argument, a dict of variable name to value, that returns a list of
+                  Variables or a VectorVariable with one component per variable
+    init:         dict
+                  initial guess; its keys are the variables
+    tol:          float, optional
+                  residual norm at which to stop (default 1e-8)
+    max_iters:    int, optional
+                  maximum number of Newton steps (default 50)
+    restart:      int, optional
+                  number of GMRes iterations between restarts (default 20)
+    krylov_iters: int, optional
+                  maximum number of GMRes restart cycles per Newton step (default: scipy's default)
+    eta_max:      float, optional
+                  largest forcing term (default 0.9)
+    gamma:        float, optional
+                  factor of the forcing term (default 0.9)
+    message:      bool, optional
+                  prints the number of iterations and the root (default True)
+
+    Returns
+    =======
+    dict
+    three keys: 'point', the root as a dict of variable name to value, 'iters', the number of Newton
+    steps, and 'residual', the norm of F at the root
+
+    Examples
+    ========
+    >>> def F(values):
+    ...     x = ad.Variable(values['x'], name='x')
+    ...     y = ad.Variable(values['y'], name='y')
+    ...     return [x**2 + y**2 - 4, x - y]
+    >>> result = newton_krylov(F, {'x': 1., 'y': 2.}, message=False)
+    >>> result['point']
+    {'x': 1.4142135623730951, 'y': 1.4142135623730951}
+    """
+    names = list(init)
+    x = np.array([init[name] for name in names], dtype=float)
+    point = dict(zip(names, x))
+    residual = _residual(F, point)
+    norm = np.linalg.norm(residual)
+    eta = eta_max
+    iters = 0
+    while norm > tol and iters < max_iters:
+        J = LinearOperator((len(residual), len(x)), matvec=matrix_free(F, point))
+        # do not solve more accurately than what the stopping criterion needs
+        rtol = max(eta, 0.5 * tol / norm)
+        step, exitcode = gmres(J, -residual, atol=0, restart=restart, maxiter=krylov_iters, **{_RTOL: rtol})
+        # backtrack until the residual norm decreases enough
+        t = 1.0
+        while True:
+            trial = dict(zip(names, x + t * step))
+            trial_residual = _residual(F, trial)
+            trial_norm = np.linalg.norm(trial_residual)
+            if trial_norm <= (1 - 1e-4 * t) * norm or t < 1e-4:
+                break
+            t /= 2
+        x = x + t * step
+        point = trial
+        residual = trial_residual
+        # Eisenstat-Walker forcing term (choice 2), with its safeguard against dropping too fast
+        eta_next = gamma * (trial_norm / norm)**2
+        if gamma * eta**2 > 0.1:
+            eta_next = max(eta_next, gamma * eta**2)
+        eta = min(eta_next, eta_max)
+        norm = trial_norm
+        iters += 1
+
+    if message:
+        print('Number of iterations: {}'.format(iters))
+        print('The root occurs at {}'.format(point))
+
+    return {'point': point, 'iters': iters, 'residual': norm}
+
+def _residual(F, point):
+    """Returns the values of F at point as a flat np.array."""
+    with ad.derivative_order(0):
+        return ad.jvp(F, point, {})[0]
@@ -1,14 +1,20 @@
-import AutoDiff as ad
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Reverse import Tape
+from AutoDiff.Trace import Compiled
 import numpy as np
 
-def NewtonOpt(f, init, precision = 0.00001, max_iters = 10000, message=True):
+def NewtonOpt(f, init, precision = 0.00001, max_iters = 10000, message=True, mode='forward', solver='direct',
+		cg_iters=None):
 	'''Performs the Newton's optimization on a function or vector function of scalars.
 	INPUT
 	=========
 	f         : function
 	            the objective function that returns AutmoDiff.Variable class;
 	            has 1 argument -- a list of numbers that correspond to values at which
-	            variable are evaluated
+	            variable are evaluated; or a Trace.Compiled function returned by Trace.trace,
+	            which is replayed instead of evaluated and ignores mode, or a Cache.Cached
+	            function returned by Cache.cache, which is not evaluated again at a point it
+	            has already been evaluated at
 	init      : dictionary
 			    variable string key:int/float value pair that represents the variables
 			    at which they are evaluated.
@@ -22,6 +28,21 @@ def NewtonOpt(f, init, precision = 0.00001, max_iters = 10000, message=True):
 	message   : Boolean
 	            Prints summary of number of iterations and the point at which there is local
 	            optimum (default True)
+	mode      : string
+	            'forward' to propagate derivatives with AutoDiff.Variable, or 'reverse' to record
+	            f on a Reverse.Tape and get the gradient with one backward sweep and the Hessian
+	            with one forward and one backward sweep carrying one direction per variable
+	            (default 'forward')
+	solver    : string
+	            'direct' to form the Hessian and solve the Newton system with np.linalg.solve, or
+	            'cg' for the truncated Newton (Newton-CG) method, which solves it with conjugate
+	            gradients on Hessian-vector products of f recorded on a Reverse.Tape, or of the
+	            replays of a Compiled function, without forming the Hessian, and stops early on
+	            negative curvature; 'cg' ignores mode
+	            (default 'direct')
+	cg_iters  : int
+	            maximum amount of conjugate gradient iterations per Newton step with
+	            solver='cg' (default: the number of variables)
 	OUTPUT
 	=========
 	point    : dictionary
@@ -47,6 +68,11 @@ def NewtonOpt(f, init, precision = 0.00001, max_iters = 10000, message=True):
    {'point': {'x': 1.099839320128867, 'y': 1.099839320128867}, 'iters': 5}
 	'''
 
+	if mode not in ('forward', 'reverse'):
+		raise ValueError("mode must be 'forward' or 'reverse'")
+	if solver not in ('direct', 'cg'):
+		raise ValueError("solver must be 'direct' or 'cg'")
+
 	iters = 0
 
 	curr_point = init.copy()#np.array(init.values())
@@ -58,18 +84,35 @@ def NewtonOpt(f, init, precision = 0.00001, max_iters = 10000, message=True):
 		# makes a copy of the current point as previous point
 		prev_point = curr_point
 
-		# find the partial derivatives evaluated at current point
-		f2x= f(prev_point)
-		gradf =[]
-		for var in init.keys():
-			gradf.append(f2x.der[var])
-		gradf=np.array(gradf).flatten()
+		if solver == 'cg':
+			sk=_cg_step(f, prev_point, init.keys(), cg_iters)
+		else:
+			# find the partial derivatives evaluated at current point, with second derivatives
+			# only with respect to the optimized variables
+			if isinstance(f, Compiled):
+				f2x= f(prev_point)
+				der=f2x.der
+			elif mode == 'reverse':
+				with Tape() as tape:
+					f2x= f(prev_point)
+				der=tape.gradient(f2x, init.keys())
+			else:
+				with ad.derivative_order(2, hessian=init.keys()):
+					f2x= f(prev_point)
+				der=f2x.der
+			gradf =[]
+			for var in init.keys():
+				gradf.append(der[var])
+			gradf=np.array(gradf).flatten()
 		
-		# initializing list of differences between new point and old point
+			# initializing list of differences between new point and old point
 
-		hess=f2x.hessian(init.keys())
+			if mode == 'reverse' and not isinstance(f, Compiled):
+				hess=tape.hessian(f2x, init.keys())
+			else:
+				hess=f2x.hessian(init.keys())
 		        
-		sk=np.linalg.solve(hess,-gradf).reshape(-1)
+			sk=np.linalg.solve(hess,-gradf).reshape(-1)
 		# update each coordinate and append difference
 		ii=0
 		for var in init.keys():
@@ -87,3 +130,59 @@ def NewtonOpt(f, init, precision = 0.00001, max_iters = 10000, message=True):
 		print('The local minimum occurs at {}'.format(curr_point))
 
 	return {'point':curr_point, 'iters':iters}
+
+
+def _cg_step(f, point, names, cg_iters=None):
+	'''Returns the truncated Newton step at point, solving the Newton system by conjugate gradients on
+	Hessian-vector products and stopping early on negative curvature, or at a residual below
+	min(0.5, sqrt(|g|)) * |g| for the gradient g. Negative curvature along g itself gives the
+	steepest descent step -(g.g / |g.H.g|) g.'''
+	names = list(names)
+	if isinstance(f, Compiled):
+		# the columns of the trace, in the order of f.names, of the variables in names
+		columns = [f.names.index(var) if var in f.names else None for var in names]
+		def hess_vec(d):
+			v = np.zeros(len(f.names))
+			for (j, c) in enumerate(columns):
+				if c is not None:
+					v[c] = d[j]
+			return _take(f.hessian_vector(point, v)[1], columns)
+		gradf = _take(f.gradient(point), columns)
+	else:
+		with Tape() as tape:
+			f2x = f(point)
+		der = tape.gradient(f2x, names)
+		gradf = np.array([der[var] for var in names]).flatten()
+		def hess_vec(d):
+			prod = tape.hessian_vector(f2x, dict(zip(names, d)), names)
+			return np.array([prod[var] for var in names]).flatten()
+	if cg_iters is None:
+		cg_iters = len(names)
+	gnorm = np.linalg.norm(gradf)
+	tol = min(0.5, np.sqrt(gnorm)) * gnorm
+	sk = np.zeros(len(names))
+	r = -gradf
+	d = r.copy()
+	rr = r.dot(r)
+	for j in range(cg_iters):
+		if np.sqrt(rr) <= tol:
+			break
+		Hd = hess_vec(d)
+		curv = d.dot(Hd)
+		if curv <= 0:
+			# negative curvature: keep the step so far, or take the steepest descent direction,
+			# scaled by the magnitude of the curvature along it, which is g.H.g for d = -g
+			if j == 0:
+				sk = d * (rr / abs(curv)) if curv < 0 else d
+			break
+		alpha = rr / curv
+		sk = sk + alpha * d
+		r = r - alpha * Hd
+		rr_next = r.dot(r)
+		d = r + (rr_next / rr) * d
+		rr = rr_next
+	return sk
+
+def _take(a, columns):
+	'''Returns the entries of the flat np.array a at columns, with zeros for the columns that are None.'''
+	return np.array([a[c] if c is not None else 0. for c in columns])
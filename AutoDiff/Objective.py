@@ -0,0 +1,105 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Reverse import Tape
+from AutoDiff.Trace import Compiled
+
+def value_and_gradient(f, names, x, mode='forward', shapes=None):
+    """Returns the value and the gradient of an objective function at a point given as a flat np.array,
+    propagating only first derivatives.
+
+    Parameters
+    ==========
+    f        : function
+               objective function with one argument, a dict of variable name to value, that returns an
+               AutoDiff.Variable, or a Trace.Compiled function, which ignores mode
+    names    : list of str
+               variables of the entries of x and of the gradient
+    x        : np.array
+               point, with the entries of the variables one after the other
+    mode     : (optional) str
+               'forward' to evaluate f with AutoDiff.Variable, or 'reverse' to record it on a
+               Reverse.Tape (default 'forward')
+    shapes   : (optional) list of tuple
+               shape of the value of each variable, as returned by flatten; a variable of shape ()
+               has one entry and a float value (default one entry per variable)
+
+    Output
+    ==========
+    value    : float
+    grad     : np.array
+               flat gradient, in the order of names; variables that f does not use have a zero entry
+
+    Examples
+    ==========
+    >>> def f(values):
+    ...     x1 = ad.Variable(values['x1'], name='x1')
+    ...     return x1**2
+    >>> value_and_gradient(f, ['x1', 'x2'], np.array([3., 1.]))
+    (9.0, array([6., 0.]))
+    """
+    if shapes is None:
+        shapes = [()] * len(names)
+    point = split(names, shapes, x)
+    if isinstance(f, Compiled):
+        evaluation = f(point, order=1)
+        if evaluation.names == names:
+            return float(evaluation.val), evaluation.grad
+        der = evaluation.der
+        grad = np.array([der[var][0] if var in der else 0. for var in names])
+        return float(evaluation.val), grad
+    if mode == 'reverse':
+        with Tape() as tape:
+            fx = f(point)
+        der = tape.gradient(fx, names)
+    else:
+        with ad.derivative_order(1):
+            fx = f(point)
+        der = dict(fx.der)
+        # the derivative of a Variable with several values is along all of them at once; the entries
+        # of its gradient are found with one directional derivative each
+        for (var, shape) in zip(names, shapes):
+            if shape != () and var in der:
+                seeds = np.eye(int(np.prod(shape)))
+                der[var] = [total(ad.jvp(f, point, {var: e.reshape(shape)})[1]) for e in seeds]
+    grad = np.concatenate([_entries(der.get(var, 0.), shape) for (var, shape) in zip(names, shapes)])
+    return total(fx.val), grad
+
+def _entries(der, shape):
+    """Returns the entries of the gradient of a variable of the given shape from its derivative der."""
+    if shape == ():
+        return [total(der)]
+    return np.broadcast_to(der, shape).reshape(-1)
+
+def total(a):
+    """Returns the sum of a float or np.array as a float, without a reduction for a single value."""
+    if isinstance(a, np.ndarray):
+        return a.item() if a.size == 1 else float(a.sum())
+    return float(a)
+
+def flatten(init):
+    """Returns the names of the variables of the point init, the shape of the value of each, and the
+    point as a flat np.array with their entries one after the other."""
+    names = list(init.keys())
+    shapes = [np.shape(init[var]) for var in names]
+    x = np.concatenate([np.ravel(init[var]) for var in names] or [[]]).astype(float)
+    return names, shapes, x
+
+def split(names, shapes, x):
+    """Returns the point of the flat np.array x as a dict of variable name to value, the inverse of
+    flatten: a float for a variable of shape (), and an np.array of its shape otherwise."""
+    point = {}
+    i = 0
+    for (var, shape) in zip(names, shapes):
+        size = int(np.prod(shape))
+        point[var] = float(x[i]) if shape == () else x[i:i + size].reshape(shape)
+        i += size
+    return point
+
+def start(f, init, mode='forward'):
+    """Returns the names of the variables of the starting point init, their shapes and the point as a
+    flat np.array, see flatten, and the value and the gradient of f there; see value_and_gradient."""
+    if mode not in ('forward', 'reverse'):
+        raise ValueError("mode must be 'forward' or 'reverse'")
+    names, shapes, x = flatten(init)
+    fx, g = value_and_gradient(f, names, x, mode, shapes)
+    return names, shapes, x, fx, g
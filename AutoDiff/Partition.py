@@ -0,0 +1,144 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.GMRes import jacobian
+from AutoDiff.Reverse import Tape
+
+def partition(names, chunks):
+    """Splits a list of variable names into chunks of consecutive names of nearly equal sizes.
+
+    Parameters
+    ==========
+    names    : list of str
+               names of the independent variables
+    chunks   : int
+               number of chunks; at most one per name
+
+    Output
+    ==========
+    parts    : list of lists of str
+
+    Examples
+    ==========
+    >>> partition(['x1', 'x2', 'x3', 'x4', 'x5'], 2)
+    [['x1', 'x2'], ['x3', 'x4', 'x5']]
+    """
+    names = list(names)
+    chunks = max(1, min(chunks, len(names)))
+    bounds = np.linspace(0, len(names), chunks + 1).round().astype(int)
+    return [names[bounds[i]:bounds[i+1]] for i in range(chunks)]
+
+def parallel_jacobian(F, point, workers=None, chunks=None):
+    """Assembles the Jacobian of a vector function by splitting its variables into chunks and
+    evaluating F once per chunk in a pool of worker processes, seeding only the variables of the chunk,
+    so that every evaluation only carries the derivative columns of its chunk.
+
+    Parameters
+    ==========
+    F        : function
+               function with one argument, a dict of variable name to value, that returns a Variable, a
+               list of Variables or a VectorVariable; it is sent to the worker processes, so it must be
+               defined at the top level of a module
+    point    : dict of str keys and int/float values
+               point at which the Jacobian is taken; its keys, in order, are the variables of the columns
+    workers  : (optional) int
+               number of worker processes; 1 evaluates every chunk in this process, without a pool
+               (default the number of CPUs)
+    chunks   : (optional) int
+               number of chunks of variables (default workers)
+
+    Output
+    ==========
+    J        : np.array of shape (m, n)
+               Jacobian, with one row per output and one column per variable of point
+
+    Examples
+    ==========
+    >>> def F(values):
+    ...     x1 = ad.Variable(values['x1'], name='x1')
+    ...     x2 = ad.Variable(values['x2'], name='x2')
+    ...     return [x1 * x2, ad.exp(x1) + x2]
+    >>> parallel_jacobian(F, {'x1': 0., 'x2': 2.}, workers=1, chunks=2)
+    array([[2., 0.],
+           [1., 1.]])
+    """
+    parts, workers = _parts(point, workers, chunks)
+    blocks = _map(_jacobian_columns, [(F, point, part) for part in parts], workers)
+    return np.hstack(blocks)
+
+def parallel_hessian(f, point, workers=None, chunks=None):
+    """Assembles the Hessian of a scalar function by splitting its variables into chunks and computing
+    the Hessian columns of every chunk in a pool of worker processes: f is recorded on a Reverse.Tape
+    and one forward and one backward sweep carry one direction per variable of the chunk.
+
+    Parameters
+    ==========
+    f        : function
+               objective function with one argument, a dict of variable name to value, that returns an
+               AutoDiff.Variable; it is sent to the worker processes, so it must be defined at the top
+               level of a module
+    point    : dict of str keys and int/float values
+               point at which the Hessian is taken; its keys, in order, are the variables of the rows
+               and columns
+    workers  : (optional) int
+               number of worker processes; 1 evaluates every chunk in this process, without a pool
+               (default the number of CPUs)
+    chunks   : (optional) int
+               number of chunks of variables (default workers)
+
+    Output
+    ==========
+    H        : np.array of shape (n, n)
+               Hessian
+
+    Examples
+    ==========
+    >>> def f(values):
+    ...     x1 = ad.Variable(values['x1'], name='x1')
+    ...     x2 = ad.Variable(values['x2'], name='x2')
+    ...     return x1**2 * x2
+    >>> parallel_hessian(f, {'x1': 1., 'x2': 3.}, workers=1, chunks=2)
+    array([[6., 2.],
+           [2., 0.]])
+    """
+    parts, workers = _parts(point, workers, chunks)
+    blocks = _map(_hessian_columns, [(f, point, part) for part in parts], workers)
+    return np.hstack(blocks)
+
+def _parts(point, workers, chunks):
+    """Returns the chunks of the variables of point and the number of workers."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunks is None:
+        chunks = workers
+    return partition(point, chunks), workers
+
+def _map(function, tasks, workers):
+    """Returns the results of function on every task, on a pool of worker processes if workers > 1."""
+    if workers == 1 or len(tasks) == 1:
+        return [function(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return list(executor.map(function, tasks))
+
+def _jacobian_columns(task):
+    """Returns the columns of the Jacobian of F for the variables of a chunk."""
+    F, point, part = task
+    with ad.derivative_order(1, seed=part):
+        outputs = F(point)
+    if isinstance(outputs, ad.VectorVariable):
+        # the variables of the chunk that F does not use have no column in its index
+        J = np.zeros((len(outputs), len(part)))
+        known = [j for (j, name) in enumerate(part) if name in outputs.index]
+        J[:, known] = outputs.jacobian([part[j] for j in known], sparse=False)
+        return J
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+    return jacobian(outputs, part, sparse=False)
+
+def _hessian_columns(task):
+    """Returns the columns of the Hessian of f for the variables of a chunk."""
+    f, point, part = task
+    with Tape() as tape:
+        output = f(point)
+    return tape.hessian(output, point, part)
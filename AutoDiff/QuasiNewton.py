@@ -0,0 +1,217 @@
+from AutoDiff.Objective import value_and_gradient, start, split
+from collections import deque
+import numpy as np
+
+def BFGS(f, init, precision = 0.00001, max_iters = 10000, message=True, mode='forward'):
+	'''Performs the BFGS quasi-Newton optimization on a function of scalars, using only first derivatives.
+
+	INPUT
+	=========
+	f         : function
+	            the objective function that returns AutmoDiff.Variable class;
+	            has 1 argument -- a list of numbers that correspond to values at which
+	            variable are evaluated; or a Trace.Compiled function returned by Trace.trace,
+	            which is replayed instead of evaluated and ignores mode, or a Cache.Cached
+	            function returned by Cache.cache, which is not evaluated again at a point it
+	            has already been evaluated at
+	init      : dictionary
+	            variable string key:int/float value pair that represents the variables
+	            at which they are evaluated.
+	            assumes length matches the number of unique variables in f
+	            an np.array value is optimized entry by entry, and returned in its shape
+	precision : int or float
+	            numerical threshold on the length of a step at which to stop (default 0.00001)
+	max_iters : int
+	            maximum amount of iterations if precision not met (default 10000)
+	message   : Boolean
+	            Prints summary of number of iterations and the point at which there is local
+	            optimum (default True)
+	mode      : string
+	            'forward' to propagate first derivatives with AutoDiff.Variable, or 'reverse' to
+	            record f on a Reverse.Tape and get the gradient with one backward sweep
+	            (default 'forward')
+
+	OUTPUT
+	=========
+	point    : dictionary
+	           two keys: 'point', whose value is the local optimum, and 'iters', whose value
+	           is the number of iterations.
+
+	NOTES
+	=========
+	An approximation of the inverse Hessian is built from the changes of the gradient, so f
+	is only evaluated with ad.derivative_order(1). Every step is lengthened or shortened until
+	it satisfies the weak Wolfe conditions; updates that would lose positive definiteness are
+	skipped. The approximation is a dense n x n matrix; use LBFGS for many variables.
+
+	EXAMPLES
+	=========
+	>>> import AutoDiff.AutoDiff as ad
+	>>> def f(values):
+	...     x1 = ad.Variable(values['x1'], name='x1')
+	...     x2 = ad.Variable(values['x2'], name='x2')
+	...     return (1 - x1)**2 + 100 * (x2 - x1**2)**2
+	>>> a = BFGS(f, {'x1': -1.2, 'x2': 1.}, message=False)
+	>>> print({var: round(float(a['point'][var]), 6) for var in a['point']})
+	{'x1': 1.0, 'x2': 1.0}
+	'''
+
+	names, shapes, x, fx, g = start(f, init, mode)
+	H = np.eye(len(x))
+
+	iters = 0
+
+	step_norm = float('inf')
+
+	while step_norm > precision and iters < max_iters and np.any(g):
+
+		s, fx, g_next = _line_search(f, names, x, fx, g, -H.dot(g), mode, shapes=shapes)
+		y = g_next - g
+		sy = s.dot(y)
+		if sy > 1e-12:
+			if iters == 0:
+				# scale the first approximation to the curvature along the first step
+				H = (sy / y.dot(y)) * np.eye(len(x))
+			rho = 1 / sy
+			Hy = H.dot(y)
+			H = H - rho * (np.outer(s, Hy) + np.outer(Hy, s)) + (rho**2 * y.dot(Hy) + rho) * np.outer(s, s)
+
+		x = x + s
+		g = g_next
+		step_norm = np.linalg.norm(s)
+
+		iters += 1
+
+	return _finish(names, shapes, x, iters, message)
+
+def LBFGS(f, init, m = 10, precision = 0.00001, max_iters = 10000, message=True, mode='forward'):
+	'''Performs the limited-memory BFGS (L-BFGS) optimization on a function of scalars, using only
+	first derivatives and memory bounded by the history length m.
+
+	INPUT
+	=========
+	f         : function
+	            the objective function that returns AutmoDiff.Variable class;
+	            has 1 argument -- a list of numbers that correspond to values at which
+	            variable are evaluated; or a Trace.Compiled function returned by Trace.trace,
+	            which is replayed instead of evaluated and ignores mode, or a Cache.Cached
+	            function returned by Cache.cache, which is not evaluated again at a point it
+	            has already been evaluated at
+	init      : dictionary
+	            variable string key:int/float value pair that represents the variables
+	            at which they are evaluated.
+	            assumes length matches the number of unique variables in f
+	            an np.array value is optimized entry by entry, and returned in its shape
+	m         : int
+	            number of past steps and gradient changes kept (default 10)
+	precision : int or float
+	            numerical threshold on the length of a step at which to stop (default 0.00001)
+	max_iters : int
+	            maximum amount of iterations if precision not met (default 10000)
+	message   : Boolean
+	            Prints summary of number of iterations and the point at which there is local
+	            optimum (default True)
+	mode      : string
+	            'forward' to propagate first derivatives with AutoDiff.Variable, or 'reverse' to
+	            record f on a Reverse.Tape and get the gradient with one backward sweep
+	            (default 'forward')
+
+	OUTPUT
+	=========
+	point    : dictionary
+	           two keys: 'point', whose value is the local optimum, and 'iters', whose value
+	           is the number of iterations.
+
+	NOTES
+	=========
+	The product of the inverse Hessian approximation with the gradient is computed with the
+	two-loop recursion over the last m pairs of steps and gradient changes, in O(m n) time and
+	memory, and f is only evaluated with ad.derivative_order(1). Steps are found by the same
+	line search as in BFGS.
+
+	EXAMPLES
+	=========
+	>>> import AutoDiff.AutoDiff as ad
+	>>> def f(values):
+	...     x1 = ad.Variable(values['x1'], name='x1')
+	...     x2 = ad.Variable(values['x2'], name='x2')
+	...     return (1 - x1)**2 + 100 * (x2 - x1**2)**2
+	>>> a = LBFGS(f, {'x1': -1.2, 'x2': 1.}, m=5, message=False)
+	>>> print({var: round(float(a['point'][var]), 6) for var in a['point']})
+	{'x1': 1.0, 'x2': 1.0}
+	'''
+
+	names, shapes, x, fx, g = start(f, init, mode)
+	history = deque(maxlen=m)
+
+	iters = 0
+
+	step_norm = float('inf')
+
+	while step_norm > precision and iters < max_iters and np.any(g):
+
+		# two-loop recursion for the product of the inverse Hessian approximation with g
+		q = g.copy()
+		alphas = []
+		for (s, y, rho) in reversed(history):
+			alpha = rho * s.dot(q)
+			q = q - alpha * y
+			alphas.append(alpha)
+		if history:
+			s, y, rho = history[-1]
+			q = q * (s.dot(y) / y.dot(y))
+		for ((s, y, rho), alpha) in zip(history, reversed(alphas)):
+			beta = rho * y.dot(q)
+			q = q + (alpha - beta) * s
+
+		s, fx, g_next = _line_search(f, names, x, fx, g, -q, mode, shapes=shapes)
+		y = g_next - g
+		sy = s.dot(y)
+		if sy > 1e-12:
+			history.append((s, y, 1 / sy))
+
+		x = x + s
+		g = g_next
+		step_norm = np.linalg.norm(s)
+
+		iters += 1
+
+	return _finish(names, shapes, x, iters, message)
+
+def _line_search(f, names, x, fx, g, p, mode, max_evals=50, shapes=None):
+	'''Returns a step along the direction p that satisfies the weak Wolfe conditions, sufficient
+	decrease and curvature, found by doubling and bisecting from the full step, with the value and
+	gradient of f at its end. If no step decreases f enough, the step is zero, with the value and
+	gradient at x, so that the optimizer stops instead of moving uphill.'''
+	slope = g.dot(p)
+	if slope >= 0:
+		# not a descent direction: fall back to the gradient
+		p = -g
+		slope = -g.dot(g)
+	lo, hi = 0., float('inf')
+	t = 1.
+	accepted = None
+	for _ in range(max_evals):
+		fx_next, g_next = value_and_gradient(f, names, x + t * p, mode, shapes)
+		if fx_next > fx + 1e-4 * t * slope:
+			hi = t
+		else:
+			accepted = (t * p, fx_next, g_next)
+			if g_next.dot(p) >= 0.9 * slope:
+				break
+			lo = t
+		t = 2 * lo if hi == float('inf') else (lo + hi) / 2
+	if accepted is None:
+		return np.zeros_like(x), fx, g
+	return accepted
+
+def _finish(names, shapes, x, iters, message):
+	'''Returns the result dictionary of an optimizer, with the value of every variable in the shape of
+	its starting value; see Objective.split.'''
+	curr_point = split(names, shapes, x)
+
+	if message:
+		print('Number of iterations: {}'.format(iters))
+		print('The local minimum occurs at {}'.format(curr_point))
+
+	return {'point':curr_point, 'iters':iters}
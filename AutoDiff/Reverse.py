@@ -0,0 +1,393 @@
+import numpy as np
+
+# tapes entered with a with-block; named Variables created while one is open are recorded on the innermost
+_tapes = []
+
+def _unbroadcast(g, shape):
+    """Sums an adjoint down to the shape of the value it belongs to."""
+    if getattr(g, 'shape', None) == shape:
+        return g
+    g = np.asarray(g)
+    if g.shape == shape:
+        return g
+    g = g.sum(axis=tuple(range(g.ndim - len(shape))))
+    for (axis, n) in enumerate(shape):
+        if n == 1 and g.shape[axis] != 1:
+            g = g.sum(axis=axis, keepdims=True)
+    return g
+
+def _add(acc, g):
+    """Accumulates g into an adjoint that may not have been set yet."""
+    return g if acc is None else acc + g
+
+def _lift(x):
+    """Adds a trailing axis to a value so that it broadcasts against arrays with one column per direction;
+    scalars broadcast already."""
+    if getattr(x, 'ndim', 0) == 0:
+        return x
+    return x[..., None]
+
+def _chain(val, d1, d2):
+    """Returns the value and partials of a unary operation given f, f' and f''."""
+    return val, (d1,), ((0, 0, d2),)
+
+def _pow(c, u, w):
+    cross = u**(w-1) * (1 + w*np.log(u))
+    return (u**w, (w*u**(w-1), np.log(u)*u**w),
+            ((0, 0, w*(w-1)*u**(w-2)), (0, 1, cross), (1, 0, cross), (1, 1, np.log(u)**2*u**w)))
+
+# value, first partials and nonzero second partials of every recorded operation, given a constant c and
+# the values of the operands; 'call' applies the elementary function c of AutoDiff.AutoDiff, 'sum' adds up
+# the values of its operand, 'stack' gathers the scalar values of its operands into one array and 'shift' is
+# the largest value of its operand, the shift of logsumexp, with a zero derivative since the result does not
+# depend on it
+_RULES = {
+    'add':   lambda c, u, w: (u + w, (1.0, 1.0), ()),
+    'sub':   lambda c, u, w: (u - w, (1.0, -1.0), ()),
+    'mul':   lambda c, u, w: (u * w, (w, u), ((0, 1, 1.0), (1, 0, 1.0))),
+    'div':   lambda c, u, w: (u / w, (1/w, -u/w**2), ((0, 1, -1/w**2), (1, 0, -1/w**2), (1, 1, 2*u/w**3))),
+    'pow':   _pow,
+    'pos':   lambda c, u: (u, (1.0,), ()),
+    'neg':   lambda c, u: (-u, (-1.0,), ()),
+    'addc':  lambda c, u: (u + c, (1.0,), ()),
+    'subc':  lambda c, u: (u - c, (1.0,), ()),
+    'rsubc': lambda c, u: (c - u, (-1.0,), ()),
+    'mulc':  lambda c, u: (u * c, (c,), ()),
+    'divc':  lambda c, u: (u / c, (1/c,), ()),
+    'rdivc': lambda c, u: _chain(c/u, -c/u**2, 2*c/u**3),
+    'powc':  lambda c, u: _chain(u**c, c*u**(c-1), c*(c-1)*u**(c-2)),
+    'rpowc': lambda c, u: _chain(c**u, np.log(c)*c**u, np.log(c)**2*c**u),
+    'call':  lambda c, u: c(_Probe(u)),
+    'sum':   lambda c, u: (np.sum(u), (np.ones_like(u),), ()),
+    'stack': lambda c, *us: (np.hstack(us), tuple(np.eye(len(us))), ()),
+    'shift': lambda c, u: (np.max(u), (np.zeros_like(u),), ()),
+}
+
+def _gradient_sweep(args, partials, vals, output):
+    """Returns the adjoints of every recorded value up to position output, with one backward sweep."""
+    shapes = [np.shape(v) for v in vals[:output + 1]]
+    adjoint = [None] * (output + 1)
+    adjoint[output] = np.ones_like(vals[output])
+    for i in range(output, -1, -1):
+        g = adjoint[i]
+        if g is None:
+            continue
+        for (p, d) in zip(args[i], partials[i]):
+            adjoint[p] = _add(adjoint[p], _unbroadcast(g * d, shapes[p]))
+    return adjoint
+
+def _hessian_sweep(args, partials, second, vals, output, tangent, m):
+    """Returns the products of the Hessian of the value at position output with m directions, as the
+    derivatives of the adjoints along the directions, with one forward and one backward sweep.
+
+    tangent is a list holding, for each recorded input, its components of the directions in an array
+    with a trailing axis of length m, and None elsewhere; it is filled in place."""
+    shapes = [np.shape(v) for v in vals[:output + 1]]
+    for i in range(output + 1):
+        for (p, d) in zip(args[i], partials[i]):
+            if tangent[p] is not None:
+                t = _lift(d) * tangent[p]
+                if np.ndim(t) > len(shapes[i]) + 1:
+                    # the operation reduces its operand, as sum does
+                    t = _unbroadcast(t, shapes[i] + (m,))
+                tangent[i] = _add(tangent[i], t)
+    adjoint = [None] * (output + 1)
+    adjoint_dot = [None] * (output + 1)
+    adjoint[output] = np.ones_like(vals[output])
+    adjoint_dot[output] = np.zeros(np.shape(vals[output]) + (m,))
+    for i in range(output, -1, -1):
+        g = adjoint[i]
+        if g is None:
+            continue
+        g_dot = adjoint_dot[i]
+        terms = [g_dot * _lift(d) for d in partials[i]]
+        for (a, b, d2) in second[i]:
+            if tangent[args[i][b]] is not None:
+                terms[a] = terms[a] + _lift(g * d2) * tangent[args[i][b]]
+        for (p, d, t) in zip(args[i], partials[i], terms):
+            adjoint[p] = _add(adjoint[p], _unbroadcast(g * d, shapes[p]))
+            adjoint_dot[p] = _add(adjoint_dot[p], _unbroadcast(t, shapes[p] + (m,)))
+    return adjoint_dot
+
+def hvp(f, point, v):
+    """Returns the product of the Hessian of f at point with the direction v, as a dict of name to
+    np.array, by recording f once on a Tape and doing one forward and one backward sweep, so that the
+    Hessian is never formed.
+
+    Parameters
+    ==========
+    f        : function
+               objective function with one argument, a dict of variable name to value, that returns an
+               AutoDiff.Variable
+    point    : dict of str keys and int/float values
+               point at which the Hessian is taken; its keys are the components returned
+    v        : dict of str keys and int/float values
+               direction; variables that are not in v have a zero component
+
+    Examples
+    ==========
+    >>> import AutoDiff.AutoDiff as ad
+    >>> def f(values):
+    ...     x1 = ad.Variable(values['x1'], name='x1')
+    ...     x2 = ad.Variable(values['x2'], name='x2')
+    ...     return x1**2 * x2
+    >>> hvp(f, {'x1': 1, 'x2': 3}, {'x1': 1})
+    {'x1': array([6.]), 'x2': array([2.])}
+    """
+    with Tape() as tape:
+        output = f(point)
+    return tape.hessian_vector(output, v, point.keys())
+
+
+class Tape:
+    """A record of the operations done on Nodes, from which gradients are obtained with one backward
+    sweep instead of carrying one derivative per named variable through every operation.
+
+    While a Tape is open in a with-block, every named Variable created (without an index) is recorded on
+    it as a Node, so that objective functions written with AutoDiff.AutoDiff.Variable, the overloaded
+    operators and the elementary functions (exp, log, sin, ...) are recorded unchanged.
+
+    Output
+    ==========
+    Tape     : object
+               Contains Tape.inputs, the dict of variable name to the positions of its Nodes, and, for every
+               recorded position, Tape.ops, Tape.args and Tape.consts, the operation, the positions of its
+               operands and its constant, and Tape.vals, Tape.partials and Tape.second, its value, its
+               first partial derivatives and its nonzero second partial derivatives
+
+    Examples
+    ==========
+    >>> import AutoDiff.AutoDiff as ad
+    >>> with Tape() as tape:
+    ...     x1 = ad.Variable(2, name='x1')
+    ...     x2 = ad.Variable(3, name='x2')
+    ...     f = x1 * ad.exp(x2) + x1**2
+    >>> tape.gradient(f)
+    {'x1': array([24.08553692]), 'x2': array([40.17107385])}
+    >>> tape.hessian(f, ['x1', 'x2'])
+    array([[ 2.        , 20.08553692],
+           [20.08553692, 40.17107385]])
+    """
+
+    def __init__(self):
+        self.inputs = {}
+        self.ops = []
+        self.args = []
+        self.consts = []
+        self.vals = []
+        self.partials = []
+        self.second = []
+
+    def __enter__(self):
+        _tapes.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _tapes.remove(self)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def variable(self, val, name=None):
+        """Returns a new input Node with value val; without a name it is a constant."""
+        node = Node(self, self._record('input', (), name, np.array(val).astype(float), (), ()))
+        if name is not None:
+            node.name = name
+            self.inputs.setdefault(name, []).append(node.pos)
+        return node
+
+    def _record(self, op, args, const, val, partials, second):
+        """Appends an operation to the tape and returns its position."""
+        self.ops.append(op)
+        self.args.append(args)
+        self.consts.append(const)
+        self.vals.append(val)
+        self.partials.append(partials)
+        self.second.append(second)
+        return len(self.ops) - 1
+
+    def gradient(self, output, names=None):
+        """Returns the gradient of output as a dict of name to np.array, with one backward sweep.
+        For an array-valued output this is the gradient of the sum of its values.
+
+        Parameters
+        ==========
+        output   : Node
+                   recorded on this tape
+        names    : (optional) iterable of str
+                   variables to differentiate with respect to; defaults to all the inputs of the tape
+        """
+        adjoint = _gradient_sweep(self.args, self.partials, self.vals, output.pos)
+        return self._collect(adjoint, names)
+
+    def hessian_vector(self, output, v, names=None):
+        """Returns the product of the Hessian of output with the direction v, as a dict of name to np.array,
+        with one forward and one backward sweep and without forming the Hessian.
+
+        Parameters
+        ==========
+        output   : Node
+                   recorded on this tape
+        v        : dict of str keys and float/np.array values
+                   direction; variables that are not in v have a zero component
+        names    : (optional) iterable of str
+                   components of the product to return; defaults to all the inputs of the tape
+        """
+        tangent = [None] * (output.pos + 1)
+        for (name, ids) in self.inputs.items():
+            for i in ids:
+                if i <= output.pos:
+                    tangent[i] = np.broadcast_to(_lift(v.get(name, 0.0)), np.shape(self.vals[i]) + (1,))
+        adjoint_dot = _hessian_sweep(self.args, self.partials, self.second, self.vals, output.pos, tangent, 1)
+        return {name: np.atleast_1d(hv[..., 0]) for (name, hv) in self._collect(adjoint_dot, names, (1,)).items()}
+
+    def hessian(self, output, names, columns=None):
+        """Returns the Hessian of output with respect to the scalar variables names as an np.array,
+        with one forward and one backward sweep carrying one direction per variable. If columns is
+        supplied, only the columns of the Hessian for those variables are computed, with one direction
+        per column, and the result has shape (len(names), len(columns))."""
+        names = list(names)
+        columns = names if columns is None else list(columns)
+        m = len(columns)
+        tangent = [None] * (output.pos + 1)
+        for (j, name) in enumerate(columns):
+            for i in self.inputs.get(name, []):
+                if i <= output.pos:
+                    tangent[i] = np.eye(m)[j]
+        adjoint_dot = _hessian_sweep(self.args, self.partials, self.second, self.vals, output.pos, tangent, m)
+        hv = self._collect(adjoint_dot, names, (m,))
+        return np.array([np.sum(hv[name].reshape(-1, m), axis=0) for name in names]).reshape(len(names), m)
+
+    def _collect(self, adjoint, names, trailing=()):
+        """Returns the adjoints of the inputs called names, summed over their Nodes."""
+        if names is None:
+            names = self.inputs
+        result = {}
+        for name in names:
+            total = np.zeros(trailing)
+            for i in self.inputs.get(name, []):
+                if i < len(adjoint) and adjoint[i] is not None:
+                    total = total + adjoint[i]
+            result[name] = total if trailing else np.atleast_1d(total)
+        return result
+
+
+class Node:
+    """A value recorded on a Tape, with the overloaded operators of AutoDiff.AutoDiff.Variable.
+    Instead of derivatives with respect to the named variables, the tape keeps the partial derivatives
+    of the operation that produced each Node with respect to its operands.
+
+    Parameters
+    ==========
+    tape     : Tape
+               tape that the node is recorded on
+    pos      : int
+               position of the node on the tape
+    """
+
+    # make NumPy defer to the reflected operators below
+    __array_ufunc__ = None
+
+    def __init__(self, tape, pos):
+        self.tape = tape
+        self.pos = pos
+        self.val = tape.vals[pos]
+        self.name = None
+
+    def __str__(self):
+        return "ad.Node(val={}, name='{}')".format(self.val, self.name)
+
+    def _apply(self, op, operands, const=None, result=None):
+        """Records op on the Nodes operands and returns the resulting Node; result is the value and partials
+        of the operation when they are already known."""
+        val, partials, second = result or _RULES[op](const, *(x.val for x in operands))
+        pos = self.tape._record(op, tuple(x.pos for x in operands), const,
+                                np.asarray(val, dtype=float), partials, second)
+        return Node(self.tape, pos)
+
+    def _is_node(self, other):
+        """Returns whether other is a Node on the same tape, rather than a constant."""
+        if isinstance(other, Node):
+            if other.tape is not self.tape:
+                raise ValueError('cannot combine Nodes recorded on different tapes')
+            return True
+        if hasattr(other, 'der'):
+            raise TypeError('cannot combine a Node with a forward-mode Variable')
+        return False
+
+    def _chain(self, val, d1, d2, op=None):
+        """Returns the Node op(self) of an elementary function op given f, f' and f'' evaluated at self.val."""
+        return self._apply('call', (self,), op, _chain(val, d1, d2))
+
+    def __pos__(self):
+        return self._apply('pos', (self,))
+
+    def __neg__(self):
+        return self._apply('neg', (self,))
+
+    def __add__(self, other):
+        if self._is_node(other):
+            return self._apply('add', (self, other))
+        return self._apply('addc', (self,), other)
+
+    def __radd__(self, other):
+        return self._apply('addc', (self,), other)
+
+    def __sub__(self, other):
+        if self._is_node(other):
+            return self._apply('sub', (self, other))
+        return self._apply('subc', (self,), other)
+
+    def __rsub__(self, other):
+        return self._apply('rsubc', (self,), other)
+
+    def __mul__(self, other):
+        if self._is_node(other):
+            return self._apply('mul', (self, other))
+        return self._apply('mulc', (self,), other)
+
+    def __rmul__(self, other):
+        return self._apply('mulc', (self,), other)
+
+    def __truediv__(self, other):
+        if self._is_node(other):
+            return self._apply('div', (self, other))
+        return self._apply('divc', (self,), other)
+
+    def __rtruediv__(self, other):
+        return self._apply('rdivc', (self,), other)
+
+    def __pow__(self, other):
+        if self._is_node(other):
+            return self._apply('pow', (self, other))
+        return self._apply('powc', (self,), other)
+
+    def __rpow__(self, other):
+        return self._apply('rpowc', (self,), other)
+
+    def sum(self):
+        """Returns the Node of the sum of the values of self."""
+        return self._apply('sum', (self,))
+
+    def shift(self):
+        """Returns the Node of the largest value of self, with a zero derivative, which a replay of the tape
+        finds again at its own point."""
+        return self._apply('shift', (self,))
+
+
+def _stack(items):
+    """Returns the Node whose values are those of a list of Nodes and constants with one value each,
+    recorded on the tape of the Nodes."""
+    first = next(x for x in items if isinstance(x, Node))
+    nodes = tuple(x if first._is_node(x) else first.tape.variable(x) for x in items)
+    return first._apply('stack', nodes)
+
+
+class _Probe(Node):
+    """Stand-in operand that makes an elementary function return f, f' and f'' instead of a new Node."""
+
+    def __init__(self, val):
+        self.val = val
+
+    def _chain(self, val, d1, d2, op=None):
+        return _chain(val, d1, d2)
@@ -0,0 +1,154 @@
+import numpy as np
+import scipy.sparse
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Reverse import Tape, Node
+
+def sparsity(F, point):
+    """Detects which variables each output of a vector function depends on, by recording F once on a
+    Reverse.Tape and propagating the sets of variables through the recorded operations, without
+    computing any derivative. The pattern is structural: it does not depend on point, as long as F
+    takes the same operations at every point.
+
+    Parameters
+    ==========
+    F        : function
+               function with one argument, a dict of variable name to value, that returns a list of
+               scalar Variables, created without an index, or a VectorVariable
+    point    : dict of str keys and int/float values
+               point at which F is recorded; its keys, in order, are the variables of the columns
+
+    Output
+    ==========
+    pattern  : scipy.sparse.csr_matrix of bool
+               pattern of the Jacobian, with one row per output and one column per variable
+
+    Examples
+    ==========
+    >>> def F(values):
+    ...     x1 = ad.Variable(values['x1'], name='x1')
+    ...     x2 = ad.Variable(values['x2'], name='x2')
+    ...     x3 = ad.Variable(values['x3'], name='x3')
+    ...     return [x1 * x2, ad.exp(x3), 3 * x3 + x2]
+    >>> sparsity(F, {'x1': 1, 'x2': 1, 'x3': 1}).toarray()
+    array([[ True,  True, False],
+           [False, False,  True],
+           [False,  True,  True]])
+    """
+    names = list(point)
+    columns = {name: j for (j, name) in enumerate(names)}
+    with Tape() as tape:
+        outputs = F(point)
+    if isinstance(outputs, ad.VectorVariable):
+        # the Jacobian of a VectorVariable is already stored, so its nonzeros are the pattern
+        known = [name for name in names if name in outputs.index]
+        J = outputs.jacobian(known, sparse=True).tocoo()
+        cols = np.array([columns[name] for name in known], dtype=int)[J.col]
+        return scipy.sparse.csr_matrix((J.data != 0, (J.row, cols)), shape=(len(outputs), len(names)))
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+    # the set of variables of every recorded value, as the bits of an int
+    masks = [0] * len(tape)
+    for (name, ids) in tape.inputs.items():
+        if name in columns:
+            for i in ids:
+                masks[i] = 1 << columns[name]
+    for (i, args) in enumerate(tape.args):
+        for a in args:
+            masks[i] |= masks[a]
+    if any(isinstance(y, ad.Variable) for y in outputs):
+        raise ValueError('F must create its named Variables without an index to be recorded')
+    rows, cols = [], []
+    for (r, y) in enumerate(outputs):
+        mask = masks[y.pos] if isinstance(y, Node) else 0
+        while mask:
+            low = mask & -mask
+            rows.append(r)
+            cols.append(low.bit_length() - 1)
+            mask ^= low
+    return scipy.sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)),
+                                   shape=(len(outputs), len(names)))
+
+def color_columns(pattern):
+    """Groups the columns of a Jacobian pattern into colors of structurally orthogonal columns, that is
+    columns which have no row in common, with a greedy coloring in column order.
+
+    Parameters
+    ==========
+    pattern  : scipy.sparse matrix
+               pattern of the Jacobian
+
+    Output
+    ==========
+    colors   : np.array of int
+               color of every column, from 0 to the number of colors - 1
+    """
+    by_column = scipy.sparse.csc_matrix(pattern)
+    by_row = scipy.sparse.csr_matrix(pattern)
+    colors = np.full(by_column.shape[1], -1)
+    for j in range(by_column.shape[1]):
+        rows = by_column.indices[by_column.indptr[j]:by_column.indptr[j+1]]
+        used = set()
+        for r in rows:
+            used.update(colors[by_row.indices[by_row.indptr[r]:by_row.indptr[r+1]]])
+        c = 0
+        while c in used:
+            c += 1
+        colors[j] = c
+    return colors
+
+
+class SparseJacobian:
+    """The Jacobian of a vector function with a sparse pattern, detected and colored once, and
+    evaluated at any point with one forward pass per color, seeded with all the columns of the color
+    together, instead of one per variable.
+
+    Parameters
+    ==========
+    F        : function
+               function with one argument, a dict of variable name to value, that returns a list of
+               scalar Variables, or a VectorVariable
+    point    : dict of str keys and int/float values
+               point at which the pattern is detected; its keys, in order, are the variables of the columns
+
+    Output
+    ==========
+    SparseJacobian : object
+               Contains SparseJacobian.names, SparseJacobian.pattern, the pattern returned by sparsity,
+               and SparseJacobian.colors, the colors returned by color_columns
+
+    Examples
+    ==========
+    >>> def F(values):
+    ...     x = [ad.Variable(values['x%d' % i], name='x%d' % i) for i in range(4)]
+    ...     return [x[0]**2] + [x[i] * x[i-1] for i in range(1, 4)]
+    >>> point = {'x0': 1., 'x1': 2., 'x2': 3., 'x3': 4.}
+    >>> J = SparseJacobian(F, point)
+    >>> J.ncolors
+    2
+    >>> J(point).toarray()
+    array([[2., 0., 0., 0.],
+           [2., 1., 0., 0.],
+           [0., 3., 2., 0.],
+           [0., 0., 4., 3.]])
+    """
+
+    def __init__(self, F, point):
+        self.F = F
+        self.names = list(point)
+        self.pattern = sparsity(F, point)
+        self.colors = color_columns(self.pattern)
+        self.ncolors = self.colors.max() + 1 if len(self.colors) else 0
+        pattern = self.pattern.tocoo()
+        self._rows = pattern.row
+        self._cols = pattern.col
+        self._entries = [np.flatnonzero(self.colors[self._cols] == c) for c in range(self.ncolors)]
+
+    def __call__(self, point):
+        """Returns the Jacobian at point as a scipy.sparse.csr_matrix."""
+        data = np.zeros(len(self._rows))
+        for c in range(self.ncolors):
+            seed = {self.names[j]: 1.0 for j in np.flatnonzero(self.colors == c)}
+            dval = ad.jvp(self.F, point, seed)[1]
+            entries = self._entries[c]
+            data[entries] = dval[self._rows[entries]]
+        return scipy.sparse.csr_matrix((data, (self._rows, self._cols)), shape=self.pattern.shape)
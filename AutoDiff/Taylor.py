@@ -0,0 +1,490 @@
+import itertools
+import math
+import numpy as np
+import scipy.special
+from AutoDiff.Reverse import Node
+
+# seeds of the open taylor evaluations, as (direction, order, number of leading axes of directions); named
+# Variables created while one is open are returned as Taylor polynomials along its direction
+_expansions = []
+
+def _variable(val, name):
+    """Returns the Taylor polynomial val + t*direction[name] of a named Variable created inside taylor; without
+    a name it is a constant."""
+    direction, order, batch = _expansions[-1]
+    return Taylor.variable(val, 0.0 if name is None else direction.get(name, 0.0), order)
+
+def _batch():
+    """Returns the number of leading axes that carry the directions of the open taylor evaluation."""
+    return _expansions[-1][2] if _expansions else 0
+
+def _lift(c):
+    """Adds a trailing axis to a constant so that it broadcasts against the coefficients of a Taylor polynomial."""
+    return np.asarray(c, dtype=float)[..., None]
+
+def _broadcast_shape(*shapes):
+    """Returns the shape that arrays of the given shapes broadcast to, without allocating them."""
+    return np.broadcast(*(np.broadcast_to(0.0, shape) for shape in shapes)).shape
+
+def _convolve(u, w, j, start=0):
+    """Returns the sum of u_i w_(j-i) for i from start to j, over the last axis of the coefficients."""
+    return np.sum(u[..., start:j+1] * w[..., j-start::-1], axis=-1)
+
+def _product(u, w):
+    """Returns the coefficients of the product of two truncated Taylor polynomials."""
+    k = u.shape[-1]
+    output = np.empty(_broadcast_shape(u.shape, w.shape))
+    for j in range(k):
+        output[..., j] = _convolve(u, w, j)
+    return output
+
+def _quotient(u, w):
+    """Returns the coefficients of u / w, from u = q w solved for one coefficient of q at a time."""
+    k = w.shape[-1]
+    q = np.empty(_broadcast_shape(u.shape, w.shape))
+    q[..., 0] = u[..., 0] / w[..., 0]
+    for j in range(1, k):
+        q[..., j] = (u[..., j] - _convolve(w, q, j, start=1)) / w[..., 0]
+    return q
+
+def _integral(u, g, val):
+    """Returns the coefficients of w with w(0) = val and w' = g u', where g holds the coefficients of g
+    up to the order of u minus one."""
+    k = u.shape[-1]
+    w = np.empty(_broadcast_shape(u.shape, np.shape(val) + (k,)))
+    w[..., 0] = val
+    i = np.arange(1, k)
+    for j in range(1, k):
+        w[..., j] = np.sum(i[:j] * u[..., 1:j+1] * g[..., j-1::-1], axis=-1) / j
+    return w
+
+def _ode(u, val, rate):
+    """Returns the coefficients of w with w(0) = val and w' = rate(w) u', where rate is a polynomial in w whose
+    coefficients up to j only need those of w up to j, so that w is found one coefficient at a time."""
+    k = u.shape[-1]
+    w = np.zeros(_broadcast_shape(u.shape, np.shape(val) + (k,)))
+    g = np.zeros(w.shape)
+    w[..., 0] = val
+    i = np.arange(1, k)
+    for j in range(1, k):
+        g[..., j-1] = rate(w, j-1)
+        w[..., j] = np.sum(i[:j] * u[..., 1:j+1] * g[..., j-1::-1], axis=-1) / j
+    return w
+
+def _exp(u, val):
+    return _ode(u, val, lambda w, m: w[..., m])
+
+def _log(u, val):
+    k = u.shape[-1]
+    w = np.empty(u.shape)
+    w[..., 0] = val
+    i = np.arange(1, k)
+    for j in range(1, k):
+        w[..., j] = (u[..., j] - np.sum(i[:j-1] * w[..., 1:j] * u[..., j-1:0:-1], axis=-1) / j) / u[..., 0]
+    return w
+
+def _pair(u, s0, c0, sign):
+    """Returns the coefficients of s and c with s' = c u' and c' = sign s u', as for sin and cos (sign -1)
+    or sinh and cosh (sign 1)."""
+    k = u.shape[-1]
+    s = np.empty(u.shape)
+    c = np.empty(u.shape)
+    s[..., 0] = s0
+    c[..., 0] = c0
+    i = np.arange(1, k)
+    for j in range(1, k):
+        iu = i[:j] * u[..., 1:j+1]
+        s[..., j] = np.sum(iu * c[..., j-1::-1], axis=-1) / j
+        c[..., j] = sign * np.sum(iu * s[..., j-1::-1], axis=-1) / j
+    return s, c
+
+def _power(u, a):
+    """Returns the coefficients of u**a for a constant a: by repeated squaring for a nonnegative integer,
+    which also holds where u is zero, and from u w' = a w u' otherwise."""
+    if float(a).is_integer() and a >= 0:
+        a = int(a)
+        output = np.zeros(u.shape)
+        output[..., 0] = 1.0
+        while a:
+            if a & 1:
+                output = _product(output, u)
+            a >>= 1
+            if a:
+                u = _product(u, u)
+        return output
+    k = u.shape[-1]
+    w = np.empty(u.shape)
+    w[..., 0] = u[..., 0]**a
+    i = np.arange(1, k)
+    for j in range(1, k):
+        w[..., j] = np.sum(((a + 1) * i[:j] - j) * u[..., 1:j+1] * w[..., j-1::-1], axis=-1) / (j * u[..., 0])
+    return w
+
+def _by_derivative(derivative):
+    """Returns the rule of a function whose derivative is the function derivative of a Taylor polynomial."""
+    def rule(u, val):
+        return _integral(u, derivative(Taylor(u[..., :-1])).coeffs, val)
+    return rule
+
+# coefficients of f(u) from those of u and the value f(u0), for every elementary function by name; the
+# functions of AutoDiff.AutoDiff pass their name to Taylor._chain
+_RULES = {
+    'exp':      _exp,
+    'log':      _log,
+    'sin':      lambda u, val: _pair(u, val, np.cos(u[..., 0]), -1)[0],
+    'cos':      lambda u, val: _pair(u, np.sin(u[..., 0]), val, -1)[1],
+    'sinh':     lambda u, val: _pair(u, val, np.cosh(u[..., 0]), 1)[0],
+    'cosh':     lambda u, val: _pair(u, np.sinh(u[..., 0]), val, 1)[1],
+    'tan':      lambda u, val: _ode(u, val, lambda w, m: (m == 0) + _convolve(w, w, m)),
+    'tanh':     lambda u, val: _ode(u, val, lambda w, m: (m == 0) - _convolve(w, w, m)),
+    'sigmoid':  lambda u, val: _ode(u, val, lambda w, m: w[..., m] - _convolve(w, w, m)),
+    'sqrt':     lambda u, val: _power(u, 0.5),
+    'arcsin':   _by_derivative(lambda u: (1 - u*u)**-0.5),
+    'arccos':   _by_derivative(lambda u: -(1 - u*u)**-0.5),
+    'arctan':   _by_derivative(lambda u: 1 / (1 + u*u)),
+    'erf':      _by_derivative(lambda u: 2 / np.sqrt(np.pi) * _exp_series(-u*u)),
+    'softplus': _by_derivative(lambda u: 1 / (1 + _exp_series(-u))),
+}
+
+def register(name, derivative):
+    """Adds the Taylor rule of an elementwise function, such as a primitive registered with
+    AutoDiff.AutoDiff.primitive, from its derivative.
+
+    Parameters
+    ==========
+    name       : str
+                 name of the function
+    derivative : function
+                 takes a Taylor polynomial u and returns f'(u), computed with the operators and the
+                 elementary functions
+
+    Examples
+    ==========
+    >>> import AutoDiff.AutoDiff as ad
+    >>> cube = ad.primitive('cube', lambda u: (u**3, 3*u**2, 6*u))
+    >>> register('cube', lambda u: 3*u**2)
+    >>> taylor(lambda values: cube(ad.Variable(values['x'], name='x')), {'x': 1.}, {'x': 1.}, 4)
+    array([1., 3., 3., 1., 0.])
+    """
+    _RULES[name] = _by_derivative(derivative)
+
+
+class Taylor:
+    """A truncated Taylor polynomial x(t) = c_0 + c_1 t + ... + c_k t^k of a value along a line through a
+    point, with the overloaded operators of AutoDiff.AutoDiff.Variable. Every operation and elementary
+    function maps the coefficients of its operands to those of its result with a recurrence that costs
+    O(k^2), so that derivatives of any order along the line are propagated in one pass; c_j is the j-th
+    derivative along the line divided by j!.
+
+    Parameters
+    ==========
+    coeffs   : np.array
+               coefficients, with one entry per order on the last axis and the shape of the values before it
+
+    Output
+    ==========
+    Taylor   : object
+               Contains Taylor.coeffs, Taylor.val, the value c_0, and Taylor.order, k
+
+    Examples
+    ==========
+    >>> x = Taylor.variable(0., 1., 4)
+    >>> (1 / (1 - x)).coeffs
+    array([1., 1., 1., 1., 1.])
+    """
+
+    # make NumPy defer to the reflected operators below
+    __array_ufunc__ = None
+
+    def __init__(self, coeffs):
+        self.coeffs = np.asarray(coeffs, dtype=float)
+        self.val = self.coeffs[..., 0]
+
+    @classmethod
+    def variable(cls, val, direction, order):
+        """Returns the polynomial val + direction*t truncated at order."""
+        val, direction = np.broadcast_arrays(np.asarray(val, dtype=float), np.asarray(direction, dtype=float))
+        coeffs = np.zeros(val.shape + (order + 1,))
+        coeffs[..., 0] = val
+        if order > 0:
+            coeffs[..., 1] = direction
+        return cls(coeffs)
+
+    @property
+    def order(self):
+        return self.coeffs.shape[-1] - 1
+
+    def __str__(self):
+        return 'ad.Taylor(coeffs={})'.format(self.coeffs)
+
+    @classmethod
+    def stack(cls, items):
+        """Returns the Taylor polynomial whose values are those of a list of Taylor polynomials and constants
+        with one value each, on a new axis before the coefficients; the axes of the directions of a taylor
+        evaluation, before it, are kept."""
+        order = next(x.order for x in items if isinstance(x, Taylor))
+        coeffs = [_coefficients(x, order) for x in items]
+        shape = _broadcast_shape(*(c.shape for c in coeffs))
+        return cls(np.stack([np.broadcast_to(c, shape) for c in coeffs], axis=-2))
+
+    def sum(self):
+        """Returns the Taylor polynomial of the sum of the values of self, keeping the leading axes that carry
+        the directions of the open taylor evaluation."""
+        return Taylor(np.sum(self.coeffs, axis=self._value_axes()))
+
+    def size(self):
+        """Returns the number of values of self for each direction."""
+        return int(np.prod([self.coeffs.shape[a] for a in self._value_axes()]))
+
+    def _value_axes(self):
+        """Returns the axes of the values of self, between the axes of the directions and the coefficients."""
+        ndim = self.coeffs.ndim - 1
+        return tuple(range(min(_batch(), ndim), ndim))
+
+    def derivatives(self):
+        """Returns the derivatives along the line, of orders 0 to k, on the last axis."""
+        return self.coeffs * np.array([math.factorial(j) for j in range(self.order + 1)], dtype=float)
+
+    def _operand(self, other):
+        """Returns the coefficients of other, or None for a constant."""
+        if isinstance(other, Taylor):
+            if other.order != self.order:
+                raise ValueError('cannot combine Taylor polynomials of orders {} and {}'.format(self.order, other.order))
+            return other.coeffs
+        if isinstance(other, Node) or hasattr(other, 'der') or hasattr(other, 'jac'):
+            raise TypeError('cannot combine a Taylor polynomial with a Variable')
+        return None
+
+    def _shift(self, c):
+        """Returns the coefficients of self plus the constant c."""
+        c = np.asarray(c, dtype=float)
+        coeffs = np.array(np.broadcast_to(self.coeffs, _broadcast_shape(self.coeffs.shape, c.shape + (1,))))
+        coeffs[..., 0] += c
+        return coeffs
+
+    def _chain(self, val, d1, d2, op=None):
+        """Returns the Taylor polynomial op(self) of an elementary function op of AutoDiff.AutoDiff given its
+        value val at self.val; the other derivatives are derived from the rule of op."""
+        name = getattr(op, '__name__', None)
+        if name not in _RULES:
+            raise TypeError('{} has no Taylor rule; add one with Taylor.register'.format(name))
+        return Taylor(_RULES[name](self.coeffs, val))
+
+    def __pos__(self):
+        return Taylor(self.coeffs)
+
+    def __neg__(self):
+        return Taylor(-self.coeffs)
+
+    def __add__(self, other):
+        w = self._operand(other)
+        if w is None:
+            return Taylor(self._shift(other))
+        return Taylor(self.coeffs + w)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        w = self._operand(other)
+        if w is None:
+            return Taylor(self._shift(-np.asarray(other, dtype=float)))
+        return Taylor(self.coeffs - w)
+
+    def __rsub__(self, other):
+        return (-self).__add__(other)
+
+    def __mul__(self, other):
+        w = self._operand(other)
+        if w is None:
+            return Taylor(self.coeffs * _lift(other))
+        return Taylor(_product(self.coeffs, w))
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        w = self._operand(other)
+        if w is None:
+            return Taylor(self.coeffs / _lift(other))
+        return Taylor(_quotient(self.coeffs, w))
+
+    def __rtruediv__(self, other):
+        u = np.zeros(self.coeffs.shape)
+        u[..., 0] = 1.0
+        return Taylor(_quotient(u, self.coeffs) * _lift(other))
+
+    def __pow__(self, other):
+        w = self._operand(other)
+        if w is None:
+            return Taylor(_power(self.coeffs, other))
+        # u**w = exp(w log(u))
+        log_u = _log(self.coeffs, np.log(self.val))
+        return _exp_series(Taylor(_product(w, log_u)))
+
+    def __rpow__(self, other):
+        return _exp_series(self * np.log(other))
+
+
+def _exp_series(u):
+    """Returns the Taylor polynomial exp(u)."""
+    return Taylor(_exp(u.coeffs, np.exp(u.val)))
+
+def taylor(f, point, direction, order):
+    """Returns the Taylor coefficients of t -> f(point + t*direction) at t = 0 up to order, with one forward
+    pass that carries order+1 coefficients through every operation instead of nesting derivatives; the
+    coefficient of order j is the j-th derivative along direction divided by j!.
+
+    Parameters
+    ==========
+    f         : function
+                function with one argument, a dict of variable name to value, that returns a Variable or a
+                list of Variables, written with AutoDiff.AutoDiff.Variable, the operators and the elementary
+                functions
+    point     : dict of str keys and float/np.array values
+                point at which f is expanded
+    direction : dict of str keys and float/np.array values
+                direction of the line; variables that are not in direction have a zero component. Array
+                components expand along several directions at once, one per value; components with more
+                dimensions than the values of point put the directions on leading axes of their own, which
+                the reductions sum, mean, dot, matmul and logsumexp keep
+    order     : int
+                highest order of the coefficients
+
+    Output
+    ==========
+    coeffs    : np.array
+                coefficients with the order on the first axis: of shape (order+1,) followed by the shape of
+                the values for a Variable, and (order+1, m) for a list of m scalar Variables
+
+    Examples
+    ==========
+    >>> import AutoDiff.AutoDiff as ad
+    >>> def f(values):
+    ...     x = ad.Variable(values['x'], name='x')
+    ...     y = ad.Variable(values['y'], name='y')
+    ...     return ad.sin(x) * y
+    >>> taylor(f, {'x': 0., 'y': 2.}, {'x': 1.}, 5)
+    array([ 0.        ,  2.        ,  0.        , -0.33333333,  0.        ,
+            0.01666667])
+    """
+    batch = max([np.ndim(d) for d in direction.values()] + [0]) - max([np.ndim(v) for v in point.values()] + [0])
+    _expansions.append((direction, order, max(batch, 0)))
+    try:
+        output = f(point)
+    finally:
+        _expansions.pop()
+    if isinstance(output, (list, tuple)) and batch > 0:
+        return np.moveaxis(Taylor.stack(output).coeffs, -1, 0)
+    if isinstance(output, (list, tuple)):
+        return np.vstack([np.reshape(_coefficients(y, order), (-1, order + 1)) for y in output]).T
+    return np.moveaxis(_coefficients(output, order), -1, 0)
+
+def _coefficients(y, order):
+    """Returns the coefficients of an output of f, with the order on the last axis; a constant has only c_0."""
+    if isinstance(y, Taylor):
+        return y.coeffs
+    return Taylor.variable(getattr(y, 'val', y), 0.0, order).coeffs
+
+def directional_derivatives(f, point, direction, order):
+    """Returns the derivatives of orders 0 to order of t -> f(point + t*direction) at t = 0, on the first axis;
+    see taylor."""
+    factorials = np.array([math.factorial(j) for j in range(order + 1)], dtype=float)
+    coeffs = taylor(f, point, direction, order)
+    return coeffs * factorials.reshape((-1,) + (1,) * (coeffs.ndim - 1))
+
+def mixed_derivative(f, point, index):
+    """Returns a mixed partial derivative of a scalar function of any order by interpolating the univariate
+    Taylor coefficients along binom(p+d-1, d) directions, where d is its order and p the number of variables
+    it involves (Griewank, Utke and Walther, Math. Comp. 69, 2000). The directions are propagated together,
+    as the values of one array, in one pass.
+
+    Parameters
+    ==========
+    f        : function
+               function with one argument, a dict of variable name to value, that returns a Variable
+    point    : dict of str keys and int/float values
+               point at which the derivative is taken
+    index    : dict of str keys and int values
+               number of times f is differentiated with respect to each variable
+
+    Examples
+    ==========
+    >>> import AutoDiff.AutoDiff as ad
+    >>> def f(values):
+    ...     x = ad.Variable(values['x'], name='x')
+    ...     y = ad.Variable(values['y'], name='y')
+    ...     return x**3 * ad.exp(y)
+    >>> round(float(mixed_derivative(f, {'x': 1., 'y': 0.}, {'x': 2, 'y': 2})), 8)
+    6.0
+    """
+    names = [name for (name, m) in index.items() if m > 0]
+    i = tuple(index[name] for name in names)
+    directions, values = _propagate(f, point, names, sum(i))
+    return _interpolate(i, directions, values)
+
+def derivative_tensor(f, point, order, names=None):
+    """Returns all the partial derivatives of a given order of a scalar function as a symmetric np.array of
+    shape (n,)*order, interpolated from the Taylor coefficients along the binom(n+order-1, order) directions
+    with nonnegative integer components adding up to order, propagated together in one pass; see
+    mixed_derivative.
+
+    Parameters
+    ==========
+    f        : function
+               function with one argument, a dict of variable name to value, that returns a Variable
+    point    : dict of str keys and int/float values
+               point at which the derivatives are taken
+    order    : int
+               order of the derivatives
+    names    : (optional) list of str
+               variables of the axes of the tensor (default the keys of point)
+    """
+    names = list(point) if names is None else list(names)
+    n = len(names)
+    directions, values = _propagate(f, point, names, order)
+    tensor = np.empty((n,) * order)
+    for i in directions:
+        entry = _interpolate(tuple(i), directions, values)
+        axes = [a for (a, m) in enumerate(i) for _ in range(m)]
+        for permutation in set(itertools.permutations(axes)):
+            tensor[permutation] = entry
+    return tensor
+
+def _multi_indices(n, d):
+    """Returns the tuples of n nonnegative integers adding up to d."""
+    for bars in itertools.combinations(range(n + d - 1), n - 1):
+        bounds = (-1,) + bars + (n + d - 1,)
+        yield tuple(bounds[a+1] - bounds[a] - 1 for a in range(n))
+
+def _propagate(f, point, names, d):
+    """Returns the integer directions of order d over names, as an array of shape (D, len(names)), and the
+    Taylor coefficients of order d of f along them, from one taylor evaluation with one value per direction."""
+    directions = np.array(list(_multi_indices(len(names), d)), dtype=int).reshape(-1, len(names))
+    seed = {name: directions[:, a].astype(float) for (a, name) in enumerate(names)}
+    coeffs = taylor(f, point, seed, d)
+    return directions, np.broadcast_to(coeffs[d], (len(directions),))
+
+def _binomial(x, m):
+    """Returns the binomial coefficient of a real x over a nonnegative integer m."""
+    output = 1.0
+    for r in range(m):
+        output *= (x - r) / (r + 1)
+    return output
+
+def _interpolate(i, directions, values):
+    """Returns the derivative with multi-index i from the Taylor coefficients of order d along directions, with
+    the weights sum over 0 < k <= i of (-1)^|i-k| binom(i, k) binom(d k/|k|, j) (|k|/d)^d for every direction j."""
+    d = sum(i)
+    total = 0.0
+    for k in itertools.product(*(range(m + 1) for m in i)):
+        size = sum(k)
+        if size == 0:
+            continue
+        sign = (-1) ** (d - size)
+        scale = sign * np.prod([scipy.special.comb(m, l, exact=True) for (m, l) in zip(i, k)]) * (size / d) ** d
+        for (j, value) in zip(directions, values):
+            weight = np.prod([_binomial(d * l / size, m) for (l, m) in zip(k, j)])
+            if weight:
+                total += scale * weight * value
+    return total
@@ -0,0 +1,213 @@
+import numpy as np
+from AutoDiff.Reverse import Tape, Node, _RULES, _gradient_sweep, _hessian_sweep
+
+def trace(f, example_point):
+    """Records the objective function f once at example_point and returns a Compiled function that
+    replays the recorded operations at new points, without evaluating f or creating Variables again.
+
+    The recording follows the branches that f took at example_point, and values that f computes from
+    the point without making them Variables are kept as constants, so f should only depend on the point
+    through the Variables it creates, with control flow that does not depend on their values.
+
+    Parameters
+    ==========
+    f             : function
+                    objective function with one argument, a dict of variable name to value, that returns
+                    an AutoDiff.Variable
+    example_point : dict of str keys and int/float values
+                    point at which f is recorded; its keys are the variables of the compiled function
+
+    Output
+    ==========
+    Compiled : object
+
+    Examples
+    ==========
+    >>> import AutoDiff.AutoDiff as ad
+    >>> def f(values):
+    ...     x1 = ad.Variable(values['x1'], name='x1')
+    ...     x2 = ad.Variable(values['x2'], name='x2')
+    ...     return x1 * ad.exp(x2) + x1**2
+    >>> cf = trace(f, {'x1': 2, 'x2': 3})
+    >>> cf.gradient([1, 0])
+    array([3., 1.])
+    >>> cf({'x1': 1, 'x2': 0}).hessian(['x1', 'x2'])
+    array([[2., 1.],
+           [1., 1.]])
+    """
+    with Tape() as tape:
+        output = f(example_point)
+    if not isinstance(output, Node):
+        raise TypeError('f must return a Variable that depends on named Variables')
+    return Compiled(tape, output, example_point.keys())
+
+
+class Compiled:
+    """An objective function recorded by trace, evaluated with its value, gradient and Hessian at new
+    points by replaying the operations of the recording on NumPy values.
+
+    Points are given either as a dict of variable name to value, or as a flat np.array with one entry
+    per variable, in the order of Compiled.names. A batch of B points, given as an np.array of shape
+    (B, n) or as a dict of variable name to np.array of shape (B,), is evaluated in one vectorized
+    replay, giving values of shape (B,), gradients of shape (B, n) and Hessians of shape (B, n, n).
+
+    Parameters
+    ==========
+    tape     : Reverse.Tape
+               tape that the function was recorded on
+    output   : Reverse.Node
+               value of the function on the tape
+    names    : iterable of str
+               variables of the function; inputs of the tape with other names are kept as constants
+    """
+
+    def __init__(self, tape, output, names):
+        self.names = list(names)
+        n = output.pos + 1
+        self._args = tape.args[:n]
+        self._consts = tape.consts[:n]
+        self._rules = [_RULES.get(op) for op in tape.ops[:n]]
+        self._output = output.pos
+        self._template = tape.vals[:n]
+        columns = {name: j for (j, name) in enumerate(self.names)}
+        self._inputs = [(i, columns[name]) for (name, ids) in tape.inputs.items() if name in columns
+                        for i in ids if i < n]
+        self._steps = [i for i in range(n) if tape.ops[i] != 'input']
+
+    def __len__(self):
+        return len(self._steps)
+
+    def __call__(self, point, order=2):
+        """Returns the Evaluation of the function at point with derivatives up to order (0, 1 or 2)."""
+        return Evaluation(self.names, *self.evaluate(point, order))
+
+    def value(self, point):
+        """Returns the value of the function at point."""
+        return self.evaluate(point, 0)[0]
+
+    def gradient(self, point):
+        """Returns the gradient of the function at point as a flat np.array."""
+        return self.evaluate(point, 1)[1]
+
+    def hessian(self, point):
+        """Returns the Hessian of the function at point as an np.array."""
+        return self.evaluate(point, 2)[2]
+
+    def _point(self, point):
+        """Returns point as an np.array of floats with one column per variable, ordered as self.names."""
+        if isinstance(point, dict):
+            columns = [np.asarray(point[name], dtype=float) for name in self.names]
+            if max(np.size(c) for c in columns) > 1:
+                return np.stack(np.broadcast_arrays(*columns), axis=-1)
+            point = [c.reshape(()) for c in columns]
+        point = np.array(point, dtype=float)
+        if point.ndim == 2:
+            return point
+        return point.reshape(len(self.names))
+
+    def evaluate(self, point, order=2):
+        """Returns the value, the gradient and the Hessian of the function at point; the derivatives
+        above order are None. The gradient takes one backward sweep and the Hessian one forward and one
+        backward sweep carrying one direction per variable."""
+        x = self._point(point)
+        n = len(self.names)
+        vals, partials, second = self._replay(x)
+        value = vals[self._output]
+        if order == 0:
+            return value, None, None
+        grad = self._gradient(x, vals, partials)
+        if order == 1:
+            return value, grad, None
+        identity = np.eye(n)
+        hess = self._hessian_columns(x, vals, partials, second, [identity[j] for j in range(n)], n)
+        return value, grad, hess
+
+    def hessian_vector(self, point, v):
+        """Returns the gradient of the function at point and the product of its Hessian with the direction
+        v, both as flat np.arrays, with one forward and one backward sweep carrying the single direction v,
+        without forming the Hessian.
+
+        Parameters
+        ==========
+        point    : dict or np.array
+                   a single point
+        v        : np.array
+                   direction, with one entry per variable in the order of Compiled.names
+        """
+        x = self._point(point)
+        v = np.asarray(v, dtype=float)
+        vals, partials, second = self._replay(x)
+        grad = self._gradient(x, vals, partials)
+        hv = self._hessian_columns(x, vals, partials, second, [v[j:j+1] for j in range(len(self.names))], 1)
+        return grad, hv[..., 0]
+
+    def _replay(self, x):
+        """Returns the values, the partial derivatives and the second partial derivatives of every operation
+        of the recording at the points x."""
+        vals = list(self._template)
+        partials = [()] * len(vals)
+        second = [()] * len(vals)
+        for (i, j) in self._inputs:
+            vals[i] = x[..., j]
+        for i in self._steps:
+            operands = (vals[a] for a in self._args[i])
+            vals[i], partials[i], second[i] = self._rules[i](self._consts[i], *operands)
+        return vals, partials, second
+
+    def _gradient(self, x, vals, partials):
+        """Returns the gradient at the points x with one backward sweep."""
+        adjoint = _gradient_sweep(self._args, partials, vals, self._output)
+        grad = np.zeros(x.shape)
+        for (i, j) in self._inputs:
+            if adjoint[i] is not None:
+                grad[..., j] += adjoint[i]
+        return grad
+
+    def _hessian_columns(self, x, vals, partials, second, seeds, m):
+        """Returns the products of the Hessian at the points x with m directions, given as the seeds of
+        the variables, each of length m, with one forward and one backward sweep."""
+        tangent = [None] * len(vals)
+        for (i, j) in self._inputs:
+            tangent[i] = seeds[j]
+        adjoint_dot = _hessian_sweep(self._args, partials, second, vals, self._output, tangent, m)
+        hess = np.zeros(x.shape + (m,))
+        for (i, j) in self._inputs:
+            if adjoint_dot[i] is not None:
+                hess[..., j, :] += adjoint_dot[i]
+        return hess
+
+
+class Evaluation:
+    """The value and derivatives of a Compiled function at a point or a batch of points, with the der and hessian interface
+    of AutoDiff.Variable so that the optimizers can use it in place of a Variable.
+
+    Parameters
+    ==========
+    names    : list of str
+               variables of the function
+    val      : float
+               value of the function
+    grad     : np.array or None
+               flat gradient, in the order of names
+    hess     : np.array or None
+               Hessian, in the order of names
+    """
+
+    def __init__(self, names, val, grad=None, hess=None):
+        self.names = names
+        self.val = val
+        self.grad = grad
+        self.hess = hess
+
+    def __str__(self):
+        return 'ad.Evaluation(val={}, grad={})'.format(self.val, self.grad)
+
+    @property
+    def der(self):
+        """Returns the gradient as a dict of name to np.array, as in AutoDiff.Variable.der."""
+        return {name: np.atleast_1d(self.grad[..., j]) for (j, name) in enumerate(self.names)}
+
+    def hessian(self, lis):
+        """Returns the Hessian with respect to the variables in lis as an np.array."""
+        ids = [self.names.index(name) for name in lis]
+        return self.hess[..., ids, :][..., ids]
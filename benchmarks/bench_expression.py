@@ -0,0 +1,19 @@
+# Times building a long expression of dictionary-mode Variables
+import timeit
+import AutoDiff.AutoDiff as ad
+
+def build(n_terms=1000, n_vars=10):
+    """Builds a sum of n_terms products of elementary functions over n_vars named variables."""
+    xs = [ad.Variable(0.1*(i+1), name='x{}'.format(i)) for i in range(n_vars)]
+    f = 0
+    for i in range(n_terms):
+        f = f + ad.sin(xs[i % n_vars]) * xs[(i+1) % n_vars] / 3 - 1
+    return f
+
+def bench(n_terms=1000, n_vars=10, repeat=5):
+    """Returns the best time in seconds of build(n_terms, n_vars) over repeat runs."""
+    return min(timeit.repeat(lambda: build(n_terms, n_vars), number=1, repeat=repeat))
+
+if __name__ == "__main__":
+    for n_vars in [2, 10, 20]:
+        print('1000 terms, {:2d} variables: {:.3f} s'.format(n_vars, bench(1000, n_vars)))
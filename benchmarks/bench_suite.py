@@ -0,0 +1,216 @@
+# Benchmark suite for the AD core, the elementary functions and the solvers.
+#
+# Runs every case, saves the results as JSON and compares them with a stored baseline:
+#     python benchmarks/bench_suite.py --output results.json --baseline benchmarks/baseline.json
+# exits with status 1 if the median time of a case, or its memory, exceeds the baseline by more than
+# the threshold; the per-op micro cases, whose timings are the noisiest, get the larger
+# --micro-threshold. --save-baseline writes the results as the new baseline. Timings depend on the
+# machine, so the baseline is made with --save-baseline on the machine that runs the comparison and is
+# not kept in the repository; against a baseline from another machine only the memory is compared.
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+import numpy as np
+import AutoDiff.AutoDiff as ad
+import AutoDiff.GradDesc as gd
+from AutoDiff.NewtonOpt import NewtonOpt
+from AutoDiff.QuasiNewton import BFGS, LBFGS
+from AutoDiff.GMRes import gmres_autodiff
+from bench_expression import build
+
+OPS = {
+    'add': lambda a, b: a + b,
+    'mul': lambda a, b: a * b,
+    'div': lambda a, b: a / b,
+    'pow': lambda a, b: a ** b,
+    'sin': lambda a, b: ad.sin(a),
+    'exp': lambda a, b: ad.exp(a),
+    'log': lambda a, b: ad.log(a),
+    'sqrt': lambda a, b: ad.sqrt(a),
+}
+
+def measure(run, repeat=5):
+    """Returns the median time in seconds of one call of run over repeat timings, and the peak memory in
+    bytes allocated during one more call, traced separately so that tracing does not slow down the timing."""
+    timer = timeit.Timer(run)
+    # the calibration run of autorange is the first of the repeats
+    number, elapsed = timer.autorange()
+    seconds = statistics.median([elapsed] + timer.repeat(repeat - 1, number)) / number
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+def operands(n_vars, length):
+    """Returns two Variables that depend on all of n_vars named variables, with val arrays of length."""
+    xs = [ad.Variable(np.linspace(1, 2, length) + i, name='x{}'.format(i)) for i in range(n_vars)]
+    a = sum(xs[1:], xs[0]) / n_vars
+    b = ad.sqrt(a)
+    return a, b
+
+def bench_ops(sizes, lengths, repeat=5):
+    """Times every operator and elementary function on operands of every size and val length."""
+    results = {}
+    for n_vars in sizes:
+        for length in lengths:
+            a, b = operands(n_vars, length)
+            for (name, op) in OPS.items():
+                seconds, peak = measure(lambda: op(a, b), repeat)
+                results['op/{}/vars={}/len={}'.format(name, n_vars, length)] = {'time': seconds, 'peak': peak}
+    return results
+
+def bench_depth(depths, n_vars=10, repeat=5):
+    """Times long expressions, reporting the time per op; every term of build does 5 ops."""
+    results = {}
+    for depth in depths:
+        seconds, peak = measure(lambda: build(depth, n_vars), repeat)
+        results['depth/terms={}'.format(depth)] = {'time': seconds, 'time_per_op': seconds / (5 * depth),
+                                                   'peak': peak}
+    return results
+
+def bench_hessian(sizes, repeat=5):
+    """Times forward-mode Hessians of a dense quadratic form."""
+    results = {}
+    for n_vars in sizes:
+        names = ['x{}'.format(i) for i in range(n_vars)]
+        def run():
+            xs = [ad.Variable(0.5, name=s) for s in names]
+            f = sum(xs[1:], xs[0]) ** 2
+            return f.hessian(names)
+        seconds, peak = measure(run, repeat)
+        results['hessian/vars={}'.format(n_vars)] = {'time': seconds, 'peak': peak}
+    return results
+
+def rosenbrock(values):
+    x1 = ad.Variable(values['x1'], name='x1')
+    x2 = ad.Variable(values['x2'], name='x2')
+    return (1 - x1)**2 + 100 * (x2 - x1**2)**2
+
+def quadratic(values):
+    x1 = ad.Variable(values['x1'], name='x1')
+    x2 = ad.Variable(values['x2'], name='x2')
+    return 0.5 * x1**2 + 5 * x2**2 + x1 * x2
+
+def two_gaussian(values):
+    x1 = ad.Variable(values['x1'], name='x1')
+    x2 = ad.Variable(values['x2'], name='x2')
+    Z1 = ad.exp(-x1**2 - x2**2)
+    Z2 = ad.exp(-(x1 - 1)**2 - (x2 - 1)**2)
+    return (Z1 - Z2) * 2
+
+PROBLEMS = {
+    'rosenbrock': (rosenbrock, {'x1': -1.2, 'x2': 1.}),
+    'quadratic': (quadratic, {'x1': 3., 'x2': -2.}),
+    'two_gaussian': (two_gaussian, {'x1': .8, 'x2': 1.4}),
+}
+
+OPTIMIZERS = {
+    'grad_desc': lambda f, init: gd.grad_desc(f, init, gamma=0.001, max_iters=2000, message=False),
+    'adam': lambda f, init: gd.grad_desc(f, init, gamma=0.05, max_iters=2000, message=False, method='adam'),
+    'newton': lambda f, init: NewtonOpt(f, dict(init), max_iters=200, message=False),
+    'bfgs': lambda f, init: BFGS(f, init, max_iters=2000, message=False),
+    'lbfgs': lambda f, init: LBFGS(f, init, max_iters=2000, message=False),
+}
+
+def bench_optimizers(repeat=5):
+    """Times every optimizer on every test function, recording its iterations and final value."""
+    results = {}
+    for (problem, (f, init)) in PROBLEMS.items():
+        for (name, optimizer) in OPTIMIZERS.items():
+            output = optimizer(f, init)
+            with ad.derivative_order(0):
+                value = float(np.sum(f(output['point']).val))
+            seconds, peak = measure(lambda: optimizer(f, init), repeat)
+            results['optimizer/{}/{}'.format(name, problem)] = {'time': seconds, 'peak': peak,
+                                                                'iters': output['iters'], 'value': value}
+    return results
+
+def bench_gmres(sizes, repeat=5):
+    """Times GMRes solves of tridiagonal systems given as lists of Variables."""
+    results = {}
+    for n in sizes:
+        def run():
+            xs = [ad.Variable(1., name='x{}'.format(i)) for i in range(n)]
+            F = [4 * xs[i] - (xs[i-1] if i > 0 else 0) - (xs[i+1] if i < n-1 else 0) for i in range(n)]
+            return gmres_autodiff(F, np.ones(n))
+        seconds, peak = measure(run, repeat)
+        results['gmres/n={}'.format(n)] = {'time': seconds, 'peak': peak}
+    return results
+
+def run_all(quick=False):
+    """Returns the results of every case, with smaller sweeps and fewer repeats if quick."""
+    repeat = 3 if quick else 5
+    results = {}
+    results.update(bench_ops([1, 10] if quick else [1, 10, 30], [1, 100] if quick else [1, 100, 1000], repeat))
+    results.update(bench_depth([100, 1000] if quick else [100, 1000, 5000], repeat=repeat))
+    results.update(bench_hessian([5, 20] if quick else [5, 20, 50], repeat))
+    results.update(bench_optimizers(repeat))
+    results.update(bench_gmres([50] if quick else [50, 200], repeat))
+    return results
+
+def compare(results, baseline, threshold, micro_threshold=None, keys=('time', 'peak')):
+    """Returns the regressions of results against baseline: the cases whose time or peak memory exceed
+    the baseline by more than the fraction threshold, or micro_threshold for the per-op cases, as
+    (case, key, baseline value, new value). Only the keys given are compared."""
+    if micro_threshold is None:
+        micro_threshold = threshold
+    regressions = []
+    for (case, new) in results.items():
+        old = baseline.get(case)
+        if old is None:
+            continue
+        limit = micro_threshold if case.startswith('op/') else threshold
+        for key in keys:
+            if key in old and new[key] > old[key] * (1 + limit):
+                regressions.append((case, key, old[key], new[key]))
+    return regressions
+
+def platform_info():
+    """Returns the versions and the machine that the results depend on."""
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'node': platform.node(), 'processor': platform.processor()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark suite for AutoDiff')
+    parser.add_argument('--quick', action='store_true', help='run smaller sweeps')
+    parser.add_argument('--output', help='file to save the results to, as JSON')
+    parser.add_argument('--baseline', help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help='fraction by which a case may exceed the baseline (default 0.5)')
+    parser.add_argument('--micro-threshold', type=float, default=1.5,
+                        help='fraction by which a per-op micro case may exceed the baseline (default 1.5)')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline')
+    args = parser.parse_args(argv)
+
+    results = run_all(args.quick)
+    report = dict(platform_info(), results=results)
+    for (case, result) in sorted(results.items()):
+        print('{:45s} {:10.3e} s {:12d} B'.format(case, result['time'], result['peak']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    elif args.baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        keys = ('time', 'peak')
+        if any(stored.get(key) != value for (key, value) in platform_info().items()):
+            print('the baseline was made on another machine or with other versions; only comparing memory')
+            keys = ('peak',)
+        regressions = compare(results, stored['results'], args.threshold, args.micro_threshold, keys)
+        for (case, key, old, new) in regressions:
+            print('REGRESSION {} {}: {:.3e} -> {:.3e}'.format(case, key, old, new))
+        if regressions:
+            return 1
+        print('no regression above {:.0%} of the baseline'.format(args.threshold))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Trace import trace
+
+def f(values):
+    x1 = ad.Variable(values['x1'], name='x1')
+    x2 = ad.Variable(values['x2'], name='x2')
+    return ad.exp(x1*x2) + x1**3 / x2 - ad.sin(x1) * 2 + 1/x2
+
+names = ['x1', 'x2']
+points = np.array([[0.5, 2.], [1.2, 0.3], [-0.4, 1.7], [2., -1.]])
+
+def rowwise():
+    rows = [f(dict(zip(names, p))) for p in points]
+    return (np.array([r.val for r in rows]), np.array([[r.der[s][0] for s in names] for r in rows]),
+            np.array([r.hessian(names) for r in rows]))
+
+class Test_Batch():
+
+    def test_forward(self):
+        val, grad, hess = ad.batch(f, points, names)
+        expected = rowwise()
+        np.testing.assert_allclose(val, expected[0])
+        np.testing.assert_allclose(grad, expected[1])
+        np.testing.assert_allclose(hess, expected[2])
+        assert ad.batch(f, points, names, order=1)[2] is None
+
+    def test_array_hessian(self):
+        output = f({'x1': points[:, 0], 'x2': points[:, 1]})
+        np.testing.assert_allclose(output.hessian(names), rowwise()[2])
+
+    def test_compiled(self):
+        cf = trace(f, {'x1': 1., 'x2': 1.})
+        val, grad, hess = cf.evaluate(points)
+        expected = rowwise()
+        np.testing.assert_allclose(val, expected[0])
+        np.testing.assert_allclose(grad, expected[1])
+        np.testing.assert_allclose(hess, expected[2], rtol=1e-10)
+        evaluation = cf({'x1': points[:, 0], 'x2': points[:, 1]})
+        np.testing.assert_allclose(evaluation.der['x2'], expected[1][:, 1])
+        np.testing.assert_allclose(evaluation.hessian(['x2', 'x1']), expected[2][:, ::-1, ::-1], rtol=1e-10)
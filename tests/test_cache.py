@@ -0,0 +1,93 @@
+import pickle
+import pytest
+import numpy as np
+import AutoDiff.AutoDiff as ad
+import AutoDiff.GradDesc as gd
+from AutoDiff.Cache import cache, Cached
+from AutoDiff.Trace import trace
+from AutoDiff.NewtonOpt import NewtonOpt
+from AutoDiff.QuasiNewton import BFGS
+from AutoDiff.MultiStart import multi_start
+
+calls = []
+
+def g(value):
+    calls.append(dict(value))
+    X = ad.Variable(value['x'], name='x')
+    Y = ad.Variable(value['y'], name='y')
+    Z1 = ad.exp(-X**2 - Y**2)
+    Z2 = ad.exp(-(X - 1)**2 - (Y - 1)**2)
+    return (Z1 - Z2) * 2
+
+names = ['x', 'y']
+init = {'x': .8, 'y': 1.4}
+
+class Test_Cache():
+
+    def test_orders(self):
+        for mode in ('forward', 'reverse'):
+            cf = cache(g, names, mode=mode)
+            point = {'x': .5, 'y': .2}
+            y = g(point)
+            del calls[:]
+            assert np.isclose(cf.value(point), y.val)
+            np.testing.assert_allclose(cf.gradient(point), [y.der['x'][0], y.der['y'][0]])
+            np.testing.assert_allclose(cf.hessian(point), y.hessian(names))
+            # the value is served from the entry, the gradient and the Hessian upgrade it
+            assert len(calls) == 3 and cf.info()[:2] == (0, 3)
+            for order in (0, 1, 2):
+                cf(point, order=order)
+            assert len(calls) == 3 and cf.info()[:2] == (3, 3) and len(cf) == 1
+            with pytest.raises(ValueError):
+                cf.gradient(point)[0] = 1.
+        cf.clear()
+        assert cf.info() == (0, 0, 128, 0, 0)
+
+    def test_eviction(self):
+        cf = cache(g, names, maxsize=2)
+        for x in (0., 1., 2., 0.):
+            cf.value({'x': x, 'y': 0.})
+        assert cf.info()[:2] == (0, 4) and len(cf) == 2
+        cf.value({'x': 2., 'y': 0.})
+        assert cf.info()[:2] == (1, 4)
+        # a Hessian entry takes 16 + 8 + 16 + 32 bytes
+        cf = cache(g, names, maxsize=None, max_bytes=150)
+        for x in (0., 1., 2.):
+            cf.hessian({'x': x, 'y': 0.})
+        assert len(cf) == 2 and cf.nbytes == 144
+        cf.hessian({'x': 0., 'y': 0.})
+        assert cf.info()[:2] == (0, 4)
+
+    def test_tolerance(self):
+        cf = cache(g, names, tol=1e-6)
+        cf.gradient({'x': .3, 'y': .4})
+        cf.gradient({'x': .3 + 1e-9, 'y': .4 - 1e-9})
+        cf.gradient({'x': .3 + 1e-3, 'y': .4})
+        assert cf.info()[:2] == (1, 2)
+        batch = cf.evaluate(np.array([[.3, .4], [.5, .6]]), order=1)
+        assert batch[0].shape == (2,) and batch[1].shape == (2, 2) and batch[2] is None
+        assert cf.info()[:2] == (2, 3)
+
+    def test_optimizers(self):
+        expected = NewtonOpt(g, dict(init), message=False)
+        for f in (cache(g, names), cache(g, names, mode='reverse'), cache(trace(g, init))):
+            assert isinstance(f, Cached)
+            assert NewtonOpt(f, dict(init), message=False) == expected
+            hits = f.info().hits
+            del calls[:]
+            assert NewtonOpt(f, dict(init), message=False) == expected
+            assert calls == [] and f.info().hits == hits + expected['iters']
+        cf = cache(g, names)
+        a = BFGS(cf, init, message=False)
+        b = BFGS(g, init, message=False)
+        np.testing.assert_allclose([a['point'][s] for s in names], [b['point'][s] for s in names])
+        a = gd.grad_desc(cf, init, gamma=0.1, method='momentum', max_iters=50, message=False)
+        b = gd.grad_desc(g, init, gamma=0.1, method='momentum', max_iters=50, message=False)
+        np.testing.assert_allclose([a['point'][s] for s in names], [b['point'][s] for s in names])
+
+    def test_multi_start(self):
+        cf = pickle.loads(pickle.dumps(cache(g, names)))
+        result = multi_start(NewtonOpt, cf, [dict(init), dict(init)], workers=1, message=False)
+        assert result['optima'][0]['count'] == 2
+        # the second start and the values of both end points are found in the cache
+        assert cf.info().misses == result['results'][0]['iters'] + 1
@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.AutoDiff import Variable, VariableIndex
+import AutoDiff.GradDesc as gd
+
+def f(values, index=None):
+    x1 = Variable(values['x1'], name='x1', index=index)
+    x2 = Variable(values['x2'], name='x2', index=index)
+    x3 = Variable(values['x3'], name='x3', index=index)
+    return ad.exp(x1*x2) + x3**2/x2 - ad.sin(x1*x3)
+
+values = {'x1': 0.5, 'x2': 2., 'x3': 1.5}
+
+class Test_Derivative_Order():
+
+    def test_per_variable_order(self):
+        x1 = Variable(3, name='x1', order=1)
+        x2 = Variable(2, name='x2')
+        x3 = Variable(4, name='x3', order=0)
+        z = x1 * x2 * x3
+        assert z.der == {'x1': 8, 'x2': 12}
+        assert z.der2 == {'x2x2': 0}
+        assert z.hnames == {'x2'}
+
+    def test_first_order_context(self):
+        full = f(values)
+        with ad.derivative_order(1):
+            first = f(values)
+        assert first.der2 == {}
+        for name in values:
+            np.testing.assert_array_equal(first.der[name], full.der[name])
+        with ad.derivative_order(0):
+            zeroth = f(values)
+        assert zeroth.der == {} and zeroth.val == full.val
+        # the default is restored when leaving the block
+        assert f(values).der2 == full.der2
+
+    def test_hessian_subset(self):
+        full = f(values)
+        with ad.derivative_order(2, hessian=['x1', 'x3']):
+            part = f(values)
+        assert set(part.der) == {'x1', 'x2', 'x3'}
+        assert set(part.der2) == {'x1x1', 'x1x3', 'x3x1', 'x3x3'}
+        np.testing.assert_allclose(part.hessian(['x1', 'x3']), full.hessian(['x1', 'x3']))
+
+    def test_index_mode(self):
+        full = f(values, VariableIndex())
+        idx = VariableIndex()
+        with ad.derivative_order(2, hessian=['x3', 'x2']):
+            part = f(values, idx)
+        assert idx.hessian_names == ['x2', 'x3']
+        assert part.hess.shape == (1, 2, 2)
+        np.testing.assert_allclose(part.grad, full.grad)
+        np.testing.assert_allclose(part.hessian(['x3', 'x2']), full.hessian(['x3', 'x2']))
+        assert set(part.der2) == {'x2x2', 'x2x3', 'x3x2', 'x3x3'}
+        with pytest.raises(KeyError):
+            part.hessian(['x1'])
+        with ad.derivative_order(1):
+            first = f(values, VariableIndex())
+        assert first.hess.shape == (1, 0, 0)
+
+    def test_graddesc_first_order(self):
+        calls = []
+        def g(values):
+            x1 = Variable(values['x1'], name='x1')
+            calls.append(x1.der2)
+            return x1**2
+        gd.grad_desc(g, {'x1': 1}, gamma=0.1, message=False)
+        assert all(der2 == {} for der2 in calls)
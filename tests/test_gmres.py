@@ -1,7 +1,7 @@
 import pytest
 import numpy as np
 import AutoDiff.AutoDiff as ad
-from AutoDiff.GMRes import gmres_autodiff
+from AutoDiff.GMRes import gmres_autodiff, jacobian, matrix_free
 
     
 def test_gmres_autodiff():
@@ -15,3 +15,40 @@ def test_gmres_autodiff():
     F = [f1, f2, f3]
     x = gmres_autodiff(F, b)
     np.testing.assert_allclose(x, [1, -1, 1])
+
+def F(values):
+    x1 = ad.Variable(values['x1'], name='x1')
+    x2 = ad.Variable(values['x2'], name='x2')
+    x3 = ad.Variable(values['x3'], name='x3')
+    return [2*x1+3*x2+2*x3, 3*x1+2*x2+1*x3, 3*x1+3*x2+3*x3]
+
+def test_jacobian():
+    point = {'x3': 1., 'x1': 1., 'x2': 1.}
+    J = jacobian(F(point))
+    np.testing.assert_array_equal(J, [[2, 3, 2], [3, 2, 1], [3, 3, 3]])
+    Js = jacobian(F(point), names=['x3', 'x1'], sparse=True)
+    np.testing.assert_array_equal(Js.toarray(), [[2, 2], [1, 3], [3, 3]])
+    np.testing.assert_array_equal(matrix_free(F, point)([1, 0, 0]), [2, 1, 3])
+
+def test_gmres_sparse_and_matrix_free():
+    b = [1, 2, 3]
+    point = {'x1': 1., 'x2': 1., 'x3': 1.}
+    np.testing.assert_allclose(gmres_autodiff(F(point), b, sparse=True), [1, -1, 1])
+    np.testing.assert_allclose(gmres_autodiff(F, b, point=point), [1, -1, 1])
+    with pytest.raises(ValueError):
+        gmres_autodiff(F, b)
+
+def test_jvp():
+    val, dval = ad.jvp(lambda values: F(values) + [7], {'x1': 1., 'x2': 2., 'x3': 0.}, {'x2': 1.})
+    np.testing.assert_array_equal(val, [8, 7, 9, 7])
+    np.testing.assert_array_equal(dval, [3, 2, 3, 0])
+
+def test_vector_variable():
+    b = [1, 2, 3]
+    A = np.array([[2, 3, 2], [3, 2, 1], [3, 3, 3]])
+    for sparse in (False, True):
+        x = ad.VectorVariable([1, 1, 1], names=['x1', 'x2', 'x3'], sparse=sparse)
+        np.testing.assert_allclose(gmres_autodiff(A @ x, b), [1, -1, 1])
+    def G(values):
+        return A @ ad.VectorVariable([values['x1'], values['x2'], values['x3']], names=['x1', 'x2', 'x3'])
+    np.testing.assert_allclose(gmres_autodiff(G, b, point={'x1': 0, 'x2': 0, 'x3': 0}), [1, -1, 1])
@@ -24,20 +24,20 @@ def test_single_var_result():
 
 	# varying gammas/step-sizes
 	a = gd.grad_desc(f1, x, gamma = 0.001, message = False)
-	assert (round(a['point']['x1'][0], 5) == 0.00248)
+	assert (round(a['point']['x1'], 5) == 0.00248)
 	assert (a['iters'] == 1898)
 
 	b = gd.grad_desc(f1, x, gamma = 0.01, message = False)
-	assert (round(b['point']['x1'][0], 5) == 0.00024)
+	assert (round(b['point']['x1'], 5) == 0.00024)
 	assert (b['iters'] == 244)
 
 	c = gd.grad_desc(f1, x, gamma = 0.1, message = False)
-	assert (round(c['point']['x1'][0]) == 0.0)
+	assert (round(c['point']['x1']) == 0.0)
 	assert (c['iters'] == 25)
 
 	# this will keep going back between 5 and -5, since gradient is always 20
 	d = gd.grad_desc(f1, x, gamma = 0.5, message = False)
-	assert (d['point']['x1'][0] == 5.)
+	assert (d['point']['x1'] == 5.)
 	assert (d['iters'] == 10000)
 
 	# defining a different starting point
@@ -45,25 +45,25 @@ def test_single_var_result():
 
 	# varying gammas/step-sizes
 	a = gd.grad_desc(f1, x2, gamma = 0.001, message = False)
-	assert (round(a['point']['x1'][0], 5) == -0.00248)
+	assert (round(a['point']['x1'], 5) == -0.00248)
 	assert (a['iters'] == 2244)
 
 	b = gd.grad_desc(f1, x2, gamma = 0.01, message = False)
-	assert (round(b['point']['x1'][0], 5) == -0.00024)
+	assert (round(b['point']['x1'], 5) == -0.00024)
 	assert (b['iters'] == 278)
 
 	c = gd.grad_desc(f1, x2, gamma = 0.1, message = False)
-	assert (round(c['point']['x1'][0]) == 0.0)
+	assert (round(c['point']['x1']) == 0.0)
 	assert (c['iters'] == 28)
 
 	# this will keep going back between -20 and 20, since gradient is always 80
 	d = gd.grad_desc(f1, x2, gamma = 0.5, message = False)
-	assert (d['point']['x1'][0] == -20.)
+	assert (d['point']['x1'] == -20.)
 	assert (d['iters'] == 10000)
 
 	# one less iteration will make it positive
 	d = gd.grad_desc(f1, x2, gamma = 0.5, message = False, max_iters = 9999)
-	assert (d['point']['x1'][0] == 20.)
+	assert (d['point']['x1'] == 20.)
 	assert (d['iters'] == 9999)
 
 def test_single_var_exe():
@@ -87,46 +87,46 @@ def test_multi_var_result():
 
 	# varying gammas/step-sizes
 	a = gd.grad_desc(f2, x, gamma = 0.001, message = False)
-	assert (round(a['point']['x1'][0], 5) == 0.0)
-	assert (round(a['point']['x2'][0], 5) == 4.72238)
+	assert (round(a['point']['x1'], 5) == 0.0)
+	assert (round(a['point']['x2'], 5) == 4.72238)
 	assert (a['iters'] == 5010)
 
 	b = gd.grad_desc(f2, x, gamma = 0.01, message = False)
-	assert (round(b['point']['x1'][0], 5) == 0.0)
-	assert (round(b['point']['x2'][0], 5) == 4.71338)
+	assert (round(b['point']['x1'], 5) == 0.0)
+	assert (round(b['point']['x2'], 5) == 4.71338)
 	assert (b['iters'] == 729)
 
 	c = gd.grad_desc(f2, x, gamma = 0.1, message = False)
-	assert (round(c['point']['x1'][0], 5) == 0.0)
-	assert (round(c['point']['x2'][0], 5) == 4.71247)
+	assert (round(c['point']['x1'], 5) == 0.0)
+	assert (round(c['point']['x2'], 5) == 4.71247)
 	assert (c['iters'] == 93)
 
-	assert(round(np.sin(a['point']['x2'][0])) == -1.0)
-	assert(round(np.sin(b['point']['x2'][0])) == -1.0)
-	assert(round(np.sin(c['point']['x2'][0])) == -1.0)
+	assert(round(np.sin(a['point']['x2'])) == -1.0)
+	assert(round(np.sin(b['point']['x2'])) == -1.0)
+	assert(round(np.sin(c['point']['x2'])) == -1.0)
 
 	# defining a different starting point
 	x = {'x1':-23, 'x2':23}
 
 	# varying gammas/step-sizes, should find closest x2 such that sin(x2) = -1
 	a = gd.grad_desc(f2, x, gamma = 0.001, message = False)
-	assert (round(a['point']['x1'][0], 5) == -0.0)
-	assert (round(a['point']['x2'][0], 5) == 23.55196)
+	assert (round(a['point']['x1'], 5) == -0.0)
+	assert (round(a['point']['x2'], 5) == 23.55196)
 	assert (a['iters'] == 4055)
 
 	b = gd.grad_desc(f2, x, gamma = 0.01, message = False)
-	assert (round(b['point']['x1'][0], 5) == -0.0)
-	assert (round(b['point']['x2'][0], 5) == 23.56096)
+	assert (round(b['point']['x1'], 5) == -0.0)
+	assert (round(b['point']['x2'], 5) == 23.56096)
 	assert (b['iters'] == 634)
 
 	c = gd.grad_desc(f2, x, gamma = 0.1, message = False)
-	assert (round(c['point']['x1'][0], 5) == -0.0)
-	assert (round(c['point']['x2'][0], 5) == 23.56186)
+	assert (round(c['point']['x1'], 5) == -0.0)
+	assert (round(c['point']['x2'], 5) == 23.56186)
 	assert (c['iters'] == 84)
 
-	assert(round(np.sin(a['point']['x2'][0])) == -1.0)
-	assert(round(np.sin(b['point']['x2'][0])) == -1.0)
-	assert(round(np.sin(c['point']['x2'][0])) == -1.0)
+	assert(round(np.sin(a['point']['x2'])) == -1.0)
+	assert(round(np.sin(b['point']['x2'])) == -1.0)
+	assert(round(np.sin(c['point']['x2'])) == -1.0)
 	
 def test_multi_var_exe():
 	# define a starting point
@@ -141,3 +141,85 @@ def test_multi_var_exe():
 
 	with pytest.raises(KeyError):
 		a = gd.grad_desc(f2, x, gamma = 0.01, message = False)
+
+# a badly conditioned quadratic
+def f3(values):
+	x1 = ad.Variable(values['x1'], name='x1')
+	x2 = ad.Variable(values['x2'], name='x2')
+	return 0.5 * x1**2 + 50 * x2**2
+
+def test_methods():
+	x = {'x1':5, 'x2':1}
+	plain = gd.grad_desc(f3, x, gamma = 0.0099, precision = 1e-6, message = False)
+	for (method, gamma) in [('momentum', 0.0099), ('nesterov', 0.0099), ('rmsprop', 0.05), ('adam', 0.1)]:
+		a = gd.grad_desc(f3, x, gamma = gamma, precision = 1e-6, message = False, method = method)
+		assert (abs(a['point']['x1']) < 1e-3)
+		assert (abs(a['point']['x2']) < 1e-3)
+		assert (a['iters'] < plain['iters'])
+
+	with pytest.raises(ValueError):
+		gd.grad_desc(f3, x, gamma = 0.01, message = False, method = 'newton')
+
+def test_first_steps():
+	# with the bias correction, the first steps of rmsprop and adam move every coordinate by about gamma
+	x = {'x1':5, 'x2':1}
+	for method in ('rmsprop', 'adam'):
+		a = gd.grad_desc(f3, x, gamma = 0.01, max_iters = 1, message = False, method = method)
+		assert (np.isclose(a['point']['x1'], 4.99, atol = 1e-6))
+		assert (np.isclose(a['point']['x2'], 0.99, atol = 1e-6))
+
+def test_compiled_order():
+	from AutoDiff.Trace import trace
+	cf = trace(f2, {'x1':5., 'x2':6.})
+	a = gd.grad_desc(cf, {'x2':6, 'x1':5}, gamma = 0.1, message = False, method = 'nesterov')
+	b = gd.grad_desc(f2, {'x2':6, 'x1':5}, gamma = 0.1, message = False, method = 'nesterov')
+	assert (a['iters'] == b['iters'])
+	assert (np.isclose(a['point']['x2'], b['point']['x2']))
+
+# a least squares loss of one batch of (inputs, targets)
+def loss(values, batch):
+	w = ad.Variable(values['w'], name='w')
+	b = ad.Variable(values['b'], name='b')
+	inputs, targets = batch
+	return (w * inputs + b - targets)**2 / len(targets)
+
+X = np.linspace(0, 1, 1000)
+y = 2 * X + 1
+
+def test_batches():
+	assert ([b.tolist() for b in gd.batches(np.arange(5), 2, shuffle = False)] == [[0, 1], [2, 3], [4]])
+	chunks = iter([np.arange(3), np.arange(3, 7), np.arange(7, 8)])
+	assert ([b.tolist() for b in gd.batches(chunks, 3, shuffle = False)] == [[0, 1, 2], [3, 4, 5], [6, 7]])
+	shuffled = list(gd.batches((np.arange(10), -np.arange(10)), 4, rng = np.random.RandomState(0)))
+	assert ([len(b[0]) for b in shuffled] == [4, 4, 2])
+	assert (sorted(np.concatenate([b[0] for b in shuffled])) == list(range(10)))
+	assert (all(np.all(b[1] == -b[0]) for b in shuffled))
+
+def test_sgd(tmp_path):
+	a = gd.sgd(loss, {'w':0, 'b':0}, (X, y), gamma = 0.1, batch_size = 10, epochs = 20, seed = 0, message = False)
+	assert (a['iters'] == 2000)
+	assert (np.isclose(a['point']['w'], 2.))
+	assert (np.isclose(a['point']['b'], 1.))
+
+	# rows read from a file
+	m = np.memmap(tmp_path / 'data.dat', dtype = float, mode = 'w+', shape = (1000, 2))
+	m[:, 0] = X
+	m[:, 1] = y
+	m.flush()
+	m = np.memmap(tmp_path / 'data.dat', dtype = float, mode = 'r', shape = (1000, 2))
+	b = gd.sgd(lambda values, batch: loss(values, batch.T), {'w':0, 'b':0}, m, gamma = 0.1, batch_size = 10,
+			   epochs = 20, seed = 0, message = False, method = 'adam')
+	assert (np.isclose(b['point']['w'], 2., atol = 1e-3))
+	assert (np.isclose(b['point']['b'], 1., atol = 1e-3))
+
+	# a generator of chunks, read again every epoch
+	def chunks():
+		for i in range(0, 1000, 64):
+			yield (X[i:i + 64], y[i:i + 64])
+	c = gd.sgd(loss, {'w':0, 'b':0}, chunks, gamma = 0.1, batch_size = 10, epochs = 20, seed = 0,
+			   message = False, mode = 'reverse')
+	assert (c['iters'] == 2000)
+	assert (np.isclose(c['point']['w'], 2., atol = 1e-2))
+
+	with pytest.raises(ValueError):
+		gd.sgd(loss, {'w':0, 'b':0}, chunks(), gamma = 0.1, epochs = 2, message = False)
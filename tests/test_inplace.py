@@ -0,0 +1,75 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+
+names = ['x%d' % i for i in range(6)]
+
+def residuals(length=1):
+    xs = [ad.Variable(np.linspace(0.1, 0.2, length) * (i+1), name=s) for (i, s) in enumerate(names)]
+    return xs, [(ad.sin(xs[i]) * xs[(i+1) % 6] - 1)**2 for i in range(6)]
+
+def assert_same(a, b, lis):
+    np.testing.assert_allclose(a.val, b.val)
+    assert set(a.der) == set(b.der)
+    for x in a.der:
+        np.testing.assert_allclose(a.der[x], b.der[x])
+    np.testing.assert_allclose(a.hessian(lis), b.hessian(lis))
+
+class Test_Inplace():
+
+    def test_accumulate(self):
+        for length in (1, 3):
+            xs, rs = residuals(length)
+            total = 0
+            for r in rs:
+                total += r
+            assert_same(total, sum(rs), names)
+            total = rs[0] * 1
+            for r in rs[1:]:
+                total -= r
+            total += 2
+            total -= np.ones(length)
+            assert_same(total, rs[0] - sum(rs[1:]) + 1, names)
+
+    def test_multiply(self):
+        xs, rs = residuals(2)
+        total = rs[0] + rs[1]
+        total *= 3
+        total *= rs[2]
+        assert_same(total, (rs[0] + rs[1]) * 3 * rs[2], names[:4])
+
+    def test_copy_on_write(self):
+        xs, rs = residuals()
+        total = rs[0] + rs[1]
+        total += rs[2]
+        # y shares the dictionaries and arrays of total
+        y = total + 1
+        expected = {x: d.copy() for (x, d) in y.der.items()}
+        total += rs[3]
+        total *= 2
+        total -= rs[1]
+        for x in expected:
+            np.testing.assert_allclose(y.der[x], expected[x])
+        assert_same(total, (rs[0] + rs[1] + rs[2] + rs[3]) * 2 - rs[1], names[:5])
+        # the operands are never modified
+        assert_same(rs[2], (ad.sin(xs[2]) * xs[3] - 1)**2, names[2:4])
+
+    def test_independent_variables(self):
+        x = ad.Variable(1., name='x')
+        t = x
+        t += 1
+        assert t is not x
+        assert x.val == 1.
+        assert t.der['x'] == 1.
+
+    def test_shared_with_accumulator(self):
+        x = ad.Variable(1., name='x')
+        y = ad.Variable(2., name='y')
+        t = x * y
+        t += x
+        a = 2 * y * 1
+        # a shares the der['x'] array that t owns
+        a += t
+        t += x
+        t *= 2
+        assert a.der['x'] == 3.
+        assert t.der['x'] == 8.
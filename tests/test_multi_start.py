@@ -0,0 +1,32 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.NewtonOpt import NewtonOpt
+from AutoDiff.QuasiNewton import BFGS
+from AutoDiff.MultiStart import multi_start, random_starts
+
+def f(values):
+    x = ad.Variable(values['x'], name='x')
+    return (x**2 - 1)**2 + 0.1 * x
+
+def g(value):
+    X = ad.Variable(value['x'], name='x')
+    Y = ad.Variable(value['y'], name='y')
+    Z1 = ad.exp(-X**2 - Y**2)
+    Z2 = ad.exp(-(X - 1)**2 - (Y - 1)**2)
+    return (Z1 - Z2) * 2
+
+def test_optima():
+    result = multi_start(NewtonOpt, f, [{'x': -2.}, {'x': -0.5}, {'x': 2.}, {'x': 1.5}], workers=1, message=False)
+    assert [o['count'] for o in result['optima']] == [1, 3]
+    assert np.isclose(result['best']['point']['x'], -1.0123, atol=1e-4)
+    assert result['best']['value'] < result['optima'][1]['value']
+    assert [r['point']['x'] > 0 for r in result['results']] == [False, True, True, True]
+
+def test_pool():
+    starts = random_starts({'x': (0, 2), 'y': (0, 2)}, 8, seed=0)
+    assert len(starts) == 8
+    assert all(0 <= p['x'] <= 2 and 0 <= p['y'] <= 2 for p in starts)
+    serial = multi_start(BFGS, g, starts, workers=1, message=False, max_iters=100)
+    pooled = multi_start(BFGS, g, starts, workers=2, message=False, max_iters=100)
+    assert [r['value'] for r in pooled['results']] == [r['value'] for r in serial['results']]
+    np.testing.assert_allclose([pooled['best']['point']['x'], pooled['best']['point']['y']], 1.0998393, atol=1e-6)
@@ -1,7 +1,8 @@
 import pytest
 import numpy as np
 import AutoDiff.AutoDiff as ad 
-from AutoDiff.NewtonOpt import  NewtonOpt
+from AutoDiff.NewtonOpt import  NewtonOpt, _cg_step
+from AutoDiff.Trace import trace
 
 def f(value):
     """
@@ -20,5 +21,46 @@ def test_newton():
     assert result['point']['y']==1.099839320128867
     assert result['iters']==5
 
+def test_newton_cg():
+    initp ={'x':.8,'y':1.4}
+    direct= NewtonOpt(f,dict(initp),message=False)
+    result= NewtonOpt(f,dict(initp),message=False,solver='cg')
+    assert np.isclose(result['point']['x'],direct['point']['x'])
+    assert np.isclose(result['point']['y'],direct['point']['y'])
+    with pytest.raises(ValueError):
+        NewtonOpt(f,initp,message=False,solver='qr')
+
+def test_newton_cg_compiled():
+    def g(value):
+        X=ad.Variable(value['x'],name='x')
+        Y=ad.Variable(value['y'],name='y')
+        return (X-1)**2 + 3*(Y+2)**2 + X*Y + 0.1*X**4
+    cf=trace(g,{'x':0.,'y':0.})
+    direct= NewtonOpt(g,{'y':0.,'x':0.},message=False)
+    # the variables of init are not in the order of the trace
+    result= NewtonOpt(cf,{'y':0.,'x':0.},message=False,solver='cg')
+    assert np.isclose(result['point']['x'],direct['point']['x'])
+    assert np.isclose(result['point']['y'],direct['point']['y'])
+
+def test_newton_cg_large():
+    n=60
+    def g(value):
+        x=[ad.Variable(value['x%d'%i],name='x%d'%i) for i in range(n)]
+        return sum((x[i+1]-x[i])**2 + 0.1*(x[i]-1)**4 for i in range(n-1)) + (x[0]+1)**2
+    result= NewtonOpt(g,{'x%d'%i:0. for i in range(n)},message=False,solver='cg',max_iters=50)
+    assert result['iters'] < 50
+
+def test_negative_curvature():
+    def h(value):
+        X=ad.Variable(value['x'],name='x')
+        return -X**2 + X**4
+    # at x = 0.1 the curvature is negative, so the first step follows the gradient
+    result= NewtonOpt(h,{'x':.1},message=False,solver='cg')
+    assert np.isclose(abs(result['point']['x']),np.sqrt(0.5))
+    # the steepest descent step is scaled by the curvature: -g / |h''| in one variable
+    for x in (.1, .01):
+        step=_cg_step(h,{'x':x},['x'])
+        assert np.isclose(step[0],-(-2*x+4*x**3)/abs(-2+12*x**2))
+
 if __name__=="__main__":
     test_newton()
@@ -0,0 +1,37 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.NewtonKrylov import newton_krylov
+
+def F(values):
+    x = ad.Variable(values['x'], name='x')
+    y = ad.Variable(values['y'], name='y')
+    return [x**2 + y**2 - 4, x - y]
+
+n = 50
+names = ['u%d' % i for i in range(n)]
+h = 1 / (n + 1)
+
+def bratu(values):
+    """Discretised -u'' = exp(u) on (0, 1) with u(0) = u(1) = 0."""
+    u = ad.VectorVariable([values[s] for s in names], names=names, sparse=True)
+    inner = -(u[2:] - 2*u[1:-1] + u[:-2]) / h**2 - ad.exp(u[1:-1])
+    return ad.concatenate([(2*u[0] - u[1]) / h**2 - ad.exp(u[0]), inner,
+                           (2*u[-1] - u[-2]) / h**2 - ad.exp(u[-1])])
+
+def test_small_system():
+    result = newton_krylov(F, {'x': 1., 'y': 2.}, message=False)
+    assert np.isclose(result['point']['x'], np.sqrt(2)) and np.isclose(result['point']['y'], np.sqrt(2))
+    assert result['residual'] <= 1e-8
+
+def test_bratu():
+    result = newton_krylov(bratu, {s: 0. for s in names}, tol=1e-9, restart=50, message=False)
+    assert result['residual'] <= 1e-9
+    assert result['iters'] <= 10
+    u = np.array([result['point'][s] for s in names])
+    # symmetric solution with its maximum in the middle
+    np.testing.assert_allclose(u, u[::-1], atol=1e-6)
+    assert 0.13 < u.max() < 0.15
+
+def test_iteration_limit():
+    result = newton_krylov(F, {'x': 1., 'y': 2.}, max_iters=1, message=False)
+    assert result['iters'] == 1 and result['residual'] > 1e-8
@@ -66,6 +66,16 @@ class Test_Operator():
         assert x5.val == 27
         assert x5.der == {'x1': np.log(3)*3**3}
 
+    def test_operands_unchanged(self):
+        x1 = Variable(3, name='x1')
+        x2 = Variable(2, name='x2')
+        for x3 in [x1+x2, x1-x2, x1*x2, x1/x2, x1**x2]:
+            assert x1.der == {'x1': 1} and x1.der2 == {'x1x1': 0}
+            assert x2.der == {'x2': 1} and x2.der2 == {'x2x2': 0}
+            assert set(x3.der2) == {'x1x1', 'x1x2', 'x2x1', 'x2x2'}
+        x4 = x1 + 5
+        assert x4.der is x1.der
+
     def test_print(self):
         x1 = Variable(3, name='x1')
         print(x1)
@@ -0,0 +1,45 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.AutoDiff import VectorVariable
+from AutoDiff.GMRes import jacobian
+from AutoDiff.Partition import partition, parallel_jacobian, parallel_hessian
+
+names = ['x%d' % i for i in range(7)]
+point = {s: 0.3 * i - 1 for (i, s) in enumerate(names)}
+
+def F(values):
+    x = [ad.Variable(values[s], name=s) for s in names]
+    return [ad.sin(x[i]) * x[i+1] + ad.exp(x[0]) for i in range(6)] + [x[6] ** 3]
+
+def G(values):
+    x = VectorVariable([values[s] for s in names[:6]], names=names[:6])
+    return ad.tanh(x[1:] * x[:-1])
+
+def f(values):
+    x = [ad.Variable(values[s], name=s) for s in names]
+    return sum((ad.cos(x[i]) * x[i+1]**2 for i in range(6)), x[0] * x[6])
+
+class Test_Partition():
+
+    def test_partition(self):
+        parts = partition(names, 3)
+        assert sum(parts, []) == names
+        assert [len(p) for p in parts] == [2, 3, 2]
+        assert len(partition(names[:2], 5)) == 2
+
+    def test_seed(self):
+        with ad.derivative_order(1, seed=['x1', 'x3']):
+            y = F(point)
+        assert set().union(*(yi.der for yi in y)) == {'x1', 'x3'}
+
+    def test_jacobian(self):
+        expected = jacobian(F(point), names)
+        for (workers, chunks) in [(1, 1), (1, 3), (2, 3)]:
+            np.testing.assert_allclose(parallel_jacobian(F, point, workers, chunks), expected)
+        expected = np.hstack([G(point).jacobian(), np.zeros((5, 1))])
+        np.testing.assert_allclose(parallel_jacobian(G, point, workers=1, chunks=3), expected)
+
+    def test_hessian(self):
+        expected = f(point).hessian(names)
+        for (workers, chunks) in [(1, 1), (1, 4), (2, 2)]:
+            np.testing.assert_allclose(parallel_hessian(f, point, workers, chunks), expected, atol=1e-12)
@@ -0,0 +1,80 @@
+import pickle
+import numpy as np
+import scipy.special
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Reverse import Tape
+
+names = ['x1', 'x2']
+point = np.array([0.3, -0.4])
+
+def inner(x1, x2):
+    # a function of both variables with nonzero second derivatives
+    return x1 * x2 + ad.sin(x1) - x2**2 / 3
+
+def finite_hessian(g, h=1e-4):
+    H = np.zeros((2, 2))
+    e = np.eye(2) * h
+    for i in range(2):
+        for j in range(2):
+            H[i, j] = (g(point + e[i] + e[j]) - g(point + e[i] - e[j]) - g(point - e[i] + e[j])
+                       + g(point - e[i] - e[j])) / (4 * h * h)
+    return H
+
+def _cube(u):
+    return u**3, 3*u**2, 6*u
+
+cube = ad.primitive('cube', _cube)
+
+class Test_Primitives():
+
+    def test_second_derivatives(self):
+        for (name, f) in ad.primitives.items():
+            if name in ('log', 'sqrt', 'arcsin', 'arccos'):
+                g = lambda x1, x2: f(inner(x1, x2) / 4 + 0.5)
+            else:
+                g = lambda x1, x2: f(inner(x1, x2))
+            with ad.derivative_order(0):
+                expected = finite_hessian(lambda v: float(g(ad.Variable(v[0], name='x1'),
+                                                            ad.Variable(v[1], name='x2')).val))
+            y = g(ad.Variable(point[0], name='x1'), ad.Variable(point[1], name='x2'))
+            np.testing.assert_allclose(y.hessian(names), expected, atol=1e-5, err_msg=name)
+            index = ad.VariableIndex()
+            y = g(ad.Variable(point[0], name='x1', index=index), ad.Variable(point[1], name='x2', index=index))
+            np.testing.assert_allclose(y.hessian(names), expected, atol=1e-5, err_msg=name)
+
+    def test_registry(self):
+        x = ad.Variable(2, name='x')
+        y = cube(x)
+        np.testing.assert_allclose([y.val, y.der['x'][0], y.der2['xx'][0]], [8., 12., 12.])
+        assert ad.primitives['cube'] is cube
+        assert ad.primitives['exp'] is ad.exp
+        assert pickle.loads(pickle.dumps(ad.erf)) is ad.erf
+        with Tape() as tape:
+            z = cube(ad.Variable(2, name='x')) * 2
+        np.testing.assert_allclose(tape.hessian(z, ['x']), [[24.]])
+        v = ad.VectorVariable([1., 2.], names=['a', 'b'])
+        np.testing.assert_allclose(cube(v).jacobian(), np.diag([3., 12.]))
+
+    def test_erf_softplus(self):
+        u = np.array([-1., 0., 2.])
+        x = ad.Variable(u, name='x')
+        np.testing.assert_allclose(ad.erf(x).val, scipy.special.erf(u))
+        np.testing.assert_allclose(ad.softplus(x).val, np.log1p(np.exp(u)))
+        np.testing.assert_allclose(ad.softplus(x).der['x'], 1 / (1 + np.exp(-u)))
+        # softplus does not overflow where log(1 + exp(x)) does
+        np.testing.assert_allclose(ad.softplus(ad.Variable(1000., name='x')).val, 1000.)
+
+    def test_logsumexp(self):
+        for index in (None, ad.VariableIndex(), ad.VariableIndex(sparse=True)):
+            x1 = ad.Variable(point[0], name='x1', index=index)
+            x2 = ad.Variable(point[1], name='x2', index=index)
+            terms = [x1 * x2, ad.sin(x1), x2**2 - x1]
+            y = ad.logsumexp(terms)
+            expected = ad.log(ad.exp(terms[0]) + ad.exp(terms[1]) + ad.exp(terms[2]))
+            np.testing.assert_allclose(y.val, expected.val)
+            np.testing.assert_allclose([y.der[s] for s in names], [expected.der[s] for s in names])
+            np.testing.assert_allclose(y.hessian(names, sparse=False), expected.hessian(names, sparse=False))
+        w = ad.Variable(1., name='w')
+        y = ad.logsumexp(w * np.array([1000., 999.]))
+        np.testing.assert_allclose(y.val, 1000 + np.log1p(np.exp(-1)))
+        np.testing.assert_allclose(y.der['w'], (1000 + 999 * np.exp(-1)) / (1 + np.exp(-1)))
@@ -0,0 +1,47 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+
+def f(values):
+    x1 = ad.Variable(values['x1'], name='x1')
+    x2 = ad.Variable(values['x2'], name='x2')
+    return ad.sigmoid(x1 * x2) + ad.exp(x1)**2 - x2 / x1
+
+point = {'x1': 1., 'x2': 2.}
+
+class Test_Profile():
+
+    def test_stats(self):
+        calls = []
+        with ad.profile(hooks=[lambda name, args, result, seconds: calls.append(name)]) as prof:
+            y = f(point)
+            y.hessian(['x1', 'x2'])
+        assert calls == ['__mul__', 'sigmoid', 'exp', '__pow__', '__add__', '__truediv__', '__sub__', 'hessian']
+        # the operations inside sigmoid are not recorded separately
+        assert prof.stats['sigmoid']['calls'] == 1
+        assert prof.stats['exp']['calls'] == 1
+        assert prof.stats['__mul__']['max_der'] == 2
+        assert prof.stats['__mul__']['max_der2'] == 4
+        assert prof.stats['exp']['max_der2'] == 1
+        assert prof.stats['__add__']['bytes'] == 8 * (1 + 2 + 4)
+        assert all(stat['time'] >= 0 for stat in prof.stats.values())
+        assert 'sigmoid' in prof.report()
+
+    def test_off(self):
+        with ad.profile():
+            with ad.profile() as inner:
+                f(point)
+            assert ad.exp is not ad._originals['exp']
+        assert inner.stats['exp']['calls'] == 1
+        # the operations are restored when the last profile is closed
+        assert ad.exp is ad._originals['exp']
+        assert ad.Variable.__mul__ is ad._originals['__mul__']
+        np.testing.assert_allclose(f(point).val, 1 / (1 + np.exp(-2)) + np.exp(2) - 2)
+
+    def test_lookup(self):
+        # functions are wrapped in the module, so a name bound before the block is not recorded
+        from AutoDiff.AutoDiff import exp
+        with ad.profile() as prof:
+            x = ad.Variable(1., name='x')
+            exp(x)
+            ad.exp(x)
+        assert prof.stats['exp']['calls'] == 1
@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.QuasiNewton import BFGS, LBFGS
+from AutoDiff.Trace import trace
+
+def rosenbrock(values):
+    x1 = ad.Variable(values['x1'], name='x1')
+    x2 = ad.Variable(values['x2'], name='x2')
+    return (1 - x1)**2 + 100 * (x2 - x1**2)**2
+
+def g(value):
+    X=ad.Variable(value['x'],name='x')
+    Y=ad.Variable(value['y'],name='y')
+    Z1 = ad.exp(-X**2 - Y**2)
+    Z2 = ad.exp(-(X - 1)**2 - (Y - 1)**2)
+    return (Z1 - Z2) * 2
+
+init = {'x1': -1.2, 'x2': 1.}
+
+@pytest.mark.parametrize('optimizer', [BFGS, LBFGS])
+def test_rosenbrock(optimizer):
+    for mode in ('forward', 'reverse'):
+        result = optimizer(rosenbrock, init, message=False, mode=mode)
+        np.testing.assert_allclose([result['point']['x1'], result['point']['x2']], [1., 1.], atol=1e-6)
+        assert result['iters'] < 100
+    compiled = optimizer(trace(rosenbrock, init), init, message=False)
+    assert np.isclose(compiled['point']['x1'], 1.)
+
+@pytest.mark.parametrize('optimizer', [BFGS, LBFGS])
+def test_newton_point(optimizer):
+    result = optimizer(g, {'x': .8, 'y': 1.4}, message=False)
+    assert np.isclose(result['point']['x'], 1.099839320128867)
+    assert np.isclose(result['point']['y'], 1.099839320128867)
+
+def test_first_order_only():
+    def h(values):
+        x1 = ad.Variable(values['x1'], name='x1')
+        assert x1.der2 == {}
+        return (x1 - 3)**2
+    assert np.isclose(BFGS(h, {'x1': 0.}, message=False)['point']['x1'], 3.)
+
+def test_history():
+    n = 30
+    def h(values):
+        x = [ad.Variable(values['x%d' % i], name='x%d' % i) for i in range(n)]
+        return sum((i + 1) * (x[i] - 1)**2 for i in range(n))
+    start = {'x%d' % i: 0. for i in range(n)}
+    short = LBFGS(h, start, m=2, message=False)
+    long = LBFGS(h, start, m=30, message=False)
+    assert long['iters'] < short['iters']
+    np.testing.assert_allclose(list(long['point'].values()), np.ones(n), atol=1e-5)
+    with pytest.raises(ValueError):
+        LBFGS(h, start, message=False, mode='sideways')
+
+def test_line_search_fallback():
+    from AutoDiff.QuasiNewton import _line_search
+    def h(values):
+        x = ad.Variable(values['x'], name='x')
+        return x**2
+    # every trial of a much too long step fails the sufficient decrease test
+    x = np.array([1.])
+    step, fx, grad = _line_search(h, ['x'], x, 1., np.array([2.]), np.array([-100.]), 'forward', max_evals=3)
+    # no step is taken, and the value and gradient are those at x
+    assert step[0] == 0. and fx == 1. and grad[0] == 2.
+    # f increases along p, which a wrong gradient makes look like a descent direction
+    step, fx, grad = _line_search(h, ['x'], x, 1., np.array([-2.]), np.array([1.]), 'forward')
+    assert step[0] == 0. and fx == 1. and grad[0] == -2.
+
+def test_array_values():
+    import AutoDiff.GradDesc as gd
+    def h(values):
+        w = ad.Variable(values['w'], name='w')
+        b = ad.Variable(values['b'], name='b')
+        return ad.sum((w * b - np.array([1., 2., 3.]))**2) + (b - 2)**2
+    start = {'w': np.full(3, .1), 'b': 1.}
+    for mode in ('forward', 'reverse'):
+        results = [BFGS(h, start, message=False, mode=mode), LBFGS(h, start, message=False, mode=mode),
+                   gd.grad_desc(h, start, gamma=0.05, message=False, mode=mode)]
+        for result in results:
+            # every optimizer returns a float for a scalar and an array of the starting shape otherwise
+            assert isinstance(result['point']['b'], float) and result['point']['w'].shape == (3,)
+            np.testing.assert_allclose(result['point']['w'], [.5, 1., 1.5], atol=1e-3)
+            assert np.isclose(result['point']['b'], 2., atol=1e-3)
@@ -0,0 +1,82 @@
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Reverse import Tape
+from AutoDiff.Trace import trace
+
+rng = np.random.RandomState(0)
+X = rng.normal(size=(8, 3))
+y = rng.normal(size=8)
+names = ['w0', 'w1', 'w2']
+point = {'w0': 0.3, 'w1': -0.2, 'w2': 0.5}
+
+def weights(index=None):
+    return [ad.Variable(point[s], name=s, index=index) for s in names]
+
+def reference():
+    w = weights()
+    r = [w[0]*X[i, 0] + w[1]*X[i, 1] + w[2]*X[i, 2] - y[i] for i in range(len(y))]
+    return sum(ri*ri for ri in r[1:]) + r[0]*r[0]
+
+def least_squares(values):
+    w = [ad.Variable(values[s], name=s) for s in names]
+    r = ad.matmul(X, w) - y
+    return ad.dot(r, r)
+
+def assert_same(a, b, lis):
+    np.testing.assert_allclose(a.val, b.val)
+    for x in lis:
+        np.testing.assert_allclose(a.der[x], b.der[x])
+    np.testing.assert_allclose(a.hessian(lis, sparse=False), b.hessian(lis))
+
+class Test_Reductions():
+
+    def test_least_squares(self):
+        expected = reference()
+        for index in (None, ad.VariableIndex(), ad.VariableIndex(sparse=True)):
+            r = ad.matmul(X, weights(index)) - y
+            assert_same(ad.dot(r, r), expected, names)
+            assert_same(ad.sum(r**2), expected, names)
+            assert_same(ad.mean(r**2) * len(y), expected, names)
+
+    def test_array_values(self):
+        w = ad.Variable(2., name='w')
+        b = ad.Variable(0.5, name='b')
+        x = np.linspace(0, 1, 5)
+        loss = ad.sum((w*x + b - x)**2)
+        expected = sum((w*xi + b - xi)**2 for xi in x)
+        assert_same(loss, expected, ['w', 'b'])
+        # the derivative of b is stored once for all the values, and still counts once per value
+        np.testing.assert_allclose(ad.sum(w*x + b).der['b'], [5.])
+        f = ad.dot(w*x, ad.exp(b*x))
+        assert_same(f, sum((w*xi) * ad.exp(b*xi) for xi in x), ['w', 'b'])
+
+    def test_matmul_orders(self):
+        w = weights()
+        y1 = ad.matmul(X, w)
+        y2 = ad.matmul(w, X.T)
+        np.testing.assert_allclose(y1.val, X @ list(point.values()))
+        np.testing.assert_allclose(y1.der['w1'], X[:, 1])
+        np.testing.assert_allclose(y2.der['w1'], X[:, 1])
+        np.testing.assert_allclose(ad.matmul(X[0], w).der['w2'], [X[0, 2]])
+
+    def test_tape(self):
+        expected = reference()
+        with Tape() as tape:
+            output = least_squares(point)
+        np.testing.assert_allclose(output.val, expected.val)
+        gradient = tape.gradient(output)
+        for s in names:
+            np.testing.assert_allclose(gradient[s], expected.der[s])
+        np.testing.assert_allclose(tape.hessian(output, names), expected.hessian(names))
+        compiled = trace(least_squares, point)
+        np.testing.assert_allclose(compiled.hessian(point), expected.hessian(names))
+
+    def test_vector_and_constants(self):
+        v = ad.VectorVariable([1., 2., 3.], names=['a', 'b', 'c'])
+        np.testing.assert_allclose(ad.sum(v).jacobian(), [[1., 1., 1.]])
+        np.testing.assert_allclose(ad.mean(v).val, [2.])
+        np.testing.assert_allclose(ad.dot(v, [1, 2, 3]).jacobian(), [[1., 2., 3.]])
+        np.testing.assert_allclose(ad.matmul(v, np.eye(3)[:, :2]).jacobian(), np.eye(3)[:2])
+        assert ad.sum([1, 2]) == 3
+        assert ad.dot([1, 2], [3, 4]) == 11
+        np.testing.assert_allclose(ad.matmul(np.eye(2), [1, 2]), [1, 2])
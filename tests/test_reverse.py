@@ -0,0 +1,109 @@
+import copy
+import pickle
+import pytest
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Reverse import Tape, Node, hvp
+import AutoDiff.GradDesc as gd
+from AutoDiff.NewtonOpt import NewtonOpt
+
+def f(values, index=None):
+    x1 = ad.Variable(values['x1'], name='x1', index=index)
+    x2 = ad.Variable(values['x2'], name='x2', index=index)
+    x3 = ad.Variable(values['x3'], name='x3', index=index)
+    z = ad.exp(x1*x2) + x3**2/x2 - ad.sin(x1*x3) + x1**x2 + 2**x3 - 1/x1 + ad.log(x3) * ad.sqrt(x2)
+    z = z + ad.tanh(x1) - ad.arctan(x3 - x2) + ad.sigmoid(x1) - (-x2) * 3 + ad.cosh(x1/4)
+    return z
+
+values = {'x1': 0.5, 'x2': 2., 'x3': 1.5}
+
+def g(value):
+    X=ad.Variable(value['x'],name='x')
+    Y=ad.Variable(value['y'],name='y')
+    Z1 = ad.exp(-X**2 - Y**2)
+    Z2 = ad.exp(-(X - 1)**2 - (Y - 1)**2)
+    return (Z1 - Z2) * 2
+
+class Test_Reverse():
+
+    def test_records_variables(self):
+        with Tape() as tape:
+            x1 = ad.Variable(1, name='x1')
+        x2 = ad.Variable(1, name='x2')
+        assert isinstance(x1, Node) and isinstance(x2, ad.Variable)
+        assert tape.inputs == {'x1': [0]}
+
+    def test_copy_and_pickle(self):
+        # Variable.__new__ takes no required argument, so that copy and pickle can rebuild Variables
+        for index in (None, ad.VariableIndex()):
+            y = f(values, index)
+            for z in (copy.copy(y), copy.deepcopy(y), pickle.loads(pickle.dumps(y))):
+                assert type(z) is ad.Variable
+                np.testing.assert_allclose(z.val, y.val)
+                np.testing.assert_allclose(z.hessian(['x1', 'x2', 'x3']), y.hessian(['x1', 'x2', 'x3']))
+        # a copy of an in-place accumulator does not follow its later updates
+        t = ad.Variable(1., name='x') * 2
+        t += ad.Variable(1., name='x')
+        u = copy.copy(t)
+        t += ad.Variable(1., name='x')
+        assert u.der['x'] == 3. and t.der['x'] == 4.
+
+    def test_gradient(self):
+        forward = f(values)
+        with Tape() as tape:
+            reverse = f(values)
+        assert np.isclose(forward.val, reverse.val)
+        grad = tape.gradient(reverse)
+        for name in values:
+            np.testing.assert_allclose(grad[name], forward.der[name])
+
+    def test_hessian(self):
+        names = ['x1', 'x2', 'x3']
+        forward = f(values, ad.VariableIndex()).hessian(names)
+        with Tape() as tape:
+            reverse = f(values)
+        np.testing.assert_allclose(tape.hessian(reverse, names), forward, rtol=1e-10)
+        hv = tape.hessian_vector(reverse, {'x1': 1., 'x3': -2.})
+        np.testing.assert_allclose([hv[s][0] for s in names], forward @ [1., 0., -2.], rtol=1e-10)
+
+    def test_broadcasting(self):
+        with Tape() as tape:
+            x1 = ad.Variable(2, name='x1')
+            x2 = ad.Variable([1, 2, 3], name='x2')
+            z = x1 * x2
+        grad = tape.gradient(z)
+        np.testing.assert_allclose(grad['x1'], [6.])
+        np.testing.assert_allclose(grad['x2'], [2., 2., 2.])
+
+    def test_mixing(self):
+        x1 = ad.Variable(1, name='x1')
+        with Tape():
+            x2 = ad.Variable(1, name='x2')
+            with pytest.raises(TypeError):
+                x2 + x1
+        with Tape():
+            x3 = ad.Variable(1, name='x3')
+        with pytest.raises(ValueError):
+            x2 * x3
+
+    def test_optimizers(self):
+        def h(values):
+            x1 = ad.Variable(values['x1'], name='x1')
+            x2 = ad.Variable(values['x2'], name='x2')
+            return 2 * (x1 ** 2) + ad.sin(x2)
+        x = {'x1': 5, 'x2': 6}
+        a = gd.grad_desc(h, x, gamma=0.01, message=False)
+        b = gd.grad_desc(h, x, gamma=0.01, message=False, mode='reverse')
+        assert a['iters'] == b['iters']
+        np.testing.assert_allclose(a['point']['x2'], b['point']['x2'])
+        result = NewtonOpt(g, {'x': .8, 'y': 1.4}, message=False, mode='reverse')
+        assert np.isclose(result['point']['x'], 1.099839320128867)
+        assert result['iters'] == 5
+        with pytest.raises(ValueError):
+            NewtonOpt(g, {'x': .8, 'y': 1.4}, message=False, mode='sideways')
+
+    def test_hvp(self):
+        names = ['x1', 'x2', 'x3']
+        H = f(values, ad.VariableIndex()).hessian(names)
+        hv = hvp(f, values, {'x2': 2.})
+        np.testing.assert_allclose([hv[s][0] for s in names], H @ [0., 2., 0.], rtol=1e-10)
@@ -0,0 +1,60 @@
+import pytest
+import numpy as np
+import scipy.sparse
+import AutoDiff.AutoDiff as ad
+from AutoDiff.AutoDiff import Variable, VariableIndex, SparseHessian
+
+def f(values, index=None):
+    x1 = Variable(values['x1'], name='x1', index=index)
+    x2 = Variable(values['x2'], name='x2', index=index)
+    x3 = Variable(values['x3'], name='x3', index=index)
+    return ad.exp(x1*x2) + x3**2/x2 - ad.sin(x1*x3) + x1**x2 + 2**x3 - 1/x1 + ad.log(x3) * ad.sqrt(x2)
+
+values = {'x1': 0.5, 'x2': 2., 'x3': 1.5}
+names = ['x1', 'x2', 'x3']
+
+class Test_Sparse_Hessian():
+
+    def test_matches_dense(self):
+        dense = f(values, VariableIndex())
+        sparse = f(values, VariableIndex(sparse=True, density=1.))
+        assert isinstance(sparse.hess, SparseHessian)
+        np.testing.assert_allclose(sparse.grad, dense.grad)
+        np.testing.assert_allclose(sparse.hessian(names, sparse=False), dense.hessian(names))
+        H = sparse.hessian(['x3', 'x1'])
+        assert scipy.sparse.issparse(H)
+        np.testing.assert_allclose(H.toarray(), dense.hessian(['x3', 'x1']))
+        assert dict(sparse.der2) == pytest.approx(dict(dense.der2))
+
+    def test_separable(self):
+        idx = VariableIndex(sparse=True)
+        xs = [Variable(0.5*i, name='x{}'.format(i), index=idx) for i in range(50)]
+        z = 0
+        for x in xs:
+            z = z + ad.cos(x) * x
+        # one triangle without structural zeros: only the diagonal is stored
+        assert isinstance(z.hess, SparseHessian)
+        assert len(z.hess.rows) == 50 and set(z.der2) == {s+s for s in idx.names}
+        with pytest.raises(KeyError):
+            z.der2['x1x2']
+        H = z.hessian(idx.names)
+        x = 0.5*np.arange(50)
+        np.testing.assert_allclose(H.diagonal(), -2*np.sin(x) - x*np.cos(x))
+        assert H.nnz == 50
+
+    def test_switch_to_dense(self):
+        idx = VariableIndex(sparse=True, density=0.4)
+        x1 = Variable(1, name='x1', index=idx)
+        x2 = Variable(2, name='x2', index=idx)
+        x3 = Variable(3, name='x3', index=idx)
+        y = x1 * x2
+        assert isinstance(y.hess, SparseHessian)
+        z = y * x3
+        assert isinstance(z.hess, np.ndarray)
+        np.testing.assert_allclose(z.hessian(names), [[0, 3, 2], [3, 0, 1], [2, 1, 0]])
+        assert scipy.sparse.issparse(z.hessian(names, sparse=True))
+
+    def test_dictionary_mode(self):
+        H = f(values).hessian(names, sparse=True)
+        assert scipy.sparse.issparse(H)
+        np.testing.assert_allclose(H.toarray(), f(values).hessian(names))
@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Sparsity import sparsity, color_columns, SparseJacobian
+from AutoDiff.GMRes import jacobian, gmres_autodiff
+
+n = 12
+names = ['u%d' % i for i in range(n)]
+
+def F(values):
+    u = [ad.Variable(values[s], name=s) for s in names]
+    return [u[0] - 1] + [u[i+1] - 2*u[i] + u[i-1] + 0.1*ad.exp(u[i]) for i in range(1, n-1)] + [u[-1] * 2]
+
+def G(values):
+    u = ad.VectorVariable([values[s] for s in names], names=names, sparse=True)
+    return ad.concatenate([u[0] - 1, u[2:] - 2*u[1:-1] + u[:-2] + 0.1*ad.exp(u[1:-1]), u[-1] * 2])
+
+point = {s: np.sin(i) for (i, s) in enumerate(names)}
+
+class Test_Sparsity():
+
+    def test_pattern(self):
+        pattern = sparsity(F, point)
+        expected = jacobian(F(point), names) != 0
+        np.testing.assert_array_equal(pattern.toarray(), expected)
+        np.testing.assert_array_equal(sparsity(G, point).toarray(), expected)
+
+    def test_coloring(self):
+        pattern = sparsity(F, point)
+        colors = color_columns(pattern)
+        assert colors.max() + 1 == 3
+        dense = pattern.toarray()
+        for c in range(3):
+            assert dense[:, colors == c].sum(axis=1).max() <= 1
+
+    def test_jacobian(self):
+        other = {s: np.cos(i) for (i, s) in enumerate(names)}
+        for f in (F, G):
+            J = SparseJacobian(f, point)
+            assert J.ncolors == 3
+            np.testing.assert_allclose(J(other).toarray(), jacobian(F(other), names))
+        x = gmres_autodiff(J(other), np.ones(n))
+        np.testing.assert_allclose(jacobian(F(other), names) @ x, np.ones(n), atol=1e-4)
+
+    def test_indexed(self):
+        def H(values):
+            index = ad.VariableIndex()
+            return [ad.Variable(values[s], name=s, index=index) for s in names]
+        with pytest.raises(ValueError):
+            sparsity(H, point)
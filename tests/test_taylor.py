@@ -0,0 +1,98 @@
+import math
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Taylor import Taylor, taylor, directional_derivatives, mixed_derivative, derivative_tensor, register
+
+def _quartic(u):
+    return u**4, 4*u**3, 12*u**2
+
+quartic = ad.primitive('quartic', _quartic)
+register('quartic', lambda u: 4*u**3)
+
+def example(values):
+    x = ad.Variable(values['x'], name='x')
+    y = ad.Variable(values['y'], name='y')
+    z = ad.Variable(values['z'], name='z')
+    return ad.exp(x * y) * ad.sin(z) + x**3 * y**2
+
+class Test_Taylor():
+
+    def test_univariate(self):
+        order = 8
+        j = np.arange(order + 1)
+        factorials = np.array([math.factorial(i) for i in j], dtype=float)
+        cases = [
+            (lambda x: ad.exp(x), 1 / factorials),
+            (lambda x: 1 / (1 - x), np.ones(order + 1)),
+            (lambda x: ad.log(1 + x), np.r_[0., (-1.)**(j[1:] + 1) / j[1:]]),
+            (lambda x: ad.sin(x), np.where(j % 2 == 1, (-1.)**((j - 1) // 2), 0.) / factorials),
+            (lambda x: (1 + x)**0.5, [np.prod([(0.5 - r) / (r + 1) for r in range(i)]) for i in j]),
+            (lambda x: quartic(1 + x), [1., 4., 6., 4., 1., 0., 0., 0., 0.]),
+        ]
+        for (g, expected) in cases:
+            coeffs = taylor(lambda values: g(ad.Variable(values['x'], name='x')), {'x': 0.}, {'x': 1.}, order)
+            np.testing.assert_allclose(coeffs, expected, atol=1e-12)
+
+    def test_against_forward_mode(self):
+        point = {'x': 0.4, 'y': -0.7, 'z': 1.1}
+        direction = {'x': 1., 'y': 2., 'z': -0.5}
+        derivatives = directional_derivatives(example, point, direction, 2)
+        y = example(point)
+        v = np.array([direction[s] for s in 'xyz'])
+        np.testing.assert_allclose(derivatives[0], y.val)
+        np.testing.assert_allclose(derivatives[1], sum(y.der[s] * direction[s] for s in 'xyz'))
+        np.testing.assert_allclose(derivatives[2], v @ y.hessian(['x', 'y', 'z']) @ v)
+        np.testing.assert_allclose(derivative_tensor(example, point, 2), y.hessian(['x', 'y', 'z']))
+
+    def test_mixed_derivative(self):
+        point = {'x': 0.5, 'y': 1.5, 'z': 0.3}
+        x, y, z = point['x'], point['y'], point['z']
+        # d3/dx dy dz of exp(xy) sin(z) + x^3 y^2
+        expected = (1 + x * y) * np.exp(x * y) * np.cos(z)
+        np.testing.assert_allclose(mixed_derivative(example, point, {'x': 1, 'y': 1, 'z': 1}), expected)
+        # d4/dx2 dy2
+        expected = (2 + 4 * x * y + x**2 * y**2) * np.exp(x * y) * np.sin(z) + 12 * x
+        np.testing.assert_allclose(mixed_derivative(example, point, {'x': 2, 'y': 2}), expected)
+        tensor = derivative_tensor(example, point, 3, names=['x', 'y'])
+        assert tensor.shape == (2, 2, 2)
+        np.testing.assert_allclose(tensor[0, 1, 0], mixed_derivative(example, point, {'x': 2, 'y': 1}))
+        np.testing.assert_allclose(tensor[1, 1, 1], x**3 * np.exp(x * y) * np.sin(z))
+
+    def test_outputs(self):
+        def F(values):
+            x = ad.Variable(values['x'], name='x')
+            return [x**2, ad.sum(x * np.array([1., 2.])), 3.]
+        coeffs = taylor(F, {'x': 2.}, {'x': 1.}, 3)
+        np.testing.assert_allclose(coeffs, [[4., 6., 3.], [4., 3., 0.], [1., 0., 0.], [0., 0., 0.]])
+        # several directions at once
+        coeffs = taylor(lambda values: ad.exp(ad.Variable(values['x'], name='x')), {'x': 0.},
+                        {'x': np.array([1., 2.])}, 2)
+        np.testing.assert_allclose(coeffs, [[1., 1.], [1., 2.], [0.5, 2.]])
+        # the Variables made outside of an expansion are unchanged
+        assert isinstance(ad.Variable(1., name='x'), ad.Variable)
+        assert isinstance(Taylor.variable(1., 1., 2), Taylor)
+
+    def test_reductions_of_lists(self):
+        point = {'x': 1., 'y': 2., 'z': 3.}
+        names = ['x', 'y', 'z']
+        def variables(values):
+            return [ad.Variable(values[s], name=s) for s in names]
+        def f(values):
+            x, y, z = variables(values)
+            return ad.sum([x * y, z * z])
+        np.testing.assert_allclose(derivative_tensor(f, point, 2), [[0., 1., 0.], [1., 0., 0.], [0., 0., 2.]])
+        assert np.isclose(mixed_derivative(f, point, {'x': 1, 'y': 1}), 1.)
+        def g(values):
+            x, y, z = variables(values)
+            return ad.dot([x, y, z], [x * y, z, 1.])
+        # x^2 y + y z + z
+        np.testing.assert_allclose(derivative_tensor(g, point, 2), [[4., 2., 0.], [2., 0., 1.], [0., 1., 0.]])
+        assert np.isclose(mixed_derivative(g, point, {'x': 2, 'y': 1}), 2.)
+        def h(values):
+            x, y, z = variables(values)
+            return ad.logsumexp([x * y, z])
+        np.testing.assert_allclose(derivative_tensor(h, point, 2), h(point).hessian(names))
+        def m(values):
+            x, y, z = variables(values)
+            return ad.mean([x * y, z * z])
+        np.testing.assert_allclose(derivative_tensor(m, point, 2), [[0., .5, 0.], [.5, 0., 0.], [0., 0., 1.]])
@@ -0,0 +1,86 @@
+import pytest
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.Trace import trace, Compiled
+import AutoDiff.GradDesc as gd
+from AutoDiff.NewtonOpt import NewtonOpt
+
+def f(values, index=None):
+    x1 = ad.Variable(values['x1'], name='x1', index=index)
+    x2 = ad.Variable(values['x2'], name='x2', index=index)
+    x3 = ad.Variable(values['x3'], name='x3', index=index)
+    z = ad.exp(x1*x2) + x3**2/x2 - ad.sin(x1*x3) + x1**x2 + 2**x3 - 1/x1 + ad.log(x3) * ad.sqrt(x2)
+    z = z + ad.tanh(x1) - ad.arctan(x3 - x2) + ad.sigmoid(x1) - (-x2) * 3 + ad.cosh(x1/4) - x3/2 + (1 - x1)
+    return z
+
+def g(value):
+    X=ad.Variable(value['x'],name='x')
+    Y=ad.Variable(value['y'],name='y')
+    Z1 = ad.exp(-X**2 - Y**2)
+    Z2 = ad.exp(-(X - 1)**2 - (Y - 1)**2)
+    return (Z1 - Z2) * 2
+
+names = ['x1', 'x2', 'x3']
+
+class Test_Trace():
+
+    def test_replay(self):
+        cf = trace(f, {'x1': 0.5, 'x2': 2., 'x3': 1.5})
+        assert isinstance(cf, Compiled) and cf.names == names
+        for point in ({'x1': 0.7, 'x2': 1.2, 'x3': 0.9}, {'x1': 1.1, 'x2': 0.4, 'x3': 2.5}):
+            forward = f(point, ad.VariableIndex())
+            val, grad, hess = cf.evaluate([point[s] for s in names])
+            assert np.isclose(val, forward.val)
+            np.testing.assert_allclose(grad, forward.grad[0])
+            np.testing.assert_allclose(hess, forward.hessian(names), rtol=1e-10)
+            np.testing.assert_allclose(cf(point).der['x2'], forward.der['x2'])
+            v = np.array([0.3, -1., 2.])
+            np.testing.assert_allclose(cf.hessian_vector(point, v)[1], hess.dot(v), rtol=1e-10)
+
+    def test_orders(self):
+        cf = trace(g, {'x': 0., 'y': 0.})
+        evaluation = cf({'x': .5, 'y': .2}, order=1)
+        assert evaluation.hess is None and evaluation.grad.shape == (2,)
+        assert np.isclose(cf.value([.5, .2]), g({'x': .5, 'y': .2}).val)
+        np.testing.assert_array_equal(cf.hessian([.5, .2]), cf({'x': .5, 'y': .2}).hessian(['x', 'y']))
+
+    def test_constants(self):
+        def h(values):
+            x = ad.Variable(values['x'], name='x')
+            c = ad.Variable(3, name='c', order=0)
+            return c * x**2
+        cf = trace(h, {'x': 1.})
+        assert cf.value([2.]) == 12.
+        np.testing.assert_array_equal(cf.gradient([2.]), [12.])
+        with pytest.raises(TypeError):
+            trace(lambda values: 5., {'x': 1.})
+
+    def test_logsumexp(self):
+        def h(values):
+            x = ad.Variable(values['x'], name='x')
+            y = ad.Variable(values['y'], name='y')
+            return ad.logsumexp([x, 2 * y])
+        cf = trace(h, {'x': 0., 'y': 0.})
+        # the shift is found again at the replayed point, where exp of the values overflows
+        point = {'x': 1000., 'y': 600.}
+        p = np.array([1., np.exp(200.)]) / (1 + np.exp(200.))
+        with np.errstate(over='raise'):
+            evaluation = cf(point)
+        assert np.isclose(evaluation.val, 1200. + np.log1p(np.exp(-200.)))
+        np.testing.assert_allclose(evaluation.grad, [p[0], 2 * p[1]])
+        np.testing.assert_allclose(evaluation.hess, h(point).hessian(['x', 'y']), atol=1e-12)
+
+    def test_optimizers(self):
+        def h(values):
+            x1 = ad.Variable(values['x1'], name='x1')
+            x2 = ad.Variable(values['x2'], name='x2')
+            return 2 * (x1 ** 2) + ad.sin(x2)
+        x = {'x1': 5, 'x2': 6}
+        a = gd.grad_desc(h, x, gamma=0.01, message=False)
+        b = gd.grad_desc(trace(h, x), x, gamma=0.01, message=False)
+        assert a['iters'] == b['iters']
+        np.testing.assert_allclose(a['point']['x2'], b['point']['x2'])
+        initp = {'x': .8, 'y': 1.4}
+        result = NewtonOpt(trace(g, initp), initp, message=False)
+        assert np.isclose(result['point']['x'], 1.099839320128867)
+        assert result['iters'] == 5
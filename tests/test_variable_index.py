@@ -0,0 +1,81 @@
+import pytest
+import numpy as np
+import AutoDiff.AutoDiff as ad
+from AutoDiff.AutoDiff import Variable, VariableIndex
+
+def f(values, index=None):
+    x1 = Variable(values['x1'], name='x1', index=index)
+    x2 = Variable(values['x2'], name='x2', index=index)
+    x3 = Variable(values['x3'], name='x3', index=index)
+    return x1*x2/x3 - x1**x2 + 3**x3 + (x2 - 2)**3 - 1/x1 + 4*x3 - (-x2) + 2/x3*5
+
+def g(values, index=None):
+    x1 = Variable(values['x1'], name='x1', index=index)
+    x2 = Variable(values['x2'], name='x2', index=index)
+    return ad.exp(x1) * ad.sin(x2) + ad.sqrt(x1) + ad.arctan(x2) + ad.sigmoid(x1)
+
+class Test_Variable_Index():
+
+    def test_register(self):
+        idx = VariableIndex(['a'])
+        assert idx.register('b') == 1
+        assert idx.register('a') == 0
+        assert len(idx) == 2 and 'b' in idx
+        assert idx.split('ab') == (0, 1)
+        with pytest.raises(KeyError):
+            idx.split('ac')
+
+    def test_arrays(self):
+        idx = VariableIndex()
+        x1 = Variable(3, name='x1', index=idx)
+        x2 = Variable(2, name='x2', index=idx)
+        z = x1 * x2
+        np.testing.assert_array_equal(z.grad, [[2., 3.]])
+        np.testing.assert_array_equal(z.hess, [[[0., 1.], [1., 0.]]])
+        assert z.der == {'x1': 2, 'x2': 3}
+        assert z.der2['x1x2'] == 1
+        assert np.shares_memory(z.der['x2'], z.grad)
+
+    def test_matches_dictionary_mode(self):
+        values = {'x1': 1.5, 'x2': 0.7, 'x3': 2.}
+        fd = f(values)
+        fi = f(values, VariableIndex())
+        assert np.isclose(fd.val, fi.val)
+        for name in values:
+            np.testing.assert_allclose(fd.der[name], fi.der[name])
+        np.testing.assert_allclose(fd.hessian(['x1', 'x2', 'x3']), fi.hessian(['x1', 'x2', 'x3']))
+
+    def test_elementary_functions(self):
+        values = {'x1': 0.4, 'x2': 1.1}
+        gi = g(values, VariableIndex())
+        x1, x2 = values['x1'], values['x2']
+        s = 1/(1+np.exp(-x1))
+        np.testing.assert_allclose(gi.grad[0], [np.exp(x1)*np.sin(x2) + 0.5*x1**-0.5 + s*(1-s),
+                                                np.exp(x1)*np.cos(x2) + 1/(1+x2**2)])
+        np.testing.assert_allclose(gi.hessian(['x1', 'x2']),
+            [[np.exp(x1)*np.sin(x2) - 0.25*x1**-1.5 + s*(1-s)*(1-2*s), np.exp(x1)*np.cos(x2)],
+             [np.exp(x1)*np.cos(x2), -np.exp(x1)*np.sin(x2) - 2*x2/(1+x2**2)**2]])
+
+    def test_late_registration(self):
+        idx = VariableIndex()
+        x1 = Variable(2, name='x1', index=idx)
+        y = x1**2
+        x2 = Variable(5, name='x2', index=idx)
+        z = y * x2
+        assert y.grad.shape == (1, 1)
+        np.testing.assert_array_equal(z.hessian(['x2', 'x1']), [[0., 4.], [4., 10.]])
+        np.testing.assert_array_equal(y.hessian(['x1', 'x2']), [[2., 0.], [0., 0.]])
+
+    def test_vector_values(self):
+        idx = VariableIndex()
+        x1 = Variable([2, 3, 4], name='x1', index=idx)
+        x2 = Variable([3, 2, 1], name='x2', index=idx)
+        z = (x1 - x2)**2
+        np.testing.assert_array_equal(z.der['x1'], [-2., 2., 6.])
+        assert z.hessian(['x1', 'x2']).shape == (3, 2, 2)
+
+    def test_different_indices(self):
+        x1 = Variable(1, name='x1', index=VariableIndex())
+        x2 = Variable(1, name='x2', index=VariableIndex())
+        with pytest.raises(ValueError):
+            x1 + x2
@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+import scipy.sparse
+import AutoDiff.AutoDiff as ad
+from AutoDiff.AutoDiff import VectorVariable, VariableIndex
+
+names = ['x1', 'x2', 'x3']
+values = [0.5, 1.5, 2.]
+
+def f(x):
+    return ad.sin(x)**2 / (1 + x) + 2**x - 3/x + x**x - ad.sqrt(x) * ad.tanh(x) + ad.sigmoid(x)
+
+class Test_Vector_Variable():
+
+    def test_matches_variables(self):
+        x = VectorVariable(values, names=names)
+        fx = f(x)
+        for (i, s) in enumerate(names):
+            fi = f(ad.Variable(values[i], name=s))
+            assert np.isclose(fx.val[i], fi.val)
+            np.testing.assert_allclose(fx.jacobian()[i], [fi.der.get(t, [0.])[0] for t in names])
+
+    def test_sparse(self):
+        dense = f(VectorVariable(values, names=names))
+        sparse = f(VectorVariable(values, names=names, sparse=True))
+        assert scipy.sparse.issparse(sparse.jac)
+        np.testing.assert_allclose(sparse.jacobian(sparse=False), dense.jacobian())
+
+    def test_components(self):
+        idx = VariableIndex()
+        x = VectorVariable([1., 2.], names=['x1', 'x2'], index=idx)
+        y = VectorVariable([3.], names=['y'], index=idx)
+        z = ad.concatenate([x * y, (x / y).sum(), x[0] - 1])
+        np.testing.assert_allclose(z.val, [3., 6., 1., 0.])
+        np.testing.assert_allclose(z.jacobian(['y', 'x1', 'x2']),
+                                   [[1., 3., 0.], [2., 0., 3.], [-1/3, 1/3, 1/3], [0., 1., 0.]])
+        assert len(z) == 4
+
+    def test_errors(self):
+        x = VectorVariable([1., 2.], names=['x1', 'x2'])
+        y = VectorVariable([1., 2.], names=['y1', 'y2'])
+        with pytest.raises(ValueError):
+            x + y
+        with pytest.raises(TypeError):
+            x * ad.Variable(1, name='z')
+        with pytest.raises(ValueError):
+            VectorVariable([1., 2.], names=['x1'])
+
+    def test_jvp(self):
+        def F(point):
+            x = VectorVariable([point[s] for s in names], names=names)
+            return f(x)
+        point = dict(zip(names, values))
+        val, dval = ad.jvp(F, point, {'x1': 1., 'x3': -2.})
+        J = F(point).jacobian()
+        np.testing.assert_allclose(val, F(point).val)
+        np.testing.assert_allclose(dval, J @ [1., 0., -2.])